@@ -1,35 +1,1570 @@
-import customtkinter as ctk
-from tkinter import filedialog, messagebox, Canvas, Frame
-import threading
-import PyPDF2
-from concurrent.futures import ThreadPoolExecutor, as_completed
+"""
+Analizador de frecuencia de palabras en PDF.
+
+Este módulo no depende de la interfaz gráfica: se puede usar desde la
+línea de comandos (ver main) en servidores sin entorno gráfico. La
+interfaz vive en PDFcount_gui.py y sólo se importa al abrirla.
+"""
+import argparse
+import cProfile
+import csv
+import glob
+import json
+import math
+import multiprocessing
+import shutil
+import signal
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, ProcessPoolExecutor, wait
 from collections import Counter
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
 import re
 import os
+import queue
+import sys
+import threading
 import time
-from typing import Dict, List, Tuple
-from PIL import Image, ImageTk
-import fitz 
+import hashlib
+import mmap
+import pickle
+import struct
+import zlib
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import nlargest
+from itertools import chain, groupby, islice, repeat
+from operator import itemgetter
+
+if TYPE_CHECKING:
+    import numpy as np
+
+class PyPDF2Extractor:
+    """Extracción de texto con PyPDF2 (lenta pero sin dependencias nativas)"""
+    
+    def __init__(self, pdf_path: str):
+        import PyPDF2
+        self.file = open(pdf_path, 'rb')
+        self.reader = PyPDF2.PdfReader(self.file)
+    
+    def page_count(self) -> int:
+        return len(self.reader.pages)
+    
+    def extract_page(self, page_num: int) -> str:
+        return self.reader.pages[page_num].extract_text()
+    
+    def page_contents(self, page_num: int) -> bytes:
+        contents = self.reader.pages[page_num].get('/Contents')
+        if contents is None:
+            return b''
+        contents = contents.get_object()
+        streams = contents if isinstance(contents, list) else [contents]
+        return b''.join(stream.get_object().get_data() for stream in streams)
+    
+    def page_summary(self, page_num: int) -> Tuple[str, int]:
+        """Huella y tamaño del flujo de contenido, leyéndolo una sola vez"""
+        data = self.page_contents(page_num)
+        page = self.reader.pages[page_num]
+        return hashlib.sha1(data + repr(page.mediabox).encode()).hexdigest(), len(data)
+    
+    def page_fingerprint(self, page_num: int) -> str:
+        """Hash del flujo de contenido de la página, sin extraer el texto"""
+        return self.page_summary(page_num)[0]
+    
+    def content_size(self, page_num: int) -> int:
+        """Bytes del flujo de contenido: estimación barata de cuánto texto tiene la página"""
+        return len(self.page_contents(page_num))
+    
+    def close(self):
+        self.file.close()
+
+
+class PyMuPDFExtractor:
+    """Extracción de texto con PyMuPDF (fitz), mucho más rápida"""
+    
+    def __init__(self, pdf_path: str):
+        import fitz
+        self.document = fitz.open(pdf_path)
+    
+    def page_count(self) -> int:
+        return len(self.document)
+    
+    def extract_page(self, page_num: int) -> str:
+        return self.document[page_num].get_text()
+    
+    def page_summary(self, page_num: int) -> Tuple[str, int]:
+        """Huella y tamaño del flujo de contenido, leyéndolo una sola vez"""
+        page = self.document[page_num]
+        data = page.read_contents()
+        return hashlib.sha1(data + repr(page.rect).encode()).hexdigest(), len(data)
+    
+    def page_fingerprint(self, page_num: int) -> str:
+        """Hash del flujo de contenido de la página, sin extraer el texto"""
+        return self.page_summary(page_num)[0]
+    
+    def content_size(self, page_num: int) -> int:
+        """Bytes del flujo de contenido: estimación barata de cuánto texto tiene la página"""
+        return len(self.document[page_num].read_contents())
+    
+    def close(self):
+        self.document.close()
+
+
+EXTRACTION_BACKENDS = {
+    'pypdf2': PyPDF2Extractor,
+    'pymupdf': PyMuPDFExtractor,
+}
+
+
+class AnalysisCancelled(Exception):
+    """El análisis se canceló (PDFWordAnalyzer.cancel)"""
+
+
+class PageTimeout(Exception):
+    """La extracción de una página superó el tiempo límite"""
+
+
+WARMUP_SAMPLE = 8  # Páginas entre las que se elige la más chica para calentar un proceso de extracción
+
+
+def warm_up(extractor):
+    """
+    La primera extracción de un proceso paga su arranque en frío (PyPDF2 lee
+    todo el árbol de páginas: más de 100 ms en 700 páginas, sea cual sea la
+    página pedida): se hace una vez con la página de menor contenido entre
+    las primeras, antes de medir nada.
+    """
+    try:
+        sample = range(min(WARMUP_SAMPLE, extractor.page_count()))
+        if sample:
+            extractor.extract_page(min(sample, key=extractor.content_size))
+    except Exception:
+        pass  # Si esa página falla, se verá al pedirla
+
+
+def _extraction_server(conn, pdf_path: str, backend: str):
+    """Proceso hijo de TimedExtractor: abre el PDF y extrae las páginas que se le piden"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        extractor = EXTRACTION_BACKENDS[backend](pdf_path)
+    except Exception as e:
+        conn.send((False, str(e)))
+        return
+    warm_up(extractor)
+    conn.send((True, None))
+    
+    try:
+        while True:
+            page_num = conn.recv()
+            if page_num is None:
+                break
+            try:
+                conn.send((True, extractor.extract_page(page_num)))
+            except Exception as e:
+                conn.send((False, str(e)))
+    finally:
+        extractor.close()
+
+
+class TimedExtractor:
+    """
+    Extractor con tiempo límite por página. La extracción corre en un
+    proceso hijo; si una página no termina a tiempo, el hijo se mata (un
+    hilo no se puede interrumpir) y se levanta otro para la siguiente. Cada
+    hijo abre el PDF y hace una extracción de calentamiento (warm_up) antes
+    de recibir páginas: ese arranque no cuenta para el tiempo límite, así
+    una página lenta no hace fallar a la que sigue.
+    """
+    
+    POLL_INTERVAL = 0.2  # Para atender una cancelación mientras se espera una página
+    
+    def __init__(self, pdf_path: str, backend: str, timeout: float, cancel_event=None):
+        self.pdf_path = pdf_path
+        self.backend = backend
+        self.timeout = timeout
+        self.cancel_event = cancel_event
+        self.process = None
+        self.conn = None
+    
+    def ready(self):
+        """Levanta el proceso hijo si hace falta, fuera del tiempo de cualquier página"""
+        if self.process is None:
+            self._start()
+    
+    def _start(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_extraction_server, args=(child_conn, self.pdf_path, self.backend), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        
+        # Abrir el PDF y calentar el backend no cuenta para el tiempo límite
+        ok, error = self.conn.recv()
+        if not ok:
+            self._stop()
+            raise RuntimeError(error)
+    
+    def _stop(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.process = None
+    
+    def extract_page(self, page_num: int) -> str:
+        self.ready()
+        self.conn.send(page_num)
+        deadline = time.perf_counter() + self.timeout
+        while not self.conn.poll(min(self.POLL_INTERVAL, max(0.0, deadline - time.perf_counter()))):
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                self._stop()
+                raise AnalysisCancelled()
+            if time.perf_counter() >= deadline:
+                self._stop()
+                raise PageTimeout(f"más de {self.timeout:g} s")
+        
+        ok, value = self.conn.recv()
+        if not ok:
+            raise RuntimeError(value)
+        return value
+    
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+            self.process.join(1)
+        finally:
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+            self.conn.close()
+            self.process = None
+
+
+# Evento de cancelación de los procesos del pool (ver init_worker)
+_worker_cancel_event = None
+
+
+def init_worker(cancel_event):
+    """Inicializador de los procesos del pool: Ctrl+C sólo lo atiende el proceso principal"""
+    global _worker_cancel_event
+    _worker_cancel_event = cancel_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def iter_page_texts(pdf_path: str, backend: str, page_nums: List[int], page_timeout: float = None,
+                    cancel_event=None, skipped_pages: Dict[int, str] = None):
+    """
+    Extrae las páginas en orden y entrega (página, texto, segundos). Revisa
+    la cancelación entre páginas (AnalysisCancelled) y, con page_timeout,
+    omite las páginas lentas anotándolas en skipped_pages (número de página -> motivo).
+    """
+    cancel_event = cancel_event or _worker_cancel_event
+    if page_timeout:
+        extractor = TimedExtractor(pdf_path, backend, page_timeout, cancel_event)
+    else:
+        extractor = EXTRACTION_BACKENDS[backend](pdf_path)
+    
+    try:
+        for page_num in page_nums:
+            if cancel_event is not None and cancel_event.is_set():
+                raise AnalysisCancelled()
+            if page_timeout:
+                extractor.ready()  # Un hijo recién levantado no suma su arranque a la página
+            
+            page_start = time.perf_counter()
+            try:
+                page_text = extractor.extract_page(page_num)
+            except PageTimeout as e:
+                if skipped_pages is not None:
+                    skipped_pages[page_num + 1] = str(e)
+                continue
+            yield page_num, page_text, time.perf_counter() - page_start
+    finally:
+        extractor.close()
+
+
+CHUNKS_PER_WORKER = 4  # Trozos por worker al planificar (más trozos, mejor balance y más overhead)
+PAGE_COST_OVERHEAD = 2048  # Costo fijo de cada página, en las mismas unidades que su tamaño (bytes)
+
+
+def plan_chunks(items: List, costs: List[float], num_workers: int,
+                chunks_per_worker: int = CHUNKS_PER_WORKER) -> List[List]:
+    """
+    Parte items (en orden de página) en trozos contiguos de costo parecido,
+    unos chunks_per_worker por worker, y los ordena del más caro al más
+    barato. Repartidos a demanda (ver iter_dispatched), los caros empiezan
+    primero y los baratos rellenan el final, así ningún worker se queda
+    solo con la cola. Cada item va al trozo donde cae la mitad de su costo
+    acumulado: no quedan restos chicos al final y una página más cara que
+    un trozo va sola.
+    """
+    target = sum(costs) / max(1, num_workers * chunks_per_worker) or 1.0
+    positions = []
+    accumulated = 0.0
+    for cost in costs:
+        positions.append(int((accumulated + cost / 2) // target))
+        accumulated += cost
+    
+    chunks = []
+    for _, group in groupby(zip(positions, items, costs), key=lambda entry: entry[0]):
+        group = list(group)
+        chunks.append((sum(cost for _, _, cost in group), [item for _, item, _ in group]))
+    chunks.sort(key=lambda entry: entry[0], reverse=True)
+    return [chunk for _, chunk in chunks]
+
+
+def iter_dispatched(submit, chunks: List, cancel_event, in_flight: int):
+    """
+    Reparte los trozos a demanda: submit(trozo) envía uno al executor, nunca
+    hay más de in_flight pendientes y cada vez que uno termina sale el
+    siguiente. Entrega (índice del trozo, future) a medida que terminan;
+    si se cancela el análisis, cancela los pendientes y deja de esperar.
+    """
+    futures = {}
+    next_chunk = 0
+    while futures or next_chunk < len(chunks):
+        while next_chunk < len(chunks) and len(futures) < in_flight:
+            futures[submit(chunks[next_chunk])] = next_chunk
+            next_chunk += 1
+        if cancel_event.is_set():
+            for future in futures:
+                future.cancel()
+            raise AnalysisCancelled()
+        done, _ = wait(futures, timeout=0.2, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield futures.pop(future), future
+
+
+def run_chunk(function, *args):
+    """Corre function(*args) en un worker y devuelve (worker, segundos ocupado, resultado)"""
+    start = time.perf_counter()
+    result = function(*args)
+    return (os.getpid(), threading.get_ident()), time.perf_counter() - start, result
+
+
+WORD_PATTERN = re.compile(r'\b[a-záéíóúñü]+\b')
+
+# Palabras vacías que se omiten en los rankings (no en el índice ni en las búsquedas)
+STOPWORDS_ES = frozenset('''
+a al algo algunas algunos ante antes como con contra cual cuales cuando de del desde donde dos
+durante e el ella ellas ellos en entre era eran es esa esas ese eso esos esta estaba estan estas
+este esto estos está están fue fueron ha han hasta hay la las le les lo los mas me mi mientras
+muy más nada ni no nos o otra otras otro otros para pero poco por porque que quien se sea ser
+si sido sin sobre son su sus también tambien te tiene tienen todo todos tu un una unas uno unos
+y ya yo él sí qué cómo
+'''.split())
+
+STOPWORDS_EN = frozenset('''
+a about after all also an and any are as at be been before being but by can could did do does
+for from had has have he her his how i if in into is it its me more most my no not of on one
+only or other our out over she so some such than that the their them then there these they this
+those through to too under up very was we were what when where which while who will with would
+you your
+'''.split())
+
+STOPWORD_LISTS = {
+    'es': STOPWORDS_ES,
+    'en': STOPWORDS_EN,
+}
+
+NGRAM_NAMES = {1: 'palabra', 2: 'bigrama', 3: 'trigrama'}
+
+
+def load_stopwords(spec: str) -> frozenset:
+    """
+    Lista de stopwords a partir de códigos de idioma separados por comas
+    ('es', 'en', 'es,en') o de la ruta de un archivo con una palabra por línea.
+    """
+    if os.path.isfile(spec):
+        with open(spec, encoding='utf-8') as file:
+            return frozenset(line.strip().lower() for line in file if line.strip())
+    
+    stopwords = set()
+    for code in spec.split(','):
+        code = code.strip().lower()
+        if code not in STOPWORD_LISTS:
+            raise ValueError(f"Lista de stopwords desconocida: {code}")
+        stopwords |= STOPWORD_LISTS[code]
+    return frozenset(stopwords)
+
+
+def ngram_name(size: int) -> str:
+    return NGRAM_NAMES.get(size, f"{size}-grama")
+
+
+def empty_ngram_counts(max_ngram: int) -> Dict[int, Counter]:
+    return {size: Counter() for size in range(2, max_ngram + 1)}
+
+
+def count_ngrams(tokens: array, ngram_counts: Dict[int, Counter]):
+    """Suma los n-gramas consecutivos de tokens (tuplas de ids) a cada contador por tamaño"""
+    for size, counts in ngram_counts.items():
+        if len(tokens) >= size:
+            counts.update(zip(*(tokens[i:] for i in range(size))))
+
+
+def pack_ngrams(ngram_counts: Dict[int, Counter]) -> Dict[int, Tuple[array, array, array]]:
+    """
+    Forma compacta de los n-gramas de un lote para devolverlos al proceso
+    principal: por tamaño, los ids seguidos de las claves que aparecen una
+    sola vez, los de las que se repiten y los conteos de estas últimas
+    (ver merge_batch).
+    """
+    packed = {}
+    for size, counts in ngram_counts.items():
+        once, repeated, repeated_counts = array('I'), array('I'), array('I')
+        for ids, count in counts.items():
+            if count == 1:
+                once.extend(ids)
+            else:
+                repeated.extend(ids)
+                repeated_counts.append(count)
+        packed[size] = (once, repeated, repeated_counts)
+    return packed
+
+
+NGRAM_ID_BITS = 32  # Bloque de cada id en las claves de n-gramas mientras se cuenta (los ids caben en 'I')
+
+
+def ngram_keys(columns: List, bits: int = NGRAM_ID_BITS) -> List[int]:
+    """
+    Claves enteras de n-gramas: columns tiene, por posición dentro del
+    n-grama, el id de esa palabra en cada uno. Cada id ocupa un bloque de
+    bits bits, el primero en los más altos, así que ordenar las claves es
+    ordenar las tuplas de ids. Con columns = [tokens[i:] for i in range(n)]
+    da los n-gramas consecutivos de una página.
+    """
+    keys = columns[0]
+    for column in columns[1:]:
+        keys = [key << bits | word_id for key, word_id in zip(keys, column)]
+    return keys
+
+
+class NgramTable:
+    """
+    Conteos exactos de los n-gramas de un tamaño en forma compacta: las
+    claves (ver ngram_keys) ordenadas en un array y los conteos en otro
+    paralelo, unos 12 bytes por n-grama en lugar de los más de 100 de un
+    Counter de tuplas. Es lo que queda en memoria y en la caché después del
+    análisis; mientras se cuenta se usa un Counter de claves (ver
+    PDFWordAnalyzer.merge_batch).
+    """
+    
+    def __init__(self, size: int, counts: Counter = None, vocabulary_size: int = 0):
+        self.size = size
+        self.bits = NGRAM_ID_BITS
+        counts = counts or Counter()
+        keys = sorted(counts)
+        self.counts = array('I', map(counts.__getitem__, keys))
+        if size * NGRAM_ID_BITS > 64:
+            # Trigramas o más: bloques tan chicos como permita el vocabulario, para que
+            # la clave quepa en 64 bits. Se recodifica clave por clave, sin columnas intermedias
+            self.bits = max(1, (vocabulary_size - 1).bit_length())
+            keys = map(self.recode, keys)
+        # Con vocabularios enormes la clave no cabe en 64 bits ni así: queda en una lista
+        self.keys = array('Q', keys) if self.bits * size <= 64 else list(keys)
+    
+    def __len__(self) -> int:
+        return len(self.counts)
+    
+    def recode(self, key: int, bits: int = NGRAM_ID_BITS) -> int:
+        """Clave con bloques de bits bits pasada a bloques de self.bits"""
+        mask = (1 << bits) - 1
+        recoded = 0
+        for shift in range(bits * (self.size - 1), -1, -bits):
+            recoded = recoded << self.bits | key >> shift & mask
+        return recoded
+    
+    def shifts(self) -> range:
+        return range(self.bits * (self.size - 1), -1, -self.bits)
+    
+    def columns(self) -> List[List[int]]:
+        """Los ids de cada posición de los n-gramas (ver ngram_keys)"""
+        mask = (1 << self.bits) - 1
+        return [[key >> shift & mask for key in self.keys] for shift in self.shifts()]
+    
+    def ids(self, index: int) -> tuple:
+        key = self.keys[index]
+        mask = (1 << self.bits) - 1
+        return tuple(key >> shift & mask for shift in self.shifts())
+    
+    def key_counts(self) -> Counter:
+        """Los conteos como Counter de claves de NGRAM_ID_BITS, para seguir contando"""
+        keys = self.keys if self.bits == NGRAM_ID_BITS else ngram_keys(self.columns())
+        return Counter(dict(zip(keys, self.counts)))
+    
+    def top(self, n: int = None, keep=None) -> List[tuple]:
+        """Los n n-gramas más frecuentes (todos si n es None) que cumplen keep, como (tupla de ids, conteo)"""
+        counts = self.counts
+        if n is not None and keep is None:
+            order = nlargest(n, range(len(counts)), key=counts.__getitem__)
+        else:
+            order = sorted(range(len(counts)), key=counts.__getitem__, reverse=True)
+        items = ((self.ids(index), counts[index]) for index in order)
+        if keep is not None:
+            items = (item for item in items if keep(item[0]))
+        return list(islice(items, n))
+
+
+def match_spans(positions: List[List[int]]) -> List[Tuple[int, int]]:
+    """
+    Regla de las frases, la única que usan búsqueda, concordancia y
+    resaltado: positions tiene, por palabra de la frase, sus posiciones
+    (ordenadas) en un párrafo o página. Desde cada aparición de la primera
+    palabra, la siguiente debe estar a 1, 2 o 3 posiciones (máximo 2
+    palabras entre ellas). Devuelve (posición inicial, posición final) de
+    cada aparición.
+    """
+    following = [set(word_positions) for word_positions in positions[1:]]
+    spans = []
+    
+    for start in positions[0]:
+        current_pos = start
+        for word_positions in following:
+            for offset in range(1, 4):
+                if current_pos + offset in word_positions:
+                    current_pos += offset
+                    break
+            else:
+                break
+        else:
+            spans.append((start, current_pos))
+    
+    return spans
+
+
+def top_counts(counts: Counter, n: int = None, keep=None) -> List[tuple]:
+    """Los n elementos más frecuentes (todos si n es None) que cumplen keep"""
+    if keep is None:
+        return counts.most_common(n)
+    return list(islice((item for item in counts.most_common() if keep(item[0])), n))
+
+
+# Las palabras sólo tienen letras de WORD_PATTERN: la ñ se conserva, los acentos no
+ACCENT_TABLE = str.maketrans('áéíóúü', 'aeiouu')
+
+
+def fold_accents(word: str) -> str:
+    return word.translate(ACCENT_TABLE)
+
+
+def fuzzy_distance(word: str) -> int:
+    """Distancia de edición tolerada según la longitud de la palabra buscada"""
+    if len(word) <= 3:
+        return 0
+    return 1 if len(word) <= 7 else 2
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Levenshtein con corte: devuelve max_distance + 1 si la distancia lo supera"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class TrigramIndex:
+    """
+    Índice de trigramas sobre formas sin acentos para búsqueda difusa: los
+    candidatos son las formas que comparten suficientes trigramas con la
+    consulta (lema de q-gramas) y sólo a ellos se les calcula la distancia.
+    """
+    
+    def __init__(self, forms: List[str]):
+        self.forms = forms
+        self.postings = {}
+        for form_id, form in enumerate(forms):
+            for trigram in set(self.trigrams(form)):
+                postings = self.postings.get(trigram)
+                if postings is None:
+                    postings = self.postings[trigram] = array('I')
+                postings.append(form_id)
+    
+    @staticmethod
+    def trigrams(form: str) -> List[str]:
+        padded = f"  {form} "
+        return [padded[i:i + 3] for i in range(len(padded) - 2)]
+    
+    def lookup(self, form: str, max_distance: int) -> List[str]:
+        query_trigrams = set(self.trigrams(form))
+        # Con k ediciones se pierden a lo más 3k trigramas de la consulta
+        min_shared = len(query_trigrams) - 3 * max_distance
+        
+        shared = Counter()
+        for trigram in query_trigrams:
+            postings = self.postings.get(trigram)
+            if postings:
+                shared.update(postings)
+        
+        matches = []
+        for form_id, count in shared.items():
+            if count >= min_shared:
+                candidate = self.forms[form_id]
+                if edit_distance(form, candidate, max_distance) <= max_distance:
+                    matches.append(candidate)
+        return matches
+
+
+class Vocabulary:
+    """
+    Vocabulario internado: cada palabra distinta se guarda una sola vez
+    y el texto tokenizado se representa con sus identificadores enteros.
+    Junto a cada palabra se guarda su forma sin acentos para buscar
+    "analisis" y encontrar "análisis".
+    """
+    
+    def __init__(self, words: List[str] = None):
+        self.words = []
+        self.ids = {}
+        self.folded_ids = {}  # Forma sin acentos -> ids de las palabras con esa forma
+        self.trigram_index = None  # TrigramIndex de las formas sin acentos (se construye al usarse)
+        self.trigram_index_size = 0
+        for word in words or []:
+            self.add(word)
+    
+    def __len__(self) -> int:
+        return len(self.words)
+    
+    def __getitem__(self, word_id: int) -> str:
+        return self.words[word_id]
+    
+    def add(self, word: str) -> int:
+        word_id = self.ids.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            word = sys.intern(word)
+            self.words.append(word)
+            self.ids[word] = word_id
+            self.folded_ids.setdefault(fold_accents(word), []).append(word_id)
+        return word_id
+    
+    def get(self, word: str) -> Optional[int]:
+        return self.ids.get(word)
+    
+    def variants(self, word: str, fold: bool = True, fuzzy: bool = False) -> List[int]:
+        """
+        Ids de las palabras del vocabulario que coinciden con word: la palabra
+        exacta, las que sólo difieren en acentos (fold) y, con fuzzy, las que
+        están a una distancia de edición tolerable (ver fuzzy_distance).
+        """
+        if not fold and not fuzzy:
+            word_id = self.get(word)
+            return [] if word_id is None else [word_id]
+        
+        folded = fold_accents(word)
+        forms = [folded]
+        if fuzzy and fuzzy_distance(folded):
+            if self.trigram_index is None or self.trigram_index_size != len(self):
+                self.trigram_index = TrigramIndex(self.folded_forms())
+                self.trigram_index_size = len(self)
+            forms = self.trigram_index.lookup(folded, fuzzy_distance(folded))
+        
+        return sorted(word_id for form in forms for word_id in self.ids_for_folded(form))
+    
+    def folded_forms(self) -> List[str]:
+        return list(self.folded_ids)
+    
+    def ids_for_folded(self, form: str) -> List[int]:
+        return self.folded_ids.get(form, [])
+    
+    def merge(self, words: List[str]) -> array:
+        """Agrega las palabras de otro vocabulario y devuelve la tabla id local -> id global"""
+        return array('I', [self.add(word) for word in words])
+
+
+def tokenize_page(page_num: int, text: str, vocabulary: Vocabulary) -> Dict:
+    """
+    Tokeniza una página una sola vez y la guarda en forma compacta: el texto
+    original, los límites de cada párrafo y arreglos con los ids de las
+    palabras y su posición en el texto (para mostrar el contexto).
+    """
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # Algunos caracteres cambian de longitud al pasar a minúsculas;
+        # se guarda el texto en minúsculas para que los offsets sigan siendo válidos
+        text = lowered
+    
+    # Párrafos: líneas no vacías, sin espacios al inicio ni al final
+    paragraph_spans = array('I')
+    position = 0
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if stripped:
+            start = position + len(line) - len(line.lstrip())
+            paragraph_spans.extend((start, start + len(stripped)))
+        position += len(line) + 1
+    
+    tokens = array('I')
+    token_offsets = array('I')
+    for match in WORD_PATTERN.finditer(lowered):
+        tokens.append(vocabulary.add(match.group()))
+        token_offsets.append(match.start())
+    
+    # Índice del primer token de cada párrafo (más el total al final)
+    paragraph_tokens = array('I', [
+        bisect_left(token_offsets, paragraph_spans[i])
+        for i in range(0, len(paragraph_spans), 2)
+    ])
+    paragraph_tokens.append(len(tokens))
+    
+    return {
+        'page_num': page_num + 1,
+        'text': text,
+        'paragraph_spans': paragraph_spans,
+        'paragraph_tokens': paragraph_tokens,
+        'tokens': tokens,
+        'token_offsets': token_offsets
+    }
+
+
+class PageTermMatrix:
+    """
+    Matriz dispersa página × palabra en formato CSC: para cada id de
+    palabra, las páginas donde aparece y cuántas veces aparece en cada una.
+    """
+    
+    @classmethod
+    def from_arrays(cls, num_pages: int, indptr, page_indices, counts) -> 'PageTermMatrix':
+        """Matriz sobre arreglos ya construidos (por ejemplo, vistas de un índice en disco)"""
+        matrix = cls.__new__(cls)
+        matrix.num_pages = num_pages
+        matrix.indptr = indptr
+        matrix.page_indices = page_indices
+        matrix.counts = counts
+        return matrix
+    
+    def __init__(self, pages_data: List[Dict], vocabulary_size: int):
+        columns = [[] for _ in range(vocabulary_size)]
+        for page_idx, page_data in enumerate(pages_data):
+            for word_id, count in Counter(page_data['tokens']).items():
+                columns[word_id].append((page_idx, count))
+        
+        self.num_pages = len(pages_data)
+        self.indptr = array('I', [0])
+        self.page_indices = array('I')
+        self.counts = array('I')
+        for column in columns:
+            for page_idx, count in column:
+                self.page_indices.append(page_idx)
+                self.counts.append(count)
+            self.indptr.append(len(self.page_indices))
+    
+    def column(self, word_id: int) -> Tuple[array, array]:
+        """Páginas (índices) y conteos de una palabra, sólo las no nulas"""
+        start, end = self.indptr[word_id], self.indptr[word_id + 1]
+        return self.page_indices[start:end], self.counts[start:end]
+    
+    def dense_column(self, word_id: int) -> List[int]:
+        frequencies = [0] * self.num_pages
+        for page_idx, count in zip(*self.column(word_id)):
+            frequencies[page_idx] = count
+        return frequencies
+    
+    def dense(self, word_ids: List[int]) -> 'np.ndarray':
+        """Submatriz densa palabras × páginas para las palabras pedidas"""
+        import numpy as np
+        matrix = np.zeros((len(word_ids), self.num_pages), dtype=np.int32)
+        for row, word_id in enumerate(word_ids):
+            pages, counts = self.column(word_id)
+            matrix[row, pages] = counts
+        return matrix
+
+
+class Concordance:
+    """
+    Concordancia KWIC (palabra clave en contexto) de una palabra o frase.
+    Al crearla sólo se guardan las apariciones como arreglos de enteros
+    (párrafo global, primer y último token); el texto de cada línea se arma
+    al pedirla, así una consulta con decenas de miles de apariciones está
+    lista al instante y sólo cuesta lo que se muestra.
+    """
+    
+    def __init__(self, analyzer: 'PDFWordAnalyzer', paragraphs: array, starts: array, ends: array,
+                 window: int = 5):
+        self.analyzer = analyzer
+        self.paragraphs = paragraphs
+        self.starts = starts
+        self.ends = ends
+        self.window = window  # Tokens de contexto a cada lado
+    
+    def __len__(self) -> int:
+        return len(self.paragraphs)
+    
+    def line(self, i: int, window: int = None) -> Dict:
+        """Página, párrafo y contexto izquierdo, palabra clave y contexto derecho de la aparición i"""
+        return self.analyzer.kwic_line(self.paragraphs[i], self.starts[i], self.ends[i],
+                                       self.window if window is None else window)
+    
+    def lines(self, start: int = 0, stop: int = None, window: int = None) -> List[Dict]:
+        stop = len(self) if stop is None else min(stop, len(self))
+        return [self.line(i, window) for i in range(start, stop)]
+
+
+class HeavyHitters:
+    """
+    Resumen de elementos frecuentes con memoria acotada (Misra-Gries, de la
+    familia de space-saving). Guarda a lo más 2 × capacity contadores; al
+    pasarse, resta a todos el contador número capacity + 1 y descarta los
+    que quedan en cero. Cada conteo es una cota inferior y el real no lo
+    supera en más de error, que nunca pasa de total / (capacity + 1).
+    Dos resúmenes se combinan sumando contadores y errores (mergeable).
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts = Counter()
+        self.error = 0
+        self.total = 0
+    
+    def update(self, counts: Dict):
+        """Suma conteos exactos (por ejemplo, los de una página)"""
+        self.counts.update(counts)
+        self.total += sum(counts.values())
+        if len(self.counts) > 2 * self.capacity:
+            self.prune()
+    
+    def merge(self, other: 'HeavyHitters'):
+        self.counts.update(other.counts)
+        self.error += other.error
+        self.total += other.total
+        if len(self.counts) > 2 * self.capacity:
+            self.prune()
+    
+    def prune(self):
+        threshold = nlargest(self.capacity + 1, self.counts.values())[-1]
+        self.counts = Counter({item: count - threshold for item, count in self.counts.items() if count > threshold})
+        self.error += threshold
+    
+    def top(self, n: int = None, keep=None) -> List[tuple]:
+        """Elementos más frecuentes como (elemento, conteo mínimo); n no pasa de capacity"""
+        return top_counts(self.counts, min(n or self.capacity, self.capacity), keep)
+
+
+def count_page_terms(text: str, max_ngram: int) -> Dict[int, Counter]:
+    """Conteos exactos de palabras (tamaño 1) y n-gramas de una página, como texto"""
+    words = WORD_PATTERN.findall(text.lower())
+    counts = {1: Counter(words)}
+    for size in range(2, max_ngram + 1):
+        counts[size] = Counter(zip(*(words[i:] for i in range(size))))
+    return counts
+
+
+def sketch_pages_worker(pdf_path: str, page_nums: List[int], backend: str, capacity: int, max_ngram: int,
+                        page_timeout: float = None, cancel_event=None
+                        ) -> Tuple[Dict[int, HeavyHitters], Dict[int, float], Dict[int, float], Dict[int, str]]:
+    """
+    Trabajo de un proceso en modo aproximado: recorre sus páginas sin
+    guardarlas y devuelve sólo los resúmenes de palabras y n-gramas
+    (tamaño -> HeavyHitters), el tiempo de extracción y de conteo de cada
+    página y las páginas omitidas por tiempo límite.
+    """
+    sketches = {size: HeavyHitters(capacity) for size in range(1, max_ngram + 1)}
+    timings = {}
+    count_timings = {}
+    skipped = {}
+    
+    for page_num, page_text, seconds in iter_page_texts(pdf_path, backend, page_nums, page_timeout,
+                                                        cancel_event, skipped):
+        timings[page_num + 1] = seconds
+        count_start = time.perf_counter()
+        for size, counts in count_page_terms(page_text, max_ngram).items():
+            sketches[size].update(counts)
+        count_timings[page_num + 1] = time.perf_counter() - count_start
+    
+    return sketches, timings, count_timings, skipped
+
+
+def extract_pages_worker(pdf_path: str, page_nums: List[int], backend: str = 'pypdf2', page_timeout: float = None,
+                         max_ngram: int = 1
+                         ) -> Tuple[List[str], List[Dict], Dict[int, Tuple[array, array, array]],
+                                    Dict[int, float], Dict[int, float], Dict[int, str]]:
+    """
+    Trabajo de un proceso: abre el PDF por su cuenta, extrae y tokeniza
+    su rango de páginas y devuelve su vocabulario local, las páginas
+    tokenizadas, sus n-gramas (sobre ids locales, ver pack_ngrams), el
+    tiempo de extracción y de tokenización de cada página y las páginas
+    omitidas por tiempo límite (quedan vacías).
+    """
+    vocabulary = Vocabulary()
+    pages_data = []
+    ngram_counts = empty_ngram_counts(max_ngram)
+    timings = {}
+    tokenize_timings = {}
+    skipped = {}
+    
+    for page_num, page_text, seconds in iter_page_texts(pdf_path, backend, page_nums, page_timeout,
+                                                        skipped_pages=skipped):
+        timings[page_num + 1] = seconds
+        tokenize_start = time.perf_counter()
+        pages_data.append(tokenize_page(page_num, page_text, vocabulary))
+        count_ngrams(pages_data[-1]['tokens'], ngram_counts)
+        tokenize_timings[page_num + 1] = time.perf_counter() - tokenize_start
+    
+    if skipped:
+        for page in skipped:
+            pages_data.append(tokenize_page(page - 1, '', vocabulary))
+        pages_data.sort(key=lambda page_data: page_data['page_num'])
+    
+    return vocabulary.words, pages_data, pack_ngrams(ngram_counts), timings, tokenize_timings, skipped
+
+
+class ProgressTracker:
+    """
+    Cola de eventos de progreso segura entre hilos. Los workers sólo
+    encolan tuplas (barato y sin bloqueo); un único consumidor, por ejemplo
+    la interfaz cada cierto intervalo, las agrega con drain() y lee el
+    estado: páginas listas, bytes de texto, páginas/s, tiempo restante
+    estimado y tiempo acumulado por etapa.
+    """
+    
+    def __init__(self):
+        self.events = queue.SimpleQueue()
+        self.total_pages = 0
+        self.pages_done = 0
+        self.text_bytes = 0
+        self.stage_timings = {}
+        self.start_time = None
+        self.end_time = None
+        self.finished = False
+    
+    # Productores (cualquier hilo)
+    
+    def start(self, total_pages: int):
+        self.events.put(('start', total_pages, time.perf_counter()))
+    
+    def pages(self, count: int, text_bytes: int):
+        self.events.put(('pages', count, text_bytes))
+    
+    def stage(self, name: str, seconds: float):
+        self.events.put(('stage', name, seconds))
+    
+    def log(self, message: str):
+        self.events.put(('log', message))
+    
+    def finish(self):
+        self.events.put(('finish', time.perf_counter()))
+    
+    # Consumidor (un solo hilo)
+    
+    def drain(self) -> List[str]:
+        """Aplica los eventos pendientes al estado y devuelve los mensajes de log en orden"""
+        messages = []
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return messages
+            
+            kind = event[0]
+            if kind == 'log':
+                messages.append(event[1])
+            elif kind == 'pages':
+                self.pages_done += event[1]
+                self.text_bytes += event[2]
+            elif kind == 'stage':
+                self.stage_timings[event[1]] = self.stage_timings.get(event[1], 0.0) + event[2]
+            elif kind == 'start':
+                self.total_pages, self.start_time = event[1], event[2]
+                self.pages_done = self.text_bytes = 0
+                self.stage_timings = {}
+                self.end_time = None
+                self.finished = False
+            elif kind == 'finish':
+                self.end_time = event[1]
+                self.finished = True
+    
+    def snapshot(self) -> Dict:
+        elapsed = (self.end_time or time.perf_counter()) - self.start_time if self.start_time else 0.0
+        rate = self.pages_done / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.total_pages - self.pages_done)
+        return {
+            'pages_done': self.pages_done,
+            'total_pages': self.total_pages,
+            'text_bytes': self.text_bytes,
+            'elapsed': elapsed,
+            'pages_per_second': rate,
+            'eta': remaining / rate if rate > 0 else None,
+            'stage_timings': dict(self.stage_timings),
+            'finished': self.finished
+        }
+    
+    def format_status(self) -> str:
+        state = self.snapshot()
+        status = (f"{state['pages_done']}/{state['total_pages']} páginas · "
+                  f"{state['pages_per_second']:.1f} pág/s · {state['text_bytes'] / 1e6:.1f} MB de texto")
+        if state['eta'] is not None and not state['finished']:
+            status += f" · faltan ~{state['eta']:.0f} s"
+        return status
+
+
+class StageProfile:
+    """
+    Tiempo acumulado por etapa de un análisis y, para las etapas que se
+    miden por página (extracción y tokenización), el costo de cada página
+    para armar histogramas. Se alimenta desde varios hilos.
+    """
+    
+    STAGE_NAMES = {
+        'open': 'apertura',
+        'cache': 'caché',
+        'extract': 'extracción',
+        'tokenize': 'tokenización',
+        'merge': 'combinación',
+        'index': 'índice',
+        'render': 'interfaz',
+    }
+    HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)  # Límite superior de cada cubo
+    HISTOGRAM_WIDTH = 30
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}  # Etapa -> segundos
+        self.samples = {}  # Etapa -> array('d') de segundos por página
+        self.workers = {}  # (pid, hilo) -> [trozos, páginas, segundos ocupado]
+        self.dispatch_time = 0.0  # Segundos de reloj de las fases repartidas entre workers
+    
+    def add(self, stage: str, seconds: float, page_samples=()):
+        with self.lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            if page_samples:
+                self.samples.setdefault(stage, array('d')).extend(page_samples)
+    
+    def stages(self) -> List[str]:
+        """Etapas medidas en el orden del análisis (los lotes terminan en cualquier orden)"""
+        order = list(self.STAGE_NAMES)
+        return sorted(self.totals, key=lambda stage: order.index(stage) if stage in order else len(order))
+    
+    def percentiles(self, stage: str) -> Dict[str, float]:
+        values = sorted(self.samples.get(stage, ()))
+        if not values:
+            return {}
+        return {
+            'p50': values[len(values) // 2],
+            'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+            'max': values[-1]
+        }
+    
+    def histogram(self, stage: str) -> List[Tuple[str, int]]:
+        """Páginas por cubo de costo: [(etiqueta, páginas)], sin los cubos vacíos de los extremos"""
+        counts = [0] * (len(self.HISTOGRAM_BOUNDS_MS) + 1)
+        for seconds in self.samples.get(stage, ()):
+            counts[bisect_left(self.HISTOGRAM_BOUNDS_MS, seconds * 1000)] += 1
+        
+        labels = [f"≤{bound} ms" for bound in self.HISTOGRAM_BOUNDS_MS]
+        labels.append(f">{self.HISTOGRAM_BOUNDS_MS[-1]} ms")
+        used = [i for i, count in enumerate(counts) if count]
+        if not used:
+            return []
+        return list(zip(labels, counts))[used[0]:used[-1] + 1]
+    
+    def summary(self) -> Dict[str, Dict]:
+        """Para la salida JSON: etapa -> segundos, páginas medidas y percentiles en ms"""
+        result = {}
+        for stage in self.stages():
+            entry = {'segundos': round(self.totals[stage], 4)}
+            if stage in self.samples:
+                entry['paginas'] = len(self.samples[stage])
+                entry.update({name: round(value * 1000, 3) for name, value in self.percentiles(stage).items()})
+            result[stage] = entry
+        return result
+    
+    def add_chunk(self, worker: Tuple[int, int], pages: int, seconds: float):
+        with self.lock:
+            usage = self.workers.setdefault(worker, [0, 0, 0.0])
+            usage[0] += 1
+            usage[1] += pages
+            usage[2] += seconds
+    
+    def add_dispatch(self, seconds: float):
+        with self.lock:
+            self.dispatch_time += seconds
+    
+    def worker_usage(self) -> List[Dict]:
+        """Por worker, en orden de aparición: trozos, páginas, segundos ocupado y fracción del reparto"""
+        return [
+            {
+                'worker': number,
+                'lotes': chunks,
+                'paginas': pages,
+                'ocupado': round(busy, 4),
+                'utilizacion': round(busy / self.dispatch_time, 3) if self.dispatch_time else None
+            }
+            for number, (chunks, pages, busy) in enumerate(self.workers.values(), 1)
+        ]
+    
+    def bottleneck(self) -> Optional[str]:
+        extract, tokenize = self.totals.get('extract', 0.0), self.totals.get('tokenize', 0.0)
+        if not extract or not tokenize:
+            return None
+        if extract >= tokenize:
+            return f"extracción ({extract / tokenize:.1f}× la tokenización)"
+        return f"tokenización ({tokenize / extract:.1f}× la extracción)"
+    
+    def format_report(self, wall_time: float = None) -> List[str]:
+        lines = ["Perfil por etapa (tiempo acumulado de todos los workers):"]
+        for stage in self.stages():
+            seconds = self.totals[stage]
+            line = f"  {self.STAGE_NAMES.get(stage, stage):<13} {seconds:8.3f} s"
+            if wall_time:
+                line += f" ({seconds / wall_time:4.0%})"
+            stats = self.percentiles(stage)
+            if stats:
+                line += (f" · {len(self.samples[stage])} págs · p50 {stats['p50'] * 1000:.1f} ms"
+                         f" · p95 {stats['p95'] * 1000:.1f} ms · máx {stats['max'] * 1000:.1f} ms")
+            lines.append(line)
+        
+        for stage in self.stages():
+            buckets = self.histogram(stage)
+            if not buckets:
+                continue
+            lines.append(f"Histograma de {self.STAGE_NAMES.get(stage, stage)} por página:")
+            peak = max(count for _, count in buckets)
+            for label, count in buckets:
+                bar = '█' * max(1 if count else 0, round(count / peak * self.HISTOGRAM_WIDTH))
+                lines.append(f"  {label:>9} {bar} {count}")
+        
+        usage = self.worker_usage()
+        if usage:
+            lines.append(f"Utilización de workers ({self.dispatch_time:.2f} s de reparto):")
+            for entry in usage:
+                line = (f"  worker {entry['worker']:<3} {entry['lotes']:4} lotes · {entry['paginas']:5} págs"
+                        f" · {entry['ocupado']:8.3f} s")
+                if entry['utilizacion'] is not None:
+                    line += f" ({entry['utilizacion']:4.0%})"
+                lines.append(line)
+            busy = [entry['ocupado'] for entry in usage]
+            if sum(busy):
+                lines.append(f"Desbalance: el worker más ocupado trabajó {max(busy) / (sum(busy) / len(busy)):.2f}× "
+                             f"el promedio")
+        
+        bottleneck = self.bottleneck()
+        if bottleneck:
+            lines.append(f"Etapa dominante: {bottleneck}")
+        return lines
+
+
+def dump_cprofile(profiler: cProfile.Profile, path: str, callback=None):
+    """Guarda las estadísticas de cProfile (se leen con python -m pstats ARCHIVO)"""
+    profiler.disable()
+    try:
+        profiler.dump_stats(path)
+        if callback:
+            callback(f"Perfil de cProfile guardado en {path}")
+    except OSError as e:
+        if callback:
+            callback(f"No se pudo guardar el perfil de cProfile: {str(e)}")
+
+
+class AnalysisCache:
+    """
+    Caché en disco de análisis, indexada por el hash del contenido del PDF.
+    Cada entrada es un pickle comprimido con zlib; cuando el directorio
+    supera max_bytes se eliminan las entradas usadas hace más tiempo (LRU).
+    Las miniaturas de la interfaz cuentan también: la carpeta de cada PDF
+    es una entrada más y se elimina completa.
+    """
+    
+    VERSION = 5  # Incrementar cuando cambie el formato o la tokenización
+    DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".pdfcount_cache")
+    THUMBNAILS_DIR = "miniaturas"
+    
+    def __init__(self, cache_dir: str = None, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir or self.DEFAULT_DIR
+        self.max_bytes = max_bytes
+    
+    @staticmethod
+    def hash_file(pdf_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.v{self.VERSION}.bin")
+    
+    def index_path(self, key: str) -> str:
+        """Índice en disco (MappedIndex) de la misma entrada"""
+        return os.path.join(self.cache_dir, f"{key}.v{self.VERSION}.idx")
+    
+    def thumbnail_dir(self, pdf_hash: str) -> str:
+        """Carpeta de miniaturas PNG de un PDF, marcada como usada recientemente"""
+        path = os.path.join(self.cache_dir, self.THUMBNAILS_DIR, pdf_hash)
+        os.makedirs(path, exist_ok=True)
+        os.utime(path, None)
+        return path
+    
+    def load(self, key: str):
+        path = self.entry_path(key)
+        if not os.path.exists(path):
+            return None
+        
+        with open(path, 'rb') as file:
+            data = pickle.loads(zlib.decompress(file.read()))
+        
+        # Marcar la entrada como usada recientemente para el LRU
+        os.utime(path, None)
+        return data
+    
+    def store(self, key: str, data: Dict):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.entry_path(key)
+        # Único por proceso e hilo: varios análisis pueden guardar a la vez (ver PDFcount_server)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        
+        with open(tmp_path, 'wb') as file:
+            file.write(zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)))
+        os.replace(tmp_path, path)
+        
+        self.evict()
+    
+    def evict(self):
+        """Elimina las entradas menos usadas hasta quedar bajo max_bytes"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(('.bin', '.idx')):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # Otro análisis la eliminó mientras se recorría el directorio
+            entries.append((stat.st_mtime, stat.st_size, path))
+        
+        # Cada carpeta de miniaturas es una entrada: tamaño de sus PNG, fecha de la carpeta
+        thumbnails_root = os.path.join(self.cache_dir, self.THUMBNAILS_DIR)
+        if os.path.isdir(thumbnails_root):
+            for name in os.listdir(thumbnails_root):
+                path = os.path.join(thumbnails_root, name)
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.name.endswith('.png'))
+                    entries.append((os.stat(path).st_mtime, size, path))
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+        
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total_size -= size
+
+
+class MappedVocabulary(Vocabulary):
+    """
+    Vocabulario de solo lectura sobre un MappedIndex: las palabras se
+    decodifican al pedirlas y se buscan por búsqueda binaria en tablas de
+    ids ordenados por palabra y por forma sin acentos.
+    """
+    
+    def __init__(self, mapped: 'MappedIndex'):
+        self.mapped = mapped
+        self.trigram_index = None
+        self.trigram_index_size = 0
+    
+    def __len__(self) -> int:
+        return self.mapped.num_words
+    
+    def __getitem__(self, word_id: int) -> str:
+        return self.mapped.word(word_id)
+    
+    @property
+    def words(self) -> List[str]:
+        return [self.mapped.word(word_id) for word_id in range(self.mapped.num_words)]
+    
+    def add(self, word: str) -> int:
+        raise TypeError("El vocabulario de un índice en disco es de solo lectura")
+    
+    def _search(self, sorted_ids, key: str, transform) -> int:
+        lo, hi = 0, len(sorted_ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if transform(self.mapped.word(sorted_ids[mid])) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    def get(self, word: str) -> Optional[int]:
+        sorted_ids = self.mapped.sorted_ids
+        position = self._search(sorted_ids, word, str)
+        if position < len(sorted_ids) and self.mapped.word(sorted_ids[position]) == word:
+            return sorted_ids[position]
+        return None
+    
+    def folded_forms(self) -> List[str]:
+        return list(dict.fromkeys(fold_accents(self.mapped.word(word_id)) for word_id in self.mapped.folded_ids))
+    
+    def ids_for_folded(self, form: str) -> List[int]:
+        folded_ids = self.mapped.folded_ids
+        word_ids = []
+        position = self._search(folded_ids, form, fold_accents)
+        while position < len(folded_ids) and fold_accents(self.mapped.word(folded_ids[position])) == form:
+            word_ids.append(folded_ids[position])
+            position += 1
+        return word_ids
+
+
+class MappedPostings:
+    """Índice invertido posicional leído del MappedIndex, con la interfaz de PDFWordAnalyzer.index"""
+    
+    def __init__(self, mapped: 'MappedIndex'):
+        self.mapped = mapped
+    
+    def __contains__(self, word_id: int) -> bool:
+        pointers = self.mapped.postings_ptr
+        return word_id is not None and 0 <= word_id < self.mapped.num_words and pointers[word_id + 1] > pointers[word_id]
+    
+    def __getitem__(self, word_id: int):
+        if word_id not in self:
+            raise KeyError(word_id)
+        start, end = self.mapped.postings_ptr[word_id], self.mapped.postings_ptr[word_id + 1]
+        return self.mapped.posting_paragraphs[start:end], self.mapped.posting_positions[start:end]
+    
+    def get(self, word_id: int, default=None):
+        return self[word_id] if word_id in self else default
+
+
+class MappedWordCounts(Mapping):
+    """Conteos de palabras del MappedIndex con la parte de la interfaz de Counter que se usa"""
+    
+    def __init__(self, mapped: 'MappedIndex'):
+        self.mapped = mapped
+        self.vocabulary = MappedVocabulary(mapped)
+        self.size = sum(1 for count in mapped.word_totals if count)
+    
+    def __getitem__(self, word: str) -> int:
+        word_id = self.vocabulary.get(word)
+        count = self.mapped.word_totals[word_id] if word_id is not None else 0
+        if not count:
+            raise KeyError(word)
+        return count
+    
+    def __iter__(self):
+        return (word for word, _ in self.most_common())
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def values(self) -> List[int]:
+        return [count for count in self.mapped.word_totals if count]
+    
+    def most_common(self, n: int = None) -> List[Tuple[str, int]]:
+        """Lee la tabla de ids ordenada por frecuencia sin recorrer el vocabulario"""
+        top_ids = self.mapped.top_ids
+        limit = self.size if n is None else min(n, self.size)
+        return [(self.mapped.word(word_id), self.mapped.word_totals[word_id]) for word_id in top_ids[:limit]]
+
+
+class MappedIndex:
+    """
+    Índice de un documento analizado guardado en un archivo y abierto con
+    mmap: vocabulario, postings, párrafos y matriz página × palabra se leen
+    del archivo al consultarse, sin cargar las páginas en memoria. Varios
+    procesos pueden abrir el mismo archivo y compartir sus páginas en caché.
+    
+    Formato: cabecera (MAGIC, número de palabras, páginas y párrafos y la
+    tabla de secciones) seguida de las secciones, alineadas a 8 bytes.
+    """
+    
+    MAGIC = b'PDFIDX01'
+    # Nombre de la sección y su tipo de arreglo ('B' para bytes)
+    SECTIONS = [
+        ('word_offsets', 'Q'),  # Inicio de cada palabra en words_blob (más el final)
+        ('words_blob', 'B'),  # Palabras en UTF-8, en orden de id
+        ('sorted_ids', 'I'),  # Ids ordenados por palabra (búsqueda binaria)
+        ('folded_ids', 'I'),  # Ids ordenados por forma sin acentos
+        ('postings_ptr', 'Q'),  # Inicio de los postings de cada id (más el final)
+        ('posting_paragraphs', 'I'),
+        ('posting_positions', 'I'),
+        ('paragraph_pages', 'I'),
+        ('page_first_paragraph', 'I'),
+        ('paragraph_offsets', 'Q'),  # Inicio de cada párrafo en paragraphs_blob (más el final)
+        ('paragraphs_blob', 'B'),
+        ('matrix_indptr', 'I'),
+        ('matrix_pages', 'I'),
+        ('matrix_counts', 'I'),
+        ('top_ids', 'I'),  # Ids ordenados por frecuencia, de mayor a menor
+        ('word_totals', 'I'),
+    ]
+    HEADER = struct.Struct(f'<8sIII{2 * len(SECTIONS)}Q')
+    
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, self.num_words, self.num_pages, self.num_paragraphs, *table = self.HEADER.unpack_from(self.buffer)
+        if magic != self.MAGIC:
+            raise ValueError(f"No es un índice de PDFcount: {path}")
+        
+        view = memoryview(self.buffer)
+        for i, (name, typecode) in enumerate(self.SECTIONS):
+            offset, length = table[2 * i], table[2 * i + 1]
+            setattr(self, name, view[offset:offset + length].cast(typecode))
+    
+    def word(self, word_id: int) -> str:
+        start, end = self.word_offsets[word_id], self.word_offsets[word_id + 1]
+        return bytes(self.words_blob[start:end]).decode('utf-8')
+    
+    def paragraph(self, global_para: int) -> str:
+        start, end = self.paragraph_offsets[global_para], self.paragraph_offsets[global_para + 1]
+        return bytes(self.paragraphs_blob[start:end]).decode('utf-8')
+    
+    @classmethod
+    def write(cls, path: str, analyzer: 'PDFWordAnalyzer'):
+        """Guarda el índice de un análisis ya hecho (con índice y matriz construidos)"""
+        words = analyzer.vocabulary.words
+        num_words = len(words)
+        
+        encoded = [word.encode('utf-8') for word in words]
+        word_offsets = array('Q', [0])
+        for word in encoded:
+            word_offsets.append(word_offsets[-1] + len(word))
+        
+        postings_ptr = array('Q', [0])
+        posting_paragraphs = array('I')
+        posting_positions = array('I')
+        word_totals = array('I', bytes(4 * num_words))
+        for word_id in range(num_words):
+            postings = analyzer.index.get(word_id)
+            if postings:
+                posting_paragraphs.extend(postings[0])
+                posting_positions.extend(postings[1])
+            postings_ptr.append(len(posting_paragraphs))
+        for word, count in analyzer.word_counts.items():
+            word_totals[analyzer.vocabulary.get(word)] = count
+        
+        paragraph_offsets = array('Q', [0])
+        paragraph_chunks = []
+        for page_data in analyzer.pages_data:
+            for paragraph in analyzer.get_paragraphs(page_data):
+                chunk = paragraph.encode('utf-8')
+                paragraph_chunks.append(chunk)
+                paragraph_offsets.append(paragraph_offsets[-1] + len(chunk))
+        
+        matrix = analyzer.page_matrix
+        sections = {
+            'word_offsets': word_offsets,
+            'words_blob': b''.join(encoded),
+            'sorted_ids': array('I', sorted(range(num_words), key=words.__getitem__)),
+            'folded_ids': array('I', sorted(range(num_words), key=lambda word_id: fold_accents(words[word_id]))),
+            'postings_ptr': postings_ptr,
+            'posting_paragraphs': posting_paragraphs,
+            'posting_positions': posting_positions,
+            'paragraph_pages': analyzer.paragraph_pages,
+            'page_first_paragraph': analyzer.page_first_paragraph,
+            'paragraph_offsets': paragraph_offsets,
+            'paragraphs_blob': b''.join(paragraph_chunks),
+            'matrix_indptr': matrix.indptr,
+            'matrix_pages': matrix.page_indices,
+            'matrix_counts': matrix.counts,
+            'top_ids': array('I', sorted(range(num_words), key=lambda word_id: -word_totals[word_id])),
+            'word_totals': word_totals,
+        }
+        
+        table = []
+        offset = cls.HEADER.size
+        for name, _ in cls.SECTIONS:
+            offset += -offset % 8
+            length = len(memoryview(sections[name]).cast('B'))
+            table.extend((offset, length))
+            offset += length
+        
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(cls.HEADER.pack(cls.MAGIC, num_words, len(analyzer.page_first_paragraph),
+                                       len(analyzer.paragraph_pages), *table))
+            for i, (name, _) in enumerate(cls.SECTIONS):
+                file.write(bytes(table[2 * i] - file.tell()))
+                file.write(memoryview(sections[name]).cast('B'))
+        os.replace(tmp_path, path)
 
-# Configurar el tema de customtkinter
-ctk.set_appearance_mode("dark")
-ctk.set_default_color_theme("blue")
 
 class PDFWordAnalyzer:
-    def __init__(self, pdf_path: str, num_workers: int = None, callback=None):
+    def __init__(self, pdf_path: str, num_workers: int = None, callback=None, use_processes: bool = False,
+                 backend: str = 'pypdf2', use_cache: bool = True, cache: AnalysisCache = None,
+                 stopwords=None, max_ngram: int = 2, approximate: bool = False, sketch_capacity: int = 10000,
+                 disk_index: bool = False, progress: ProgressTracker = None, page_timeout: float = None,
+                 cprofile_path: str = None):
+        if backend not in EXTRACTION_BACKENDS:
+            raise ValueError(f"Backend de extracción desconocido: {backend}")
         self.pdf_path = pdf_path
         self.word_counts = Counter()
+        self.max_ngram = max(1, max_ngram)
+        self.ngram_counts = {}  # Tamaño -> NgramTable, al terminar el análisis
+        self.ngram_counters = self.empty_ngram_counts()  # Tamaño -> Counter de claves, mientras se cuenta
+        self.stopwords = frozenset(stopwords or ())  # Se omiten en los rankings, no en las búsquedas
+        # Modo aproximado: sólo resúmenes de memoria acotada, sin páginas ni índice de búsqueda
+        self.approximate = approximate
+        self.sketch_capacity = sketch_capacity
+        self.sketches = {}  # Tamaño de n-grama (1 = palabras) -> HeavyHitters
+        # Guardar el índice en disco junto a la caché y abrirlo con mmap en vez de cargar las páginas
+        self.disk_index = disk_index
+        self.mapped_index = None
+        self.progress = progress  # ProgressTracker opcional para la interfaz
+        self.profile = StageProfile()  # Tiempo por etapa y por página del último análisis
+        self.cprofile_path = cprofile_path  # Si se indica, guarda ahí un perfil de cProfile de analyze()
+        # Segundos máximos por página (None = sin límite); las páginas que lo superan se omiten
+        self.page_timeout = page_timeout
+        self.skipped_pages = {}  # Número de página -> motivo
+        # Lo revisan el hilo de análisis, los lotes y los procesos del pool (ver cancel)
+        self.cancel_event = multiprocessing.Event()
+        self.cancelled = False
         self.num_workers = num_workers or os.cpu_count()
         self.callback = callback
+        self.use_processes = use_processes  # Extraer y contar en procesos separados (evita el GIL)
         self.analysis_time = 0
-        self.pages_data = []  # Almacenar datos de páginas para búsqueda
-        
+        self.pages_data = []  # Páginas tokenizadas (ver tokenize_page)
+        self.vocabulary = Vocabulary()
+        self.page_fingerprints = []  # Hash del contenido de cada página (análisis incremental)
+        self.index = None  # Índice invertido posicional: id de palabra -> (párrafos, posiciones)
+        self.paragraph_pages = array('I')  # Párrafo global -> índice de página
+        self.page_first_paragraph = array('I')  # Página -> primer párrafo global
+        self.page_matrix = None  # Conteos página × palabra (PageTermMatrix)
+        self.backend = backend
+        self.page_timings = {}  # Tiempo de extracción por página (segundos)
+        self.use_cache = use_cache
+        self.cache = cache or AnalysisCache()
+        self.from_cache = False
+        self.failed_batches = 0
+        self.error = None  # Mensaje del error que impidió terminar el último análisis
+    
+    def open_extractor(self):
+        return EXTRACTION_BACKENDS[self.backend](self.pdf_path)
+    
+    def process_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.num_workers, initializer=init_worker,
+                                   initargs=(self.cancel_event,))
+    
+    def cancel(self):
+        """Pide detener el análisis en curso; se puede llamar desde cualquier hilo"""
+        self.cancel_event.set()
+    
+    def record_skipped(self, skipped: Dict[int, str]):
+        self.skipped_pages.update(skipped)
+        if self.callback:
+            for page, reason in sorted(skipped.items()):
+                self.callback(f"⚠ Página {page} omitida: {reason}")
+    
     def clean_text(self, text: str) -> List[str]:
         text = text.lower()
-        words = re.findall(r'\b[a-záéíóúñü]+\b', text)
+        words = WORD_PATTERN.findall(text)
         return words
     
     def extract_paragraphs(self, text: str) -> List[str]:
@@ -37,876 +1572,1631 @@ class PDFWordAnalyzer:
         paragraphs = [p.strip() for p in text.split('\n') if p.strip()]
         return paragraphs
     
-    def process_pages_batch(self, pages_data: List[Tuple[int, str]]) -> Counter:
-        batch_counter = Counter()
+    def reset_results(self):
+        self.profile = StageProfile()
+        self.page_timings = {}
+        self.skipped_pages = {}
+        self.from_cache = False
+        self.word_counts = Counter()
+        self.ngram_counts = {}
+        self.ngram_counters = self.empty_ngram_counts()
+        self.sketches = {}
+        self.vocabulary = Vocabulary()
+        self.pages_data = []
+        self.index = None
+        self.page_matrix = None
+        self.mapped_index = None
+    
+    def empty_ngram_counts(self) -> Dict[int, Counter]:
+        return empty_ngram_counts(self.max_ngram)
+    
+    def process_pages_batch(self, pages_data: List[Tuple[int, str]]
+                            ) -> Tuple[List[str], List[Dict], Dict[int, Tuple[array, array, array]]]:
+        """
+        Tokeniza un lote con un vocabulario local (sin compartir estado entre
+        hilos) y cuenta sus n-gramas sobre esos mismos ids locales.
+        """
+        vocabulary = Vocabulary()
+        batch_pages = []
+        ngram_counts = self.empty_ngram_counts()
+        timings = array('d')
         
         for page_num, page_text in pages_data:
-            words = self.clean_text(page_text)
-            batch_counter.update(words)
+            if self.cancel_event.is_set():
+                raise AnalysisCancelled()
+            page_start = time.perf_counter()
+            batch_pages.append(tokenize_page(page_num, page_text, vocabulary))
+            count_ngrams(batch_pages[-1]['tokens'], ngram_counts)
+            timings.append(time.perf_counter() - page_start)
+        
+        self.report_stage('tokenize', sum(timings), timings)
+        return vocabulary.words, batch_pages, pack_ngrams(ngram_counts)
+    
+    def merge_batch(self, batch_words: List[str], batch_pages: List[Dict],
+                    batch_ngrams: Dict[int, Tuple[array, array, array]], new_pages: Dict[int, Dict]):
+        """
+        Traduce los ids locales de un lote al vocabulario global y suma sus
+        conteos. Los n-gramas ya vienen contados por el worker: sólo se
+        traducen sus claves (ver pack_ngrams), sin volver a recorrer los tokens.
+        """
+        merge_start = time.perf_counter()
+        id_map = self.vocabulary.merge(batch_words)
+        id_counts = Counter()
+        
+        for page_data in batch_pages:
+            page_data['tokens'] = array('I', [id_map[token] for token in page_data['tokens']])
+            id_counts.update(page_data['tokens'])
+            new_pages[page_data['page_num'] - 1] = page_data
+        
+        for word_id, count in id_counts.items():
+            self.word_counts[self.vocabulary[word_id]] += count
+        
+        # Los ids de las claves se traducen de una vez (itemgetter recorre en C) y
+        # se combinan en claves enteras (ver ngram_keys); id_map es inyectivo, así
+        # que no se mezclan claves. Counter.update con un iterable cuenta en C; las
+        # repetidas se expanden con repeat
+        global_ids = id_map.tolist()  # Enteros ya creados: traducir no crea uno por id
+        for size, (once, repeated, counts) in batch_ngrams.items():
+            target = self.ngram_counters[size]
+            if once:
+                ids = itemgetter(*once)(global_ids)
+                target.update(ngram_keys([ids[i::size] for i in range(size)]))
+            if repeated:
+                ids = itemgetter(*repeated)(global_ids)
+                keys = ngram_keys([ids[i::size] for i in range(size)])
+                target.update(chain.from_iterable(map(repeat, keys, counts)))
+        
+        self.report_stage('merge', time.perf_counter() - merge_start)
+    
+    def report_pages(self, count: int, texts: List[str] = ()):
+        if self.progress:
+            self.progress.pages(count, sum(len(text.encode('utf-8')) for text in texts))
+    
+    def report_stage(self, name: str, seconds: float, page_samples=()):
+        self.profile.add(name, seconds, page_samples)
+        if self.progress:
+            self.progress.stage(name, seconds)
+    
+    def report_page_costs(self, name: str, timings: Dict[int, float]):
+        """Etapa medida por página (número de página -> segundos)"""
+        self.report_stage(name, sum(timings.values()), timings.values())
+    
+    def get_paragraphs(self, page_data: Dict) -> List[str]:
+        """Reconstruye los párrafos de una página a partir de sus offsets"""
+        text = page_data['text']
+        spans = page_data['paragraph_spans']
+        return [text[spans[i]:spans[i + 1]] for i in range(0, len(spans), 2)]
+    
+    def get_paragraph(self, page_data: Dict, para_idx: int) -> str:
+        spans = page_data['paragraph_spans']
+        return page_data['text'][spans[2 * para_idx]:spans[2 * para_idx + 1]]
+    
+    def page_word_counts(self, page_data: Dict) -> Counter:
+        return Counter({
+            self.vocabulary[word_id]: count
+            for word_id, count in Counter(page_data['tokens']).items()
+        })
+    
+    def page_ngram_counts(self, page_data: Dict) -> Dict[int, Counter]:
+        """Conteos de n-gramas de una página como Counter de claves (ver ngram_keys)"""
+        tokens = page_data['tokens']
+        return {
+            size: Counter(ngram_keys([tokens[i:] for i in range(size)]))
+            for size in range(2, self.max_ngram + 1)
+        }
+    
+    def plan_batches(self, items: List, costs: List[float]) -> List[List]:
+        """Lotes de costo parecido, del más caro al más barato (ver plan_chunks)"""
+        return plan_chunks(items, costs, self.num_workers)
+    
+    def estimate_page_costs(self, page_nums: List[int], page_sizes: List[int] = None) -> List[float]:
+        """
+        Costo de cada página antes de extraerla, por el tamaño de su flujo de
+        contenido; page_sizes (índice de página -> bytes) evita volver a leerlo.
+        """
+        if page_sizes is not None:
+            return [page_sizes[page_num] + PAGE_COST_OVERHEAD for page_num in page_nums]
+        extractor = self.open_extractor()
+        try:
+            return [extractor.content_size(page_num) + PAGE_COST_OVERHEAD for page_num in page_nums]
+        finally:
+            extractor.close()
+    
+    def analyze(self):
+        start_time = time.time()
+        
+        if self.callback:
+            self.callback(f"Abriendo PDF: {self.pdf_path}")
+            self.callback(f"Usando {self.num_workers} workers")
+            self.callback(f"Backend de extracción: {self.backend}\n")
+        
+        # cProfile sólo ve este hilo: con procesos, el trabajo de los workers no aparece
+        profiler = cProfile.Profile() if self.cprofile_path else None
+        if profiler:
+            profiler.enable()
+        
+        try:
+            self.cancel_event.clear()
+            self.cancelled = False
+            self.error = None
+            self.reset_results()
+            cache_key = None
+            
+            if self.approximate:
+                self.analyze_approximate()
+                self.analysis_time = time.time() - start_time
+                if self.callback:
+                    self.callback("Análisis aproximado completado!")
+                    self.callback(f"Tiempo de análisis: {self.analysis_time:.2f} segundos")
+                    self.callback(f"Total de palabras: {self.get_total_words()}")
+                    self.callback(f"Error máximo por conteo: {self.sketches[1].error} "
+                                  f"({self.sketch_capacity} contadores por resumen)")
+                    self.log_extraction_timings()
+                    self.log_stage_profile()
+                return
+            
+            if self.use_cache:
+                cache_start = time.perf_counter()
+                cache_key = self.content_cache_key()
+                if self.disk_index and self.open_disk_index(cache_key):
+                    self.report_stage('cache', time.perf_counter() - cache_start)
+                    self.analysis_time = time.time() - start_time
+                    if self.callback:
+                        self.callback("Índice en disco abierto (mmap), sin cargar las páginas")
+                        self.callback(f"Tiempo de análisis: {self.analysis_time:.2f} segundos")
+                        self.callback(f"Total de palabras únicas: {len(self.word_counts)}")
+                        self.callback(f"Total de palabras: {sum(self.word_counts.values())}")
+                        self.log_stage_profile()
+                    return
+                if self.load_from_cache(cache_key):
+                    self.report_stage('cache', time.perf_counter() - cache_start)
+                    index_start = time.perf_counter()
+                    self.build_search_structures()
+                    self.report_stage('index', time.perf_counter() - index_start)
+                    if self.disk_index:
+                        self.save_disk_index(cache_key)
+                    self.analysis_time = time.time() - start_time
+                    if self.callback:
+                        self.callback("Resultados cargados de la caché")
+                        self.callback(f"Tiempo de análisis: {self.analysis_time:.2f} segundos")
+                        self.callback(f"Total de palabras únicas: {len(self.word_counts)}")
+                        self.callback(f"Total de palabras: {sum(self.word_counts.values())}")
+                        self.log_stage_profile()
+                    return
+            
+            open_start = time.perf_counter()
+            extractor = self.open_extractor()
+            page_sizes = None  # Bytes del flujo de contenido por página, para planificar los lotes de procesos
+            try:
+                total_pages = extractor.page_count()
+                if self.use_cache:
+                    # Huella (análisis incremental) y tamaño en una sola lectura de cada página
+                    summaries = [extractor.page_summary(i) for i in range(total_pages)]
+                    self.page_fingerprints = [fingerprint for fingerprint, _ in summaries]
+                    page_sizes = [size for _, size in summaries]
+                elif self.use_processes:
+                    page_sizes = [extractor.content_size(i) for i in range(total_pages)]
+            finally:
+                extractor.close()
+            self.report_stage('open', time.perf_counter() - open_start)
             if self.callback:
-                self.callback(f"✓ Página {page_num + 1} procesada: {len(words)} palabras")
+                self.callback(f"Total de páginas: {total_pages}")
+            
+            # Reutilizar las páginas que no cambiaron desde el último análisis de este archivo
+            reused_pages = self.reuse_previous_pages() if self.use_cache else {}
+            pending_pages = [i for i in range(total_pages) if i not in reused_pages]
+            if self.progress:
+                self.progress.start(len(pending_pages))
+            if reused_pages and self.callback:
+                self.callback(f"Páginas sin cambios reutilizadas: {len(reused_pages)}, "
+                              f"páginas a analizar: {len(pending_pages)}")
+            
+            self.failed_batches = 0
+            new_pages = {}
+            if pending_pages:
+                if self.use_processes:
+                    new_pages = self.analyze_with_processes(pending_pages, page_sizes)
+                else:
+                    new_pages = self.analyze_with_threads(pending_pages)
+            
+            index_start = time.perf_counter()
+            self.assemble_pages(total_pages, reused_pages, new_pages)
+            index_time = time.perf_counter() - index_start
+            self.report_stage('index', index_time)
+            if self.callback:
+                self.callback(f"Índice de búsqueda construido en {index_time:.2f} s")
+            
+            self.analysis_time = time.time() - start_time
+            
+            if self.callback:
+                self.callback(f"Análisis completado!")
+                self.callback(f"Tiempo de análisis: {self.analysis_time:.2f} segundos")
+                self.callback(f"Total de palabras únicas: {len(self.word_counts)}")
+                self.callback(f"Total de palabras: {sum(self.word_counts.values())}")
+                self.log_extraction_timings()
+                self.log_stage_profile()
+            
+            # No guardar resultados incompletos
+            if cache_key and not self.failed_batches and not self.skipped_pages:
+                self.save_to_cache(cache_key)
+                if self.disk_index:
+                    self.save_disk_index(cache_key)
+                
+        except AnalysisCancelled:
+            # Un resultado parcial no sirve para rankings ni búsquedas: se descarta
+            self.cancelled = True
+            self.reset_results()
+            if self.callback:
+                self.callback("Análisis cancelado")
+        except FileNotFoundError:
+            self.error = f"No se encontró el archivo {self.pdf_path}"
+            if self.callback:
+                self.callback(f"Error: {self.error}")
+        except Exception as e:
+            self.error = str(e)
+            if self.callback:
+                self.callback(f"Error al procesar el PDF: {str(e)}")
+        finally:
+            if profiler:
+                dump_cprofile(profiler, self.cprofile_path, self.callback)
+            if self.progress:
+                self.progress.finish()
+    
+    def analyze_approximate(self):
+        """
+        Modo de memoria acotada: las páginas se cuentan y se descartan. Cada
+        lote llena sus propios resúmenes, en un proceso o en un hilo, y aquí
+        sólo se combinan.
+        """
+        open_start = time.perf_counter()
+        extractor = self.open_extractor()
+        try:
+            total_pages = extractor.page_count()
+        finally:
+            extractor.close()
+        self.report_stage('open', time.perf_counter() - open_start)
+        if self.callback:
+            self.callback(f"Total de páginas: {total_pages}")
+        if self.progress:
+            self.progress.start(total_pages)
+        
+        self.failed_batches = 0
+        self.sketches = {size: HeavyHitters(self.sketch_capacity) for size in range(1, self.max_ngram + 1)}
+        
+        page_nums = list(range(total_pages))
+        # Los procesos reciben la cancelación por init_worker; los hilos, el evento de este analizador
+        if self.use_processes:
+            plan_start = time.perf_counter()
+            batches = self.plan_batches(page_nums, self.estimate_page_costs(page_nums))
+            self.report_stage('open', time.perf_counter() - plan_start)
+            executor = self.process_pool()
+            cancel_args = ()
+        else:
+            # Los hilos comparten el GIL: alcanza un tramo contiguo por hilo, sin estimar
+            # costos ni reabrir el PDF por cada lote
+            batches = plan_chunks(page_nums, [1.0] * total_pages, self.num_workers, chunks_per_worker=1)
+            executor = ThreadPoolExecutor(max_workers=self.num_workers)
+            cancel_args = (self.cancel_event,)
+        
+        dispatch_start = time.perf_counter()
+        with executor:
+            submit = lambda batch: executor.submit(run_chunk, sketch_pages_worker, self.pdf_path, batch,
+                                                   self.backend, self.sketch_capacity, self.max_ngram,
+                                                   self.page_timeout, *cancel_args)
+            for batch_num, future in iter_dispatched(submit, batches, self.cancel_event, self.num_workers * 2):
+                try:
+                    worker, busy, (batch_sketches, batch_timings, count_timings, batch_skipped) = future.result()
+                    self.profile.add_chunk(worker, len(batches[batch_num]), busy)
+                    self.merge_sketches(batch_sketches)
+                    self.page_timings.update(batch_timings)
+                    self.record_skipped(batch_skipped)
+                    self.report_pages(len(batch_timings) + len(batch_skipped))
+                    self.report_page_costs('extract', batch_timings)
+                    self.report_page_costs('tokenize', count_timings)
+                    if self.callback:
+                        self.callback(f"→ Lote {batch_num + 1} completado\n")
+                except AnalysisCancelled:
+                    raise
+                except Exception as e:
+                    self.failed_batches += 1
+                    if self.callback:
+                        self.callback(f"Error en lote {batch_num}: {str(e)}")
+        self.profile.add_dispatch(time.perf_counter() - dispatch_start)
+        
+        self.word_counts = Counter(self.sketches[1].counts)
+    
+    def merge_sketches(self, batch_sketches: Dict[int, HeavyHitters]):
+        for size, sketch in batch_sketches.items():
+            self.sketches[size].merge(sketch)
+    
+    def get_total_words(self) -> int:
+        if self.approximate:
+            return self.sketches[1].total if self.sketches else 0
+        return sum(self.word_counts.values())
+    
+    def get_error_bounds(self) -> Dict[int, int]:
+        """Modo aproximado: cuánto puede faltarle, como máximo, a cada conteo (por tamaño de n-grama)"""
+        return {size: sketch.error for size, sketch in self.sketches.items()}
+    
+    def assemble_pages(self, total_pages: int, reused_pages: Dict[int, Dict], new_pages: Dict[int, Dict]):
+        """Ordena las páginas reutilizadas y nuevas y construye las estructuras de búsqueda"""
+        self.pages_data = [
+            reused_pages.get(i) or new_pages.get(i) or tokenize_page(i, '', self.vocabulary)
+            for i in range(total_pages)
+        ]
+        self.freeze_ngrams()
+        self.build_search_structures()
+    
+    def freeze_ngrams(self):
+        """Pasa los n-gramas contados a su forma compacta (ver NgramTable)"""
+        for size in sorted(self.ngram_counters):
+            # pop: cada Counter se libera antes de compactar el siguiente
+            self.ngram_counts[size] = NgramTable(size, self.ngram_counters.pop(size), len(self.vocabulary))
+        self.ngram_counters = self.empty_ngram_counts()
+    
+    def build_search_structures(self):
+        self.build_index()
+        self.build_page_matrix()
+    
+    def content_cache_key(self) -> str:
+        return f"{AnalysisCache.hash_file(self.pdf_path)}_{self.backend}_n{self.max_ngram}"
+    
+    def last_run_key(self) -> str:
+        """Clave del puntero al último análisis de esta ruta de archivo"""
+        path_hash = hashlib.sha256(os.path.abspath(self.pdf_path).encode('utf-8')).hexdigest()
+        return f"ultimo_{path_hash}_{self.backend}_n{self.max_ngram}"
+    
+    def reuse_previous_pages(self) -> Dict[int, Dict]:
+        """
+        Compara las huellas de las páginas con el último análisis de este
+        archivo. Devuelve las páginas reutilizables (índice -> datos) y deja
+        word_counts y ngram_counters con los conteos previos menos los de las
+        páginas que ya no existen o cambiaron.
+        """
+        try:
+            pointer = self.cache.load(self.last_run_key())
+            previous = self.cache.load(pointer['content_key']) if pointer else None
+        except Exception:
+            previous = None
+        
+        if not previous:
+            return {}
+        
+        available = {}
+        for prev_index, fingerprint in enumerate(previous['page_fingerprints']):
+            available.setdefault(fingerprint, []).append(prev_index)
+        
+        reused_pages = {}
+        used = set()
+        for page_index, fingerprint in enumerate(self.page_fingerprints):
+            candidates = available.get(fingerprint)
+            if candidates:
+                prev_index = candidates.pop(0)
+                used.add(prev_index)
+                reused_pages[page_index] = dict(previous['pages_data'][prev_index], page_num=page_index + 1)
+        
+        if not reused_pages:
+            return {}
+        
+        # Las páginas reutilizadas conservan sus ids: se parte del vocabulario anterior
+        self.vocabulary = Vocabulary(previous['vocabulary'])
+        self.word_counts = Counter(previous['word_counts'])
+        self.ngram_counters = {size: table.key_counts() for size, table in previous['ngram_counts'].items()}
+        for prev_index, page_data in enumerate(previous['pages_data']):
+            if prev_index not in used:
+                self.word_counts.subtract(self.page_word_counts(page_data))
+                for size, counts in self.page_ngram_counts(page_data).items():
+                    self.ngram_counters[size].subtract(counts)
+        # Quitar conteos en cero
+        self.word_counts = +self.word_counts
+        self.ngram_counters = {size: +counts for size, counts in self.ngram_counters.items()}
+        
+        return reused_pages
+    
+    def load_from_cache(self, cache_key: str) -> bool:
+        try:
+            data = self.cache.load(cache_key)
+        except Exception as e:
+            if self.callback:
+                self.callback(f"Caché ilegible, se reanaliza: {str(e)}")
+            return False
+        
+        if data is None:
+            return False
+        
+        self.pages_data = data['pages_data']
+        self.vocabulary = Vocabulary(data['vocabulary'])
+        self.word_counts = Counter(data['word_counts'])
+        self.ngram_counts = data['ngram_counts']
+        self.page_timings = data['page_timings']
+        self.page_fingerprints = data['page_fingerprints']
+        self.from_cache = True
+        return True
+    
+    def save_to_cache(self, cache_key: str):
+        try:
+            self.cache.store(cache_key, {
+                'pages_data': self.pages_data,
+                'vocabulary': self.vocabulary.words,
+                'word_counts': dict(self.word_counts),
+                'ngram_counts': self.ngram_counts,
+                'page_timings': self.page_timings,
+                'page_fingerprints': self.page_fingerprints
+            })
+            self.cache.store(self.last_run_key(), {'content_key': cache_key})
+        except Exception as e:
+            if self.callback:
+                self.callback(f"No se pudo guardar en caché: {str(e)}")
+    
+    def open_disk_index(self, cache_key: str) -> bool:
+        """Abre el índice en disco de este contenido, si existe, en lugar de cargar las páginas"""
+        path = self.cache.index_path(cache_key)
+        if not os.path.exists(path):
+            return False
+        try:
+            mapped = MappedIndex(path)
+        except Exception as e:
+            if self.callback:
+                self.callback(f"Índice en disco ilegible, se usa la caché: {str(e)}")
+            return False
         
-        return batch_counter
+        self.mapped_index = mapped
+        self.vocabulary = MappedVocabulary(mapped)
+        self.word_counts = MappedWordCounts(mapped)
+        self.index = MappedPostings(mapped)
+        self.paragraph_pages = mapped.paragraph_pages
+        self.page_first_paragraph = mapped.page_first_paragraph
+        self.page_matrix = PageTermMatrix.from_arrays(
+            mapped.num_pages, mapped.matrix_indptr, mapped.matrix_pages, mapped.matrix_counts
+        )
+        self.pages_data = []
+        self.ngram_counts = {}  # Los n-gramas no se guardan en el índice
+        self.from_cache = True
+        return True
+    
+    def save_disk_index(self, cache_key: str):
+        try:
+            MappedIndex.write(self.cache.index_path(cache_key), self)
+            self.cache.evict()
+        except Exception as e:
+            if self.callback:
+                self.callback(f"No se pudo guardar el índice en disco: {str(e)}")
+    
+    def get_page_numbers(self) -> List[int]:
+        if self.mapped_index:
+            return list(range(1, self.mapped_index.num_pages + 1))
+        return [page_data['page_num'] for page_data in self.pages_data]
     
-    def distribute_pages(self, total_pages: int, pages_text: List[Tuple[int, str]]) -> List[List[Tuple[int, str]]]:
-        pages_per_worker = max(1, total_pages // self.num_workers)
-        batches = []
+    def paragraph_text(self, global_para: int) -> str:
+        if self.mapped_index:
+            return self.mapped_index.paragraph(global_para)
+        page_idx = self.paragraph_pages[global_para]
+        return self.get_paragraph(self.pages_data[page_idx], global_para - self.page_first_paragraph[page_idx])
+    
+    def analyze_with_processes(self, page_nums: List[int], page_sizes: List[int] = None) -> Dict[int, Dict]:
+        """
+        Cada proceso abre el PDF, extrae y cuenta su propio rango de páginas.
+        Los rangos se arman por tamaño estimado (no por número de páginas) y
+        se entregan a demanda: un proceso que termina pide el siguiente.
+        """
+        plan_start = time.perf_counter()
+        batches = self.plan_batches(page_nums, self.estimate_page_costs(page_nums, page_sizes))
+        self.report_stage('open', time.perf_counter() - plan_start)
+        if self.callback:
+            self.callback(f"Páginas distribuidas en {len(batches)} lotes (procesos)\n")
         
-        for i in range(0, total_pages, pages_per_worker):
-            batch = pages_text[i:i + pages_per_worker]
-            if batch:
-                batches.append(batch)
+        new_pages = {}
+        dispatch_start = time.perf_counter()
+        with self.process_pool() as executor:
+            submit = lambda batch: executor.submit(run_chunk, extract_pages_worker, self.pdf_path, batch,
+                                                   self.backend, self.page_timeout, self.max_ngram)
+            
+            for batch_num, future in iter_dispatched(submit, batches, self.cancel_event, self.num_workers * 2):
+                try:
+                    worker, busy, (batch_words, batch_pages, batch_ngrams, batch_timings, tokenize_timings,
+                                   batch_skipped) = future.result()
+                    self.profile.add_chunk(worker, len(batch_pages), busy)
+                    self.merge_batch(batch_words, batch_pages, batch_ngrams, new_pages)
+                    self.page_timings.update(batch_timings)
+                    self.record_skipped(batch_skipped)
+                    self.report_pages(len(batch_pages), [page['text'] for page in batch_pages])
+                    self.report_page_costs('extract', batch_timings)
+                    self.report_page_costs('tokenize', tokenize_timings)
+                    if self.callback:
+                        first, last = batch_pages[0]['page_num'], batch_pages[-1]['page_num']
+                        self.callback(f"→ Lote {batch_num + 1} completado (páginas {first}-{last})\n")
+                except AnalysisCancelled:
+                    raise
+                except Exception as e:
+                    self.failed_batches += 1
+                    if self.callback:
+                        self.callback(f"Error en lote {batch_num}: {str(e)}")
+        self.profile.add_dispatch(time.perf_counter() - dispatch_start)
+        
+        return new_pages
+    
+    def analyze_with_threads(self, page_nums: List[int]) -> Dict[int, Dict]:
+        # Extraer texto de las páginas y guardar para búsqueda
+        if self.callback:
+            self.callback("Extrayendo texto...")
+        pages_text = []
+        new_pages = {}
+        skipped = {}
+        
+        for page_num, page_text, page_time in iter_page_texts(self.pdf_path, self.backend, page_nums,
+                                                              self.page_timeout, self.cancel_event, skipped):
+            self.page_timings[page_num + 1] = page_time
+            pages_text.append((page_num, page_text))
+            # La extracción es la etapa lenta: el progreso se cuenta por página extraída
+            self.report_pages(1, [page_text])
+            self.report_stage('extract', page_time, (page_time,))
+        
+        # Las páginas omitidas quedan vacías
+        if skipped:
+            self.record_skipped(skipped)
+            pages_text.extend((page - 1, '') for page in skipped)
+            pages_text.sort()
+        
+        # Lotes de tamaño de texto parecido, repartidos a demanda entre los hilos
+        batches = self.plan_batches(pages_text, [len(text) + PAGE_COST_OVERHEAD for _, text in pages_text])
+        if self.callback:
+            self.callback(f"Páginas distribuidas en {len(batches)} lotes\n")
         
-        return batches
+        # Procesar con ThreadPoolExecutor
+        dispatch_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            submit = lambda batch: executor.submit(run_chunk, self.process_pages_batch, batch)
+            
+            for batch_num, future in iter_dispatched(submit, batches, self.cancel_event, self.num_workers * 2):
+                try:
+                    worker, busy, (batch_words, batch_pages, batch_ngrams) = future.result()
+                    self.profile.add_chunk(worker, len(batch_pages), busy)
+                    self.merge_batch(batch_words, batch_pages, batch_ngrams, new_pages)
+                    if self.callback:
+                        self.callback(f"→ Lote {batch_num + 1} completado\n")
+                except AnalysisCancelled:
+                    raise
+                except Exception as e:
+                    self.failed_batches += 1
+                    if self.callback:
+                        self.callback(f"Error en lote {batch_num}: {str(e)}")
+        self.profile.add_dispatch(time.perf_counter() - dispatch_start)
+        
+        return new_pages
     
-    def analyze(self):
-        start_time = time.time()
+    def log_extraction_timings(self):
+        """Resume en el log los tiempos de extracción por página del backend usado"""
+        if not self.callback or not self.page_timings:
+            return
         
-        if self.callback:
-            self.callback(f"Abriendo PDF: {self.pdf_path}")
-            self.callback(f"Usando {self.num_workers} workers\n")
+        total = sum(self.page_timings.values())
+        average_ms = total / len(self.page_timings) * 1000
+        slowest_page = max(self.page_timings, key=self.page_timings.get)
         
-        try:
-            with open(self.pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                total_pages = len(pdf_reader.pages)
-                if self.callback:
-                    self.callback(f"Total de páginas: {total_pages}")
-                
-                # Extraer texto de todas las páginas y guardar para búsqueda
-                if self.callback:
-                    self.callback("Extrayendo texto...")
-                pages_text = []
-                self.pages_data = []
-                
-                for page_num in range(total_pages):
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    pages_text.append((page_num, page_text))
-                    
-                    # Guardar párrafos de cada página
-                    paragraphs = self.extract_paragraphs(page_text)
-                    self.pages_data.append({
-                        'page_num': page_num + 1,
-                        'paragraphs': paragraphs
-                    })
-                
-                # Distribuir páginas entre workers
-                batches = self.distribute_pages(total_pages, pages_text)
-                if self.callback:
-                    self.callback(f"Páginas distribuidas en {len(batches)} lotes\n")
-                
-                # Procesar con ThreadPoolExecutor
-                with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
-                    futures = {
-                        executor.submit(self.process_pages_batch, batch): i 
-                        for i, batch in enumerate(batches)
-                    }
-                    
-                    for future in as_completed(futures):
-                        batch_num = futures[future]
-                        try:
-                            batch_counter = future.result()
-                            self.word_counts.update(batch_counter)
-                            if self.callback:
-                                self.callback(f"→ Lote {batch_num + 1} completado\n")
-                        except Exception as e:
-                            if self.callback:
-                                self.callback(f"Error en lote {batch_num}: {str(e)}")
-                
-                self.analysis_time = time.time() - start_time
-                
-                if self.callback:
-                    self.callback(f"Análisis completado!")
-                    self.callback(f"Tiempo de análisis: {self.analysis_time:.2f} segundos")
-                    self.callback(f"Total de palabras únicas: {len(self.word_counts)}")
-                    self.callback(f"Total de palabras: {sum(self.word_counts.values())}")
+        self.callback(f"Extracción ({self.backend}): {total:.2f} s en total, {average_ms:.1f} ms/página")
+        self.callback(f"Página más lenta: {slowest_page} ({self.page_timings[slowest_page] * 1000:.1f} ms)")
+        if self.skipped_pages:
+            self.callback(f"Páginas omitidas por tiempo límite ({self.page_timeout:g} s): "
+                          f"{', '.join(map(str, sorted(self.skipped_pages)))}")
+    
+    def log_stage_profile(self):
+        """Desglose por etapa: indica si el documento está limitado por la extracción o la tokenización"""
+        if not self.callback or not self.profile.totals:
+            return
+        for line in self.profile.format_report(self.analysis_time):
+            self.callback(line)
+    
+    def build_index(self):
+        """
+        Construye el índice invertido posicional a partir de los tokens ya
+        guardados: para cada id de palabra, dos arreglos paralelos con el
+        párrafo global y la posición de cada aparición.
+        """
+        index = {}
+        paragraph_pages = array('I')
+        page_first_paragraph = array('I')
+        
+        for page_idx, page_data in enumerate(self.pages_data):
+            page_first_paragraph.append(len(paragraph_pages))
+            tokens = page_data['tokens']
+            starts = page_data['paragraph_tokens']
+            
+            for para_idx in range(len(starts) - 1):
+                global_para = len(paragraph_pages)
+                paragraph_pages.append(page_idx)
                 
-        except FileNotFoundError:
-            if self.callback:
-                self.callback(f"Error: No se encontró el archivo {self.pdf_path}")
-        except Exception as e:
-            if self.callback:
-                self.callback(f"Error al procesar el PDF: {str(e)}")
+                for position, word_id in enumerate(tokens[starts[para_idx]:starts[para_idx + 1]]):
+                    postings = index.get(word_id)
+                    if postings is None:
+                        postings = index[word_id] = (array('I'), array('I'))
+                    postings[0].append(global_para)
+                    postings[1].append(position)
+        
+        self.index = index
+        self.paragraph_pages = paragraph_pages
+        self.page_first_paragraph = page_first_paragraph
     
-    def search_phrase(self, words: List[str]) -> List[Dict]:
+    def build_page_matrix(self):
+        self.page_matrix = PageTermMatrix(self.pages_data, len(self.vocabulary))
+    
+    def search_phrase(self, words: List[str], fold: bool = True, fuzzy: bool = False) -> List[Dict]:
         """
         Busca frases compuestas por las palabras dadas, donde cada palabra
         está separada de las demás por máximo 2 palabras.
         """
-        results = []
-        words = [w.lower().strip() for w in words if w.strip()]
-        
-        if not words:
-            return results
-        
-        for page_data in self.pages_data:
-            page_num = page_data['page_num']
+        return self.search_phrases([words], fold, fuzzy)[0][1]
+    
+    def expand_word(self, word: str, fold: bool = True, fuzzy: bool = False) -> List[str]:
+        """Palabras del vocabulario con las que se busca word (ver Vocabulary.variants)"""
+        return [self.vocabulary[word_id] for word_id in self.vocabulary.variants(word.lower().strip(), fold, fuzzy)]
+    
+    def search_phrases(self, phrases: List[List[str]], fold: bool = True,
+                       fuzzy: bool = False) -> List[Tuple[List[str], List[Dict]]]:
+        """
+        Busca varias frases (misma regla que search_phrase) en una sola pasada
+        por los párrafos candidatos: las posiciones de cada palabra en un
+        párrafo se obtienen una vez y las comparten todas las frases que la
+        usan. Cada palabra de la consulta se expande antes a sus variantes
+        sin acentos (fold) y con errores de escritura (fuzzy). Devuelve
+        (palabras, coincidencias) por frase, en el orden pedido.
+        """
+        phrases = [[w.lower().strip() for w in words if w.strip()] for words in phrases]
+        groups = [(words, []) for words in phrases]
+        
+        if self.index is None:
+            self.build_index()
+        
+        # Pares (párrafo global, frase) de cada párrafo donde la frase puede aparecer
+        candidate_pairs = []
+        phrase_word_ids = []
+        expansions = {}
+        for phrase_idx, words in enumerate(phrases):
+            word_ids = []
+            for word in words:
+                if word not in expansions:
+                    expansions[word] = [
+                        word_id for word_id in self.vocabulary.variants(word, fold, fuzzy) if word_id in self.index
+                    ]
+                word_ids.append(expansions[word])
+            phrase_word_ids.append(word_ids)
+            if not words or not all(word_ids):
+                continue
             
-            for para_num, paragraph in enumerate(page_data['paragraphs'], 1):
-                # Limpiar y obtener palabras del párrafo
-                para_words = self.clean_text(paragraph)
+            # Párrafos de cada palabra (unión de sus variantes), intersectados de la lista más corta
+            paragraph_sets = []
+            for variant_ids in word_ids:
+                paragraphs = set(self.index[variant_ids[0]][0])
+                for word_id in variant_ids[1:]:
+                    paragraphs.update(self.index[word_id][0])
+                paragraph_sets.append(paragraphs)
+            paragraph_sets.sort(key=len)
+            candidates = paragraph_sets[0].intersection(*paragraph_sets[1:])
+            candidate_pairs.extend(zip(candidates, repeat(phrase_idx)))
+        
+        candidate_pairs.sort()
+        for global_para, pairs in groupby(candidate_pairs, key=lambda pair: pair[0]):
+            positions_by_word = {}
+            context = None
+            
+            for _, phrase_idx in pairs:
+                if len(phrase_word_ids[phrase_idx]) == 1:
+                    # Una sola palabra: todo párrafo candidato es coincidencia
+                    if context is None:
+                        context = self.paragraph_result(global_para)
+                    groups[phrase_idx][1].append(dict(context))
+                    continue
+                
+                positions = []
+                for variant_ids in phrase_word_ids[phrase_idx]:
+                    word_positions = []
+                    for word_id in variant_ids:
+                        variant_positions = positions_by_word.get(word_id)
+                        if variant_positions is None:
+                            paragraphs, all_positions = self.index[word_id]
+                            lo = bisect_left(paragraphs, global_para)
+                            hi = bisect_right(paragraphs, global_para, lo)
+                            variant_positions = positions_by_word[word_id] = all_positions[lo:hi]
+                        word_positions.extend(variant_positions)
+                    positions.append(word_positions)
                 
-                # Buscar la frase en el párrafo
-                if self.is_phrase_valid(para_words, words):
-                    results.append({
-                        'page': page_num,
-                        'paragraph': para_num,
-                        'context': paragraph[:200] + '...' if len(paragraph) > 200 else paragraph
-                    })
+                if self.match_positions(positions):
+                    if context is None:
+                        context = self.paragraph_result(global_para)
+                    groups[phrase_idx][1].append(dict(context))
         
-        return results
+        return groups
     
-    def is_phrase_valid(self, text_words: List[str], search_words: List[str]) -> bool:
+    def concordance(self, words: List[str], fold: bool = True, fuzzy: bool = False, window: int = 5) -> Concordance:
         """
-        Verifica si las palabras de búsqueda aparecen en el texto con máximo 2 palabras de separación.
+        Apariciones de una palabra o frase (misma regla y variantes que
+        search_phrases) para una concordancia KWIC, en orden del documento.
+        Se calculan sólo con el índice posicional; el texto se arma después.
         """
-        if not search_words or not text_words:
-            return False
+        words = [w.lower().strip() for w in words if w.strip()]
+        paragraphs, starts, ends = array('I'), array('I'), array('I')
         
-        # Para cada posible inicio
-        for i in range(len(text_words)):
-            if self.check_phrase_from_position(text_words, search_words, i):
-                return True
+        if self.index is None:
+            self.build_index()
+        word_ids = [[word_id for word_id in self.vocabulary.variants(word, fold, fuzzy) if word_id in self.index]
+                    for word in words]
+        if not words or not all(word_ids):
+            return Concordance(self, paragraphs, starts, ends, window)
         
-        return False
+        if len(words) == 1:
+            if len(word_ids[0]) == 1:
+                # Los postings ya están en orden de párrafo y posición
+                paragraphs, starts = (array('I', postings) for postings in self.index[word_ids[0][0]])
+            else:
+                # Varias variantes: mezclar sus postings empaquetando (párrafo, posición) en un entero
+                keys = array('Q')
+                for word_id in word_ids[0]:
+                    word_paragraphs, word_positions = self.index[word_id]
+                    keys.extend((para << 32) | position for para, position in zip(word_paragraphs, word_positions))
+                keys = sorted(keys)
+                paragraphs = array('I', (key >> 32 for key in keys))
+                starts = array('I', (key & 0xFFFFFFFF for key in keys))
+            return Concordance(self, paragraphs, starts, starts, window)
+        
+        # Frases: párrafos con todas las palabras y, en cada uno, las apariciones con match_spans
+        paragraph_sets = []
+        for variant_ids in word_ids:
+            word_paragraphs = set()
+            for word_id in variant_ids:
+                word_paragraphs.update(self.index[word_id][0])
+            paragraph_sets.append(word_paragraphs)
+        paragraph_sets.sort(key=len)
+        candidates = sorted(paragraph_sets[0].intersection(*paragraph_sets[1:]))
+        
+        for global_para in candidates:
+            positions = []
+            for variant_ids in word_ids:
+                word_positions = []
+                for word_id in variant_ids:
+                    word_paragraphs, all_positions = self.index[word_id]
+                    lo = bisect_left(word_paragraphs, global_para)
+                    hi = bisect_right(word_paragraphs, global_para, lo)
+                    word_positions.extend(all_positions[lo:hi])
+                positions.append(sorted(word_positions))
+            for start, end in match_spans(positions):
+                paragraphs.append(global_para)
+                starts.append(start)
+                ends.append(end)
+        
+        return Concordance(self, paragraphs, starts, ends, window)
     
-    def check_phrase_from_position(self, text_words: List[str], search_words: List[str], start: int) -> bool:
+    def kwic_line(self, global_para: int, start: int, end: int, window: int) -> Dict:
         """
-        Verifica si la frase comienza en la posición start con las restricciones de distancia.
+        Arma una línea KWIC con los offsets guardados de los tokens: el
+        contexto es de hasta window tokens a cada lado, sin salir del párrafo.
         """
-        if start >= len(text_words):
-            return False
-        
-        # Si solo hay una palabra, buscar coincidencia directa
-        if len(search_words) == 1:
-            return search_words[0] in text_words[start:]
-        
-        # Buscar la primera palabra
-        if text_words[start] != search_words[0]:
-            return False
-        
-        current_pos = start
-        
-        # Para cada palabra subsecuente
-        for search_word in search_words[1:]:
-            # Buscar la siguiente palabra dentro de las próximas 3 posiciones (0, 1, 2 palabras de separación)
-            found = False
-            for offset in range(1, 4):  # 1, 2, 3 posiciones adelante
-                next_pos = current_pos + offset
-                if next_pos < len(text_words) and text_words[next_pos] == search_word:
-                    current_pos = next_pos
-                    found = True
-                    break
-            
-            if not found:
-                return False
-        
-        return True
+        page_idx = self.paragraph_pages[global_para]
+        para_idx = global_para - self.page_first_paragraph[page_idx]
+        
+        if self.mapped_index:
+            # El índice en disco no guarda offsets: se tokeniza sólo este párrafo
+            text = self.mapped_index.paragraph(global_para)
+            matches = list(WORD_PATTERN.finditer(text.lower()))
+            first, last = 0, len(matches)
+            token_start = lambda i: matches[i].start()
+            token_end = lambda i: matches[i].end()
+        else:
+            page_data = self.pages_data[page_idx]
+            text = page_data['text']
+            first = page_data['paragraph_tokens'][para_idx]
+            last = page_data['paragraph_tokens'][para_idx + 1]
+            offsets, tokens = page_data['token_offsets'], page_data['tokens']
+            token_start = offsets.__getitem__
+            token_end = lambda i: offsets[i] + len(self.vocabulary[tokens[i]])
+        
+        start, end = first + start, first + end
+        left = max(first, start - window)
+        right = min(last - 1, end + window)
+        return {
+            'page': page_idx + 1,
+            'paragraph': para_idx + 1,
+            'left': text[token_start(left):token_start(start)],
+            'keyword': text[token_start(start):token_end(end)],
+            'right': text[token_end(end):token_end(right)]
+        }
+    
+    def paragraph_result(self, global_para: int) -> Dict:
+        """Página, número de párrafo y contexto de un párrafo global"""
+        page_idx = self.paragraph_pages[global_para]
+        para_idx = global_para - self.page_first_paragraph[page_idx]
+        paragraph = self.paragraph_text(global_para)
+        return {
+            'page': page_idx + 1,
+            'paragraph': para_idx + 1,
+            'context': paragraph[:200] + '...' if len(paragraph) > 200 else paragraph
+        }
+    
+    def match_positions(self, positions: List[List[int]]) -> bool:
+        """Si la frase aparece en el párrafo (ver match_spans)"""
+        return bool(match_spans(positions))
     
     def get_top_words(self, n: int = None) -> List[tuple]:
-        if n:
-            return self.word_counts.most_common(n)
-        else:
-            return self.word_counts.most_common()
-
-    def get_word_frequency_per_page(self, word: str) -> List[Tuple[int, int]]:
-        word = word.lower().strip()
-        frequencies = []
+        """Palabras más frecuentes, sin las stopwords configuradas"""
+        keep = (lambda word: word not in self.stopwords) if self.stopwords else None
+        if self.approximate:
+            return self.sketches[1].top(n, keep) if self.sketches else []
+        return top_counts(self.word_counts, n or None, keep)
+    
+    def get_top_ngrams(self, size: int, n: int = None) -> List[tuple]:
+        """
+        N-gramas de size palabras más frecuentes, como texto. Se descartan
+        los que empiezan o terminan en stopword ("de la", "análisis de"),
+        pero no los que la tienen en medio ("análisis de datos").
+        """
+        if self.approximate:
+            keep = None
+            if self.stopwords:
+                keep = lambda words: words[0] not in self.stopwords and words[-1] not in self.stopwords
+            sketch = self.sketches.get(size)
+            return [(' '.join(words), count) for words, count in sketch.top(n, keep)] if sketch else []
+        
+        table = self.ngram_counts.get(size)
+        if not table:
+            return []
+        
+        words = self.vocabulary.words
+        keep = None
+        if self.stopwords:
+            keep = lambda ids: words[ids[0]] not in self.stopwords and words[ids[-1]] not in self.stopwords
+        return [(' '.join(words[i] for i in ids), count) for ids, count in table.top(n or None, keep)]
 
-        for page_data in self.pages_data:
-            page_num = page_data['page_num']
-            page_text = " ".join(page_data['paragraphs']).lower()
-            count = len(re.findall(rf'\b{re.escape(word)}\b', page_text))
-            frequencies.append((page_num, count))
+    def get_word_frequency_per_page(self, word: str, fold: bool = True, fuzzy: bool = False) -> List[Tuple[int, int]]:
+        frequencies = self.get_words_frequency_per_page([word], fold, fuzzy)[0]
+        return list(zip(self.get_page_numbers(), frequencies))
+    
+    def get_words_frequency_per_page(self, words: List[str], fold: bool = True,
+                                     fuzzy: bool = False) -> List[List[int]]:
+        """
+        Frecuencia por página de varias palabras (una lista por palabra, en
+        orden de página). Cada palabra suma sus variantes, con las mismas
+        reglas que search_phrases: 'analisis' cuenta también 'análisis'.
+        """
+        if self.page_matrix is None:
+            self.build_page_matrix()
         
+        frequencies = []
+        for word in words:
+            word_frequencies = [0] * self.page_matrix.num_pages
+            for word_id in self.vocabulary.variants(word.lower().strip(), fold, fuzzy):
+                for page_idx, count in zip(*self.page_matrix.column(word_id)):
+                    word_frequencies[page_idx] += count
+            frequencies.append(word_frequencies)
         return frequencies
+    
+    def get_page_distribution(self, n: int = 20) -> Tuple[List[str], 'np.ndarray']:
+        """Matriz palabras × páginas con las n palabras más frecuentes"""
+        if self.page_matrix is None:
+            self.build_page_matrix()
+        
+        words = [word for word, _ in self.get_top_words(n)]
+        word_ids = [self.vocabulary.get(word) for word in words]
+        return words, self.page_matrix.dense(word_ids)
 
 
-class ScrollableHeatmap(ctk.CTkFrame):
-    def __init__(self, master, **kwargs):
-        super().__init__(master, **kwargs)
-        
-        self.canvas = Canvas(self, bg='#212121', highlightthickness=0, bd=0)
-        self.scrollbar = ctk.CTkScrollbar(self, orientation="vertical", command=self.canvas.yview)
-        self.scrollable_frame = Frame(self.canvas, bg='#212121', bd=0)
-        
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
-        
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-        
-        self.canvas.pack(side="left", fill="both", expand=True, padx=0, pady=0)
-        self.scrollbar.pack(side="right", fill="y", padx=0, pady=0)
-        
-        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
-        self.canvas.bind_all("<Button-4>", self._on_mousewheel)
-        self.canvas.bind_all("<Button-5>", self._on_mousewheel)
-
-    def _on_mousewheel(self, event):
-        if event.delta:
-            self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        elif event.num == 4:
-            self.canvas.yview_scroll(-1, "units")
-        elif event.num == 5:
-            self.canvas.yview_scroll(1, "units")
+class CorpusAnalyzer:
+    """
+    Analiza todos los PDF de una carpeta o patrón glob. Las páginas de todos
+    los documentos se reparten en tareas de tamaño parecido (los documentos
+    grandes se dividen en rangos de páginas) y se envían de mayor a menor a
+    un pool de procesos, para que un solo documento no deje al resto de los
+    workers esperando.
+    """
     
-    def get_frame(self):
-        return self.scrollable_frame
-
-class PDFViewer(ctk.CTkFrame):
-    def __init__(self, master, **kwargs):
-        super().__init__(master, **kwargs)
-        
-        # Frame de controles
-        self.control_frame = ctk.CTkFrame(self)
-        self.control_frame.pack(fill="x", padx=5, pady=5)
-        
-        self.prev_button = ctk.CTkButton(
-            self.control_frame, 
-            text="◀ Anterior", 
-            command=self.prev_page,
-            width=100
-        )
-        self.prev_button.pack(side="left", padx=5)
-        
-        self.page_label = ctk.CTkLabel(self.control_frame, text="Página: -/-")
-        self.page_label.pack(side="left", padx=10, expand=True)
-        
-        self.next_button = ctk.CTkButton(
-            self.control_frame, 
-            text="Siguiente ▶", 
-            command=self.next_page,
-            width=100
-        )
-        self.next_button.pack(side="right", padx=5)
-        
-        # Canvas para mostrar el PDF (sin scrollbars)
-        self.canvas = Canvas(self, bg='#2b2b2b', highlightthickness=0)
-        self.canvas.pack(fill="both", expand=True, padx=5, pady=5)
-        
-        self.pdf_document = None
-        self.current_page = 0
-        self.total_pages = 0
-        
-        # Bind para ajustar cuando se redimensiona la ventana
-        self.canvas.bind("<Configure>", self.on_canvas_resize)
-        
-    def on_canvas_resize(self, event):
-        """Redibuja la página cuando el canvas cambia de tamaño"""
-        if self.pdf_document and self.total_pages > 0:
-            self.show_page()
-        
-    def load_pdf(self, pdf_path):
-        try:
-            self.pdf_document = fitz.open(pdf_path)
-            self.total_pages = len(self.pdf_document)
-            self.current_page = 0
-            self.show_page()
-            self.prev_button.configure(state="normal")
-            self.next_button.configure(state="normal")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al cargar PDF: {str(e)}")
+    def __init__(self, source: str, num_workers: int = None, callback=None, backend: str = 'pypdf2',
+                 use_cache: bool = True, cache: AnalysisCache = None, stopwords=None, max_ngram: int = 2,
+                 approximate: bool = False, sketch_capacity: int = 10000, progress: ProgressTracker = None,
+                 page_timeout: float = None, cprofile_path: str = None):
+        self.source = source
+        self.num_workers = num_workers or os.cpu_count()
+        self.callback = callback
+        self.backend = backend
+        self.use_cache = use_cache
+        self.cache = cache or AnalysisCache()
+        self.documents = {}  # Ruta -> PDFWordAnalyzer ya analizado
+        self.failed_documents = {}  # Ruta -> mensaje de error
+        self.sketched_documents = set()  # Modo aproximado: rutas con al menos un tramo contado
+        self.word_counts = Counter()
+        self.max_ngram = max(1, max_ngram)
+        self.vocabulary = Vocabulary()  # Palabras de los n-gramas de todos los documentos
+        self.ngram_counts = {}  # Tamaño -> NgramTable sobre self.vocabulary
+        self.stopwords = frozenset(stopwords or ())
+        self.approximate = approximate  # Ver PDFWordAnalyzer.analyze_approximate
+        self.sketch_capacity = sketch_capacity
+        self.sketches = {}
+        self.progress = progress
+        self.page_timeout = page_timeout
+        self.profile = StageProfile()  # Compartido con los documentos del corpus
+        self.cprofile_path = cprofile_path
+        self.skipped_pages = {}  # Ruta -> {número de página -> motivo}
+        self.cancel_event = multiprocessing.Event()
+        self.cancelled = False
+        self.analysis_time = 0
     
-    def show_page(self):
-        if not self.pdf_document or self.total_pages == 0:
+    def cancel(self):
+        self.cancel_event.set()
+    
+    def process_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.num_workers, initializer=init_worker,
+                                   initargs=(self.cancel_event,))
+    
+    def record_skipped(self, path: str, skipped: Dict[int, str]):
+        if not skipped:
             return
+        self.skipped_pages.setdefault(path, {}).update(skipped)
+        if self.callback:
+            for page, reason in sorted(skipped.items()):
+                self.callback(f"⚠ {os.path.basename(path)}, página {page} omitida: {reason}")
+    
+    def find_documents(self) -> List[str]:
+        if os.path.isdir(self.source):
+            pattern = os.path.join(self.source, '**', '*.pdf')
+            return sorted(glob.glob(pattern, recursive=True))
+        return sorted(path for path in glob.glob(self.source, recursive=True) if os.path.isfile(path))
+    
+    def analyze(self):
+        start_time = time.time()
+        self.cancel_event.clear()
+        self.cancelled = False
+        self.skipped_pages = {}
+        self.documents = {}
+        self.failed_documents = {}
+        self.sketched_documents = set()
+        self.word_counts = Counter()
+        self.vocabulary = Vocabulary()
+        self.ngram_counts = {}
+        self.profile = StageProfile()
+        profiler = cProfile.Profile() if self.cprofile_path else None
+        if profiler:
+            profiler.enable()
         
-        # Obtener dimensiones del canvas
-        canvas_width = self.canvas.winfo_width()
-        canvas_height = self.canvas.winfo_height()
+        try:
+            self.analyze_documents(start_time)
+        except AnalysisCancelled:
+            self.cancelled = True
+            self.documents = {}
+            self.word_counts = Counter()
+            self.ngram_counts = {}
+            self.sketches = {}
+            if self.callback:
+                self.callback("Análisis cancelado")
+        finally:
+            if profiler:
+                dump_cprofile(profiler, self.cprofile_path, self.callback)
+            if self.progress:
+                self.progress.finish()
+    
+    def analyze_documents(self, start_time: float):
+        paths = self.find_documents()
+        if self.callback:
+            self.callback(f"Documentos encontrados: {len(paths)}")
+            self.callback(f"Usando {self.num_workers} workers\n")
         
-        # Si el canvas aún no tiene dimensiones, esperar
-        if canvas_width <= 1 or canvas_height <= 1:
-            self.canvas.after(100, self.show_page)
+        if self.approximate:
+            self.analyze_approximate(paths)
+            self.analysis_time = time.time() - start_time
+            if self.callback:
+                self.callback("Análisis aproximado del corpus completado!")
+                self.callback(f"Tiempo de análisis: {self.analysis_time:.2f} segundos")
+                self.callback(f"Total de palabras: {self.get_total_words()}")
+                self.callback(f"Error máximo por conteo: {self.sketches[1].error}")
+                for path, error in self.failed_documents.items():
+                    self.callback(f"Error en {path}: {error}")
+                self.log_stage_profile()
             return
         
-        page = self.pdf_document[self.current_page]
-        
-        # Obtener dimensiones originales de la página
-        page_rect = page.rect
-        page_width = page_rect.width
-        page_height = page_rect.height
-        
-        # Calcular zoom para ajustar la página al canvas (con margen)
-        margin = 20
-        zoom_width = (canvas_width - margin) / page_width
-        zoom_height = (canvas_height - margin) / page_height
-        zoom = min(zoom_width, zoom_height)
-        
-        # Renderizar página con el zoom calculado
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat)
+        # Documentos ya analizados salen de la caché; del resto sólo se cuentan las páginas
+        pending = {}
+        for path in paths:
+            document = PDFWordAnalyzer(path, backend=self.backend, use_cache=self.use_cache, cache=self.cache,
+                                       stopwords=self.stopwords, max_ngram=self.max_ngram)
+            document.profile = self.profile
+            try:
+                stage_start = time.perf_counter()
+                cache_key = document.content_cache_key() if self.use_cache else None
+                if cache_key and document.load_from_cache(cache_key):
+                    document.report_stage('cache', time.perf_counter() - stage_start)
+                    stage_start = time.perf_counter()
+                    document.build_search_structures()
+                    document.report_stage('index', time.perf_counter() - stage_start)
+                    self.documents[path] = document
+                    continue
+                
+                stage_start = time.perf_counter()
+                extractor = document.open_extractor()
+                try:
+                    total_pages = extractor.page_count()
+                finally:
+                    extractor.close()
+                document.report_stage('open', time.perf_counter() - stage_start)
+                pending[path] = (document, cache_key, total_pages)
+            except Exception as e:
+                self.failed_documents[path] = str(e)
         
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        photo = ImageTk.PhotoImage(img)
+        if self.callback and self.documents:
+            self.callback(f"Documentos cargados de la caché: {len(self.documents)}")
         
-        # Limpiar canvas
-        self.canvas.delete("all")
+        tasks = self.schedule_tasks({path: total for path, (_, _, total) in pending.items()})
+        if self.progress:
+            self.progress.start(sum(len(pages) for _, pages in tasks))
+        if self.callback and tasks:
+            self.callback(f"Páginas a analizar: {sum(len(pages) for _, pages in tasks)} "
+                          f"en {len(tasks)} tareas\n")
         
-        # Calcular posición para centrar
-        x_center = (canvas_width - pix.width) // 2
-        y_center = (canvas_height - pix.height) // 2
+        new_pages = {path: {} for path in pending}
+        remaining_tasks = Counter(path for path, _ in tasks)
         
-        # Crear imagen centrada
-        self.canvas.create_image(x_center, y_center, anchor="nw", image=photo)
-        self.canvas.image = photo
+        dispatch_start = time.perf_counter()
+        with self.process_pool() as executor:
+            submit = lambda task: executor.submit(run_chunk, extract_pages_worker, task[0], task[1], self.backend,
+                                                  self.page_timeout, self.max_ngram)
+            
+            for task_num, future in iter_dispatched(submit, tasks, self.cancel_event, self.num_workers * 2):
+                path = tasks[task_num][0]
+                document, cache_key, total_pages = pending[path]
+                try:
+                    worker, busy, (batch_words, batch_pages, batch_ngrams, batch_timings, tokenize_timings,
+                                   batch_skipped) = future.result()
+                    self.profile.add_chunk(worker, len(tasks[task_num][1]), busy)
+                    document.merge_batch(batch_words, batch_pages, batch_ngrams, new_pages[path])
+                    document.page_timings.update(batch_timings)
+                    document.skipped_pages.update(batch_skipped)
+                    self.record_skipped(path, batch_skipped)
+                    document.report_page_costs('extract', batch_timings)
+                    document.report_page_costs('tokenize', tokenize_timings)
+                    if self.progress:
+                        self.progress.pages(len(batch_pages), sum(len(page['text'].encode('utf-8')) for page in batch_pages))
+                except AnalysisCancelled:
+                    raise
+                except Exception as e:
+                    self.failed_documents[path] = str(e)
+                
+                remaining_tasks[path] -= 1
+                if remaining_tasks[path] == 0 and path not in self.failed_documents:
+                    # Último rango de páginas del documento: queda listo para búsqueda
+                    index_start = time.perf_counter()
+                    document.assemble_pages(total_pages, {}, new_pages.pop(path))
+                    document.report_stage('index', time.perf_counter() - index_start)
+                    if cache_key and not document.skipped_pages:
+                        document.save_to_cache(cache_key)
+                    self.documents[path] = document
+                    if self.callback:
+                        self.callback(f"✓ {os.path.basename(path)}: {total_pages} páginas")
+        self.profile.add_dispatch(time.perf_counter() - dispatch_start)
+        
+        self.merge_documents()
+        
+        self.analysis_time = time.time() - start_time
         
-        self.page_label.configure(text=f"Página: {self.current_page + 1}/{self.total_pages}")
+        if self.callback:
+            self.callback("Análisis del corpus completado!")
+            self.callback(f"Tiempo de análisis: {self.analysis_time:.2f} segundos")
+            self.callback(f"Documentos analizados: {len(self.documents)}")
+            self.callback(f"Total de palabras únicas: {len(self.word_counts)}")
+            self.callback(f"Total de palabras: {sum(self.word_counts.values())}")
+            for path, error in self.failed_documents.items():
+                self.callback(f"Error en {path}: {error}")
+            self.log_stage_profile()
     
-    def next_page(self):
-        if self.current_page < self.total_pages - 1:
-            self.current_page += 1
-            self.show_page()
+    def merge_documents(self):
+        """
+        Suma los conteos de los documentos. Los n-gramas se traducen de los
+        ids de cada documento a los de self.vocabulary y se compactan como
+        en un documento (ver NgramTable).
+        """
+        counters = {size: Counter() for size in range(2, self.max_ngram + 1)}
+        for path in sorted(self.documents):
+            document = self.documents[path]
+            self.word_counts.update(document.word_counts)
+            if not any(document.ngram_counts.values()):
+                continue  # Sin n-gramas (por ejemplo, abierto desde el índice en disco)
+            global_ids = self.vocabulary.merge(document.vocabulary.words).tolist()
+            for size, table in document.ngram_counts.items():
+                keys = ngram_keys([list(map(global_ids.__getitem__, column)) for column in table.columns()])
+                counters[size].update(chain.from_iterable(map(repeat, keys, table.counts)))
+        
+        for size in sorted(counters):
+            self.ngram_counts[size] = NgramTable(size, counters.pop(size), len(self.vocabulary))
     
-    def prev_page(self):
-        if self.current_page > 0:
-            self.current_page -= 1
-            self.show_page()
+    def log_stage_profile(self):
+        if not self.callback or not self.profile.totals:
+            return
+        for line in self.profile.format_report(self.analysis_time):
+            self.callback(line)
     
-    def close_pdf(self):
-        if self.pdf_document:
-            self.pdf_document.close()
-            self.pdf_document = None
-            self.canvas.delete("all")
-            self.page_label.configure(text="Página: -/-")
-
-class PDFAnalyzerApp(ctk.CTk):
-    def __init__(self):
-        super().__init__()
-
-        self.title("Analizador de Palabras en PDF")
-        self.geometry("1400x900")
-        
-        self.after(10, lambda: self.state('zoomed'))
-        
-        self.analyzer = None
-        self.pdf_path = None
-        self.last_search_results = None
-        self.last_search_words = None
-        
-        self.setup_ui()
-        
-    def setup_ui(self):
-        # Frame principal con dos columnas
-        self.main_container = ctk.CTkFrame(self)
-        self.main_container.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        # Frame superior (controles)
-        self.control_frame = ctk.CTkFrame(self.main_container)
-        self.control_frame.pack(fill="x", padx=10, pady=10)
-        
-        self.select_button = ctk.CTkButton(
-            self.control_frame, 
-            text="Seleccionar PDF", 
-            command=self.select_pdf,
-            width=150,
-            height=40
-        )
-        self.select_button.pack(side="left", padx=10)
-        
-        self.file_label = ctk.CTkLabel(
-            self.control_frame, 
-            text="No se ha seleccionado ningún archivo",
-            wraplength=300
-        )
-        self.file_label.pack(side="left", padx=10, expand=True, fill="x")
-        
-        self.analyze_button = ctk.CTkButton(
-            self.control_frame, 
-            text="Analizar PDF", 
-            command=self.analyze_pdf,
-            width=150,
-            height=40,
-            state="disabled"
-        )
-        self.analyze_button.pack(side="left", padx=10)
-        
-        self.save_button = ctk.CTkButton(
-            self.control_frame, 
-            text="Guardar Análisis", 
-            command=self.save_results,
-            width=150,
-            height=40,
-            state="disabled"
-        )
-        self.save_button.pack(side="left", padx=10)
-        
-        self.save_search_button = ctk.CTkButton(
-            self.control_frame, 
-            text="Guardar Búsqueda", 
-            command=self.save_search_results,
-            width=150,
-            height=40,
-            state="disabled"
-        )
-        self.save_search_button.pack(side="left", padx=10)
-        
-        # Frame contenedor principal dividido en dos columnas
-        self.content_container = ctk.CTkFrame(self.main_container)
-        self.content_container.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        # COLUMNA IZQUIERDA: Log y Estadísticas
-        self.left_column = ctk.CTkFrame(self.content_container, width=400)
-        self.left_column.pack(side="left", fill="both", expand=False, padx=(0, 5))
-        self.left_column.pack_propagate(False)
-        
-        # Log
-        self.log_label = ctk.CTkLabel(self.left_column, text="Registro de Análisis", font=("Arial", 16, "bold"))
-        self.log_label.pack(pady=10)
-        
-        self.log_text = ctk.CTkTextbox(self.left_column, height=150)
-        self.log_text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
-        
-        # Estadísticas
-        self.stats_frame = ctk.CTkFrame(self.left_column)
-        self.stats_frame.pack(fill="x", padx=10, pady=10)
-        
-        self.stats_label = ctk.CTkLabel(self.stats_frame, text="Estadísticas", font=("Arial", 14, "bold"))
-        self.stats_label.pack(pady=5)
-        
-        self.unique_words_label = ctk.CTkLabel(self.stats_frame, text="Palabras únicas: -")
-        self.unique_words_label.pack()
-        
-        self.total_words_label = ctk.CTkLabel(self.stats_frame, text="Total de palabras: -")
-        self.total_words_label.pack()
-        
-        self.time_label = ctk.CTkLabel(self.stats_frame, text="Tiempo de análisis: -")
-        self.time_label.pack()
-        
-        # BUSCADOR DE FRASES
-        self.search_frame = ctk.CTkFrame(self.left_column)
-        self.search_frame.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        self.search_label = ctk.CTkLabel(self.search_frame, text="Buscador de Frases", font=("Arial", 14, "bold"))
-        self.search_label.pack(pady=10)
-        
-        self.search_info = ctk.CTkLabel(
-            self.search_frame, 
-            text="Ingresa hasta 3 palabras separadas por comas.\nEj: palabra1, palabra2, palabra3",
-            font=("Arial", 10),
-            text_color="gray"
-        )
-        self.search_info.pack(pady=5)
-        
-        # Frame para entrada y botón
-        self.search_input_frame = ctk.CTkFrame(self.search_frame)
-        self.search_input_frame.pack(fill="x", padx=10, pady=5)
-        
-        self.phrase_entry = ctk.CTkEntry(
-            self.search_input_frame,
-            placeholder_text="palabra1, palabra2, palabra3"
-        )
-        self.phrase_entry.pack(side="left", fill="x", expand=True, padx=(0, 5))
-        
-        self.search_button = ctk.CTkButton(
-            self.search_input_frame,
-            text="Buscar",
-            command=self.search_phrase,
-            width=100,
-            state="disabled"
-        )
-        self.search_button.pack(side="right")
-        
-        # Resultados de búsqueda
-        self.search_results_label = ctk.CTkLabel(self.search_frame, text="Resultados:", font=("Arial", 12, "bold"))
-        self.search_results_label.pack(pady=(10, 5))
-        
-        self.search_results = ctk.CTkTextbox(self.search_frame, height=200)
-        self.search_results.pack(fill="both", expand=True, padx=10, pady=(0, 10))
-        
-        # COLUMNA DERECHA: Dividida horizontalmente (lado a lado)
-        self.right_column = ctk.CTkFrame(self.content_container)
-        self.right_column.pack(side="right", fill="both", expand=True)
-        
-        # ====== SECCIÓN IZQUIERDA: MAPA DE CALOR ======
-        self.heatmap_section = ctk.CTkFrame(self.right_column)
-        self.heatmap_section.pack(side="left", fill="both", expand=True, padx=(5, 2), pady=5)
-        
-        self.heatmap_label = ctk.CTkLabel(
-            self.heatmap_section, 
-            text="🔥 Mapa de Calor de Frecuencias", 
-            font=("Arial", 14, "bold")
-        )
-        self.heatmap_label.pack(pady=5)
-        
-        self.info_label = ctk.CTkLabel(self.heatmap_section, text="", font=("Arial", 12))
-        self.info_label.pack()
-        
-        self.canvas_frame = ScrollableHeatmap(self.heatmap_section)
-        self.canvas_frame.pack(fill="both", expand=True, padx=5, pady=(0, 5))
-        
-        self.no_data_label = ctk.CTkLabel(
-            self.canvas_frame.get_frame(), 
-            text="Selecciona un PDF y haz clic en 'Analizar' para ver el mapa de calor",
-            font=("Arial", 12)
-        )
-        self.no_data_label.pack(expand=True, pady=50)
-        
-        # ====== SECCIÓN DERECHA: VISUALIZADOR PDF ======
-        self.viewer_section = ctk.CTkFrame(self.right_column, width=700)
-        self.viewer_section.pack(side="right", fill="both", expand=False, padx=(2, 5), pady=5)
-        self.viewer_section.pack_propagate(False)
-        
-        self.viewer_title = ctk.CTkLabel(
-            self.viewer_section, 
-            text="📄 Visualizador PDF", 
-            font=("Arial", 14, "bold")
-        )
-        self.viewer_title.pack(pady=5)
+    def analyze_approximate(self, paths: List[str]):
+        """Cuenta todo el corpus en resúmenes de memoria acotada; no guarda documentos"""
+        self.sketches = {size: HeavyHitters(self.sketch_capacity) for size in range(1, self.max_ngram + 1)}
         
-        self.pdf_viewer = PDFViewer(self.viewer_section)
-        self.pdf_viewer.pack(fill="both", expand=True, padx=5, pady=(0, 5))
+        page_counts = {}
+        open_start = time.perf_counter()
+        for path in paths:
+            try:
+                extractor = EXTRACTION_BACKENDS[self.backend](path)
+                try:
+                    page_counts[path] = extractor.page_count()
+                finally:
+                    extractor.close()
+            except Exception as e:
+                self.failed_documents[path] = str(e)
+        self.profile.add('open', time.perf_counter() - open_start)
+        
+        tasks = self.schedule_tasks(page_counts)
+        if self.progress:
+            self.progress.start(sum(page_counts.values()))
+        dispatch_start = time.perf_counter()
+        with self.process_pool() as executor:
+            submit = lambda task: executor.submit(run_chunk, sketch_pages_worker, task[0], task[1], self.backend,
+                                                  self.sketch_capacity, self.max_ngram, self.page_timeout)
+            for task_num, future in iter_dispatched(submit, tasks, self.cancel_event, self.num_workers * 2):
+                path = tasks[task_num][0]
+                try:
+                    worker, busy, (batch_sketches, batch_timings, count_timings, batch_skipped) = future.result()
+                    self.profile.add_chunk(worker, len(tasks[task_num][1]), busy)
+                    for size, sketch in batch_sketches.items():
+                        self.sketches[size].merge(sketch)
+                    self.sketched_documents.add(path)
+                    self.record_skipped(path, batch_skipped)
+                    self.profile.add('extract', sum(batch_timings.values()), batch_timings.values())
+                    self.profile.add('tokenize', sum(count_timings.values()), count_timings.values())
+                    if self.progress:
+                        self.progress.pages(len(batch_timings) + len(batch_skipped), 0)
+                except AnalysisCancelled:
+                    raise
+                except Exception as e:
+                    self.failed_documents[path] = str(e)
+        self.profile.add_dispatch(time.perf_counter() - dispatch_start)
+        
+        self.word_counts = Counter(self.sketches[1].counts)
     
-    def select_pdf(self):
-        filename = filedialog.askopenfilename(
-            title="Seleccionar archivo PDF",
-            filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
-        )
-        
-        if filename:
-            self.pdf_path = filename
-            self.file_label.configure(text=f"Archivo: {os.path.basename(filename)}")
-            self.analyze_button.configure(state="normal")
-            self.log_text.delete("0.0", "end")
-            self.log_text.insert("0.0", f"Archivo seleccionado: {filename}\n")
-            
-            # Cargar PDF en el visualizador
-            self.pdf_viewer.load_pdf(filename)
+    def analyzed_documents(self) -> int:
+        """Documentos contados sin error (el modo aproximado no los guarda en documents)"""
+        if self.approximate:
+            return len(self.sketched_documents - self.failed_documents.keys())
+        return len(self.documents)
     
-    def update_log(self, message):
-        self.log_text.insert("end", f"{message}\n")
-        self.log_text.see("end")
-        self.update()
+    def get_total_words(self) -> int:
+        if self.approximate:
+            return self.sketches[1].total if self.sketches else 0
+        return sum(self.word_counts.values())
     
-    def analyze_pdf(self):
-        if not self.pdf_path:
-            messagebox.showerror("Error", "Por favor selecciona un archivo PDF primero")
-            return
-        
-        self.analyze_button.configure(state="disabled")
-        self.select_button.configure(state="disabled")
-        self.save_button.configure(state="disabled")
-        self.search_button.configure(state="disabled")
-        
-        self.log_text.delete("0.0", "end")
-        self.search_results.delete("0.0", "end")
-        
-        thread = threading.Thread(target=self.run_analysis)
-        thread.start()
+    def get_error_bounds(self) -> Dict[int, int]:
+        return {size: sketch.error for size, sketch in self.sketches.items()}
     
-    def run_analysis(self):
-        try:
-            self.analyzer = PDFWordAnalyzer(self.pdf_path, callback=self.update_log)
-            self.analyzer.analyze()
-            
-            self.after(0, self.update_stats)
-            self.after(0, self.create_heatmap)
-            self.after(0, lambda: self.search_button.configure(state="normal"))
-            
-        except Exception as e:
-            self.after(0, lambda: messagebox.showerror("Error", f"Error al analizar el PDF: {str(e)}"))
-        finally:
-            self.after(0, lambda: self.analyze_button.configure(state="normal"))
-            self.after(0, lambda: self.select_button.configure(state="normal"))
-            self.after(0, lambda: self.save_button.configure(state="normal"))
+    def schedule_tasks(self, page_counts: Dict[str, int]) -> List[Tuple[str, List[int]]]:
+        """
+        Divide los documentos en rangos de a lo más chunk_pages páginas
+        (unas cuatro tareas por worker) y los ordena de mayor a menor.
+        """
+        total_pages = sum(page_counts.values())
+        if not total_pages:
+            return []
+        
+        chunk_pages = max(1, math.ceil(total_pages / (self.num_workers * 4)))
+        tasks = []
+        for path, pages in page_counts.items():
+            for start in range(0, pages, chunk_pages):
+                tasks.append((path, list(range(start, min(start + chunk_pages, pages)))))
+        
+        tasks.sort(key=lambda task: len(task[1]), reverse=True)
+        return tasks
     
-    def search_phrase(self):
-        if not self.analyzer:
-            messagebox.showerror("Error", "Primero debes analizar un PDF")
-            return
-        
-        phrase_text = self.phrase_entry.get().strip()
-        if not phrase_text:
-            messagebox.showwarning("Advertencia", "Ingresa al menos una palabra")
-            return
-        
-        # Separar palabras por comas
-        words = [w.strip() for w in phrase_text.split(',') if w.strip()]
-        
-        if len(words) > 3:
-            messagebox.showwarning("Advertencia", "Ingresa máximo 3 palabras")
-            return
-        
-        # Deshabilitar botón durante búsqueda
-        self.search_button.configure(state="disabled")
-        self.search_results.delete("0.0", "end")
-        self.search_results.insert("0.0", "Buscando...\n")
-        
-        # Ejecutar búsqueda en hilo separado
-        thread = threading.Thread(target=self.run_search, args=(words,))
-        thread.start()
+    def get_top_words(self, n: int = None) -> List[tuple]:
+        keep = (lambda word: word not in self.stopwords) if self.stopwords else None
+        if self.approximate:
+            return self.sketches[1].top(n, keep) if self.sketches else []
+        return top_counts(self.word_counts, n or None, keep)
     
-    def run_search(self, words):
-        try:
-            results = self.analyzer.search_phrase(words)
-            self.last_search_results = results
-            self.last_search_words = words
-            self.after(0, lambda: self.display_search_results(words, results))
-        except Exception as e:
-            self.after(0, lambda: messagebox.showerror("Error", f"Error en la búsqueda: {str(e)}"))
-        finally:
-            self.after(0, lambda: self.search_button.configure(state="normal"))
+    def get_top_ngrams(self, size: int, n: int = None) -> List[tuple]:
+        keep = None
+        if self.stopwords:
+            keep = lambda words: words[0] not in self.stopwords and words[-1] not in self.stopwords
+        
+        if self.approximate:
+            sketch = self.sketches.get(size)
+            return [(' '.join(words), count) for words, count in sketch.top(n, keep)] if sketch else []
+        
+        table = self.ngram_counts.get(size)
+        if not table:
+            return []
+        words = self.vocabulary.words
+        keep_ids = (lambda ids: keep(tuple(words[i] for i in ids))) if keep else None
+        return [(' '.join(words[i] for i in ids), count) for ids, count in table.top(n or None, keep_ids)]
     
-    def display_search_results(self, words, results):
-        self.search_results.delete("0.0", "end")
-        
-        phrase_display = ", ".join(words)
-        self.search_results.insert("0.0", f"Búsqueda: {phrase_display}\n")
-        self.search_results.insert("end", f"Resultados encontrados: {len(results)}\n")
-        self.search_results.insert("end", "=" * 50 + "\n\n")
-        
-        if not results:
-            self.search_results.insert("end", "No se encontraron coincidencias.\n")
-            self.save_search_button.configure(state="disabled")
+    def search_phrase(self, words: List[str], fold: bool = True, fuzzy: bool = False) -> List[Dict]:
+        """Busca la frase en cada documento; cada coincidencia indica su documento"""
+        return self.search_phrases([words], fold, fuzzy)[0][1]
+    
+    def search_phrases(self, phrases: List[List[str]], fold: bool = True,
+                       fuzzy: bool = False) -> List[Tuple[List[str], List[Dict]]]:
+        """Búsqueda en lote por documento (ver PDFWordAnalyzer.search_phrases), agrupada por frase"""
+        groups = None
+        for path in sorted(self.documents):
+            document_groups = self.documents[path].search_phrases(phrases, fold, fuzzy)
+            if groups is None:
+                groups = [(words, []) for words, _ in document_groups]
+            for (_, results), (_, document_results) in zip(groups, document_groups):
+                results.extend(dict(result, document=path) for result in document_results)
+        
+        if groups is None:
+            groups = [([w.lower().strip() for w in words if w.strip()], []) for words in phrases]
+        return groups
+
+
+def ngrams_summary(analyzer, top_ngrams: int) -> Dict[str, List[Dict]]:
+    return {
+        f"{ngram_name(size)}s": [
+            {'ngrama': ngram, 'frecuencia': count} for ngram, count in analyzer.get_top_ngrams(size, top_ngrams)
+        ]
+        for size in range(2, analyzer.max_ngram + 1)
+    }
+
+
+def document_summary(analyzer: PDFWordAnalyzer, top: int, top_ngrams: int = 50) -> Dict:
+    return {
+        'archivo': os.path.basename(analyzer.pdf_path),
+        'paginas': len(analyzer.get_page_numbers()),
+        'palabras_unicas': len(analyzer.word_counts),
+        'total_palabras': analyzer.get_total_words(),
+        'palabras': [{'palabra': word, 'frecuencia': count} for word, count in analyzer.get_top_words(top)],
+        'ngramas': ngrams_summary(analyzer, top_ngrams)
+    }
+
+
+def write_results(analyzer, searches: List[List[str]], output_format: str, top: int, output,
+                  top_ngrams: int = 50, fold: bool = True, fuzzy: bool = False):
+    """
+    Escribe conteos, n-gramas y coincidencias de búsqueda en JSON o CSV.
+    analyzer puede ser un PDFWordAnalyzer o un CorpusAnalyzer (agrega los
+    conteos por documento).
+    """
+    is_corpus = isinstance(analyzer, CorpusAnalyzer)
+    top_words = analyzer.get_top_words(top)
+    top_ngrams_by_size = [
+        (size, analyzer.get_top_ngrams(size, top_ngrams)) for size in range(2, analyzer.max_ngram + 1)
+    ]
+    search_results = analyzer.search_phrases(searches, fold, fuzzy)
+    
+    if output_format == 'json':
+        if is_corpus:
+            data = {
+                'corpus': analyzer.source,
+                'documentos': [
+                    document_summary(analyzer.documents[path], top, top_ngrams) for path in sorted(analyzer.documents)
+                ],
+                'errores': analyzer.failed_documents
+            }
         else:
-            for i, result in enumerate(results, 1):
-                self.search_results.insert("end", f"[{i}] Página {result['page']}, Párrafo {result['paragraph']}\n")
-                self.search_results.insert("end", f"Contexto: {result['context']}\n\n")
-            self.save_search_button.configure(state="normal")
+            data = {
+                'archivo': os.path.basename(analyzer.pdf_path),
+                'paginas': len(analyzer.get_page_numbers())
+            }
+        data.update({
+            'backend': analyzer.backend,
+            'tiempo_analisis': round(analyzer.analysis_time, 3),
+            # Segundos por etapa y, por página, percentiles en ms (ver StageProfile.summary)
+            'etapas': analyzer.profile.summary(),
+            # Lotes, páginas y tiempo ocupado de cada worker durante el reparto (ver plan_chunks)
+            'workers': analyzer.profile.worker_usage(),
+            # En modo aproximado no se conoce el número de palabras distintas
+            'palabras_unicas': None if analyzer.approximate else len(analyzer.word_counts),
+            'total_palabras': analyzer.get_total_words(),
+            'stopwords_omitidas': len(analyzer.stopwords),
+            'palabras': [{'palabra': word, 'frecuencia': count} for word, count in top_words],
+            'ngramas': ngrams_summary(analyzer, top_ngrams),
+            # Páginas que superaron --timeout-pagina (se contaron como vacías)
+            'paginas_omitidas': analyzer.skipped_pages,
+            'busquedas': [
+                {'palabras': words, 'coincidencias': results}
+                for words, results in search_results
+            ]
+        })
+        if analyzer.approximate:
+            # Cada frecuencia es una cota inferior; la real no la supera en más de error_maximo
+            data['aproximado'] = {
+                'contadores': analyzer.sketch_capacity,
+                'error_maximo': {ngram_name(size): error for size, error in analyzer.get_error_bounds().items()}
+            }
+        json.dump(data, output, ensure_ascii=False, indent=2)
+        output.write("\n")
+    else:
+        # Una sola tabla: filas 'palabra', 'bigrama', 'trigrama' con su frecuencia y filas
+        # 'busqueda' con cada coincidencia. En un corpus, la columna documento queda vacía
+        # para los conteos combinados.
+        writer = csv.writer(output)
+        columns = ['tipo', 'clave', 'frecuencia', 'pagina', 'parrafo', 'contexto']
+        writer.writerow(['documento'] + columns if is_corpus else columns)
+        prefix = [''] if is_corpus else []
+        for word, count in top_words:
+            writer.writerow(prefix + ['palabra', word, count, '', '', ''])
+        for size, ngrams in top_ngrams_by_size:
+            for ngram, count in ngrams:
+                writer.writerow(prefix + [ngram_name(size), ngram, count, '', '', ''])
+        if is_corpus:
+            for path in sorted(analyzer.documents):
+                for word, count in analyzer.documents[path].get_top_words(top):
+                    writer.writerow([path, 'palabra', word, count, '', '', ''])
+        for words, results in search_results:
+            for result in results:
+                row = ['busqueda', ' '.join(words), '', result['page'], result['paragraph'], result['context']]
+                writer.writerow([result['document']] + row if is_corpus else row)
 
-        # === Mostrar gráfico de frecuencia por página con paginación ===
-        if len(words) == 1:
-            freq_data = self.analyzer.get_word_frequency_per_page(words[0])
-            if freq_data:
-                word = words[0]
-                total_pages = len(freq_data)
-                pages_per_view = 20
-                current_index = [0]  # usamos lista para que sea mutable dentro de funciones anidadas
-
-                # Crear ventana emergente
-                win = ctk.CTkToplevel(self)
-                win.title(f"Frecuencia por página: {word}")
-                win.geometry("900x500")
-
-                # === Contenedor gráfico ===
-                frame_chart = ctk.CTkFrame(win)
-                frame_chart.pack(fill="both", expand=True, padx=10, pady=10)
-
-                figure, ax = plt.subplots(figsize=(8, 3), facecolor='#212121')
-                canvas = FigureCanvasTkAgg(figure, master=frame_chart)
-                canvas.get_tk_widget().pack(fill="both", expand=True)
-
-                # === Función para actualizar gráfico ===
-                def update_chart():
-                    ax.clear()
-                    start = current_index[0]
-                    end = min(start + pages_per_view, total_pages)
-                    subset = freq_data[start:end]
-                    pages, counts = zip(*subset)
-
-                    ax.bar(pages, counts, color='skyblue')
-                    ax.set_xticks(pages)
-                    ax.set_title(f"Frecuencia de '{word}' (páginas {pages[0]}–{pages[-1]})", color='white')
-                    ax.set_xlabel("Página", color='white')
-                    ax.set_ylabel("Frecuencia", color='white')
-                    ax.tick_params(axis='x', colors='white')
-                    ax.tick_params(axis='y', colors='white')
-                    ax.set_facecolor('#212121')
-                    figure.tight_layout()
-                    canvas.draw()
-
-        # === Botones de navegación ===
-        def next_block():
-            if current_index[0] + pages_per_view < total_pages:
-                current_index[0] += pages_per_view
-                update_chart()
-
-        def prev_block():
-            if current_index[0] - pages_per_view >= 0:
-                current_index[0] -= pages_per_view
-                update_chart()
-
-        frame_buttons = ctk.CTkFrame(win)
-        frame_buttons.pack(pady=5)
-
-        prev_button = ctk.CTkButton(frame_buttons, text="◀ Anterior", command=prev_block)
-        next_button = ctk.CTkButton(frame_buttons, text="Siguiente ▶", command=next_block)
-
-        prev_button.pack(side="left", padx=10)
-        next_button.pack(side="right", padx=10)
-
-        # Mostrar el primer bloque
-        update_chart()
-
-    
-    def update_stats(self):
-        if self.analyzer and self.analyzer.word_counts:
-            unique_words = len(self.analyzer.word_counts)
-            total_words = sum(self.analyzer.word_counts.values())
-            
-            self.unique_words_label.configure(text=f"Palabras únicas: {unique_words:,}")
-            self.total_words_label.configure(text=f"Total de palabras: {total_words:,}")
-            self.time_label.configure(text=f"Tiempo de análisis: {self.analyzer.analysis_time:.2f} segundos")
+
+def write_concordance(analyzer, phrases: List[List[str]], output_format: str, window: int, output,
+                      fold: bool = True, fuzzy: bool = False):
+    """
+    Escribe la concordancia KWIC de cada frase en JSON o CSV: una línea por
+    aparición con su contexto izquierdo y derecho. En un corpus se recorre
+    cada documento y cada línea indica el suyo.
+    """
+    is_corpus = isinstance(analyzer, CorpusAnalyzer)
+    documents = [(path, analyzer.documents[path]) for path in sorted(analyzer.documents)] if is_corpus \
+        else [(None, analyzer)]
+    groups = []
+    for words in phrases:
+        lines = []
+        for path, document in documents:
+            for line in document.concordance(words, fold, fuzzy, window).lines():
+                lines.append(dict(line, document=path) if is_corpus else line)
+        groups.append((words, lines))
     
-    def create_heatmap(self):
-        if not self.analyzer or not self.analyzer.word_counts:
-            return
-        
-        for widget in self.canvas_frame.get_frame().winfo_children():
-            widget.destroy()
-        
-        all_words = self.analyzer.get_top_words(n=None)
-        
-        if not all_words:
-            self.no_data_label = ctk.CTkLabel(
-                self.canvas_frame.get_frame(), 
-                text="No hay palabras para mostrar después del filtrado",
-                font=("Arial", 14)
-            )
-            self.no_data_label.pack(expand=True, pady=100)
-            self.info_label.configure(text="")
-            return
-        
-        self.info_label.configure(text=f"Mostrando {len(all_words)} palabras")
-        
-        words, frequencies = zip(*all_words)
-        total_words = len(words)
-        
-        row_height = 0.25
-        fig_height = max(8, total_words * row_height)
-        
-        fig = plt.figure(figsize=(10, fig_height), facecolor='#212121')
-        ax = fig.add_subplot(111)
-        ax.set_facecolor('#212121')
-        
-        freq_array = np.array(frequencies)
-        freq_normalized = (freq_array - freq_array.min()) / (freq_array.max() - freq_array.min())
-        
-        cmap = plt.cm.get_cmap('YlOrRd')
-        
-        color_data = np.zeros((total_words, 1))
-        for i in range(total_words):
-            color_data[i, 0] = freq_normalized[i]
-        
-        ax.set_xlim(0, 5)
-        ax.set_ylim(-1, total_words + 1)
-        ax.axis('off')
-        
-        colorbar_x = 0.3
-        colorbar_width = 0.4
-        word_x = 1.2
-        freq_x = 4.5
-        
-        im = ax.imshow(color_data, 
-                    extent=[colorbar_x, colorbar_x + colorbar_width, -0.5, total_words - 0.5],
-                    aspect='auto', 
-                    cmap=cmap,
-                    interpolation='bilinear')
-        
-        rect = plt.Rectangle((colorbar_x, -0.5), colorbar_width, total_words, 
-                            facecolor='none', edgecolor='white', linewidth=1)
-        ax.add_patch(rect)
-        
-        for i in range(total_words):
-            y_position = total_words - i - 1
-            word = words[i]
-            freq = frequencies[i]
-            
-            ax.text(word_x, y_position, word, va='center', ha='left', 
-                fontsize=10, fontweight='bold', color='white')
-            
-            ax.text(freq_x, y_position, str(freq), va='center', ha='right', 
-                fontsize=10, color='white',
-                bbox=dict(boxstyle='round,pad=0.3', facecolor='#424242', 
-                        alpha=0.8, edgecolor='none'))
-        
-        header_y = total_words + 0.2
-        ax.text(colorbar_x + colorbar_width/2, header_y, 'Color', 
-            va='bottom', ha='center', fontsize=12, fontweight='bold', color='white')
-        ax.text(word_x + 0.8, header_y, 'Palabra', 
-            va='bottom', ha='center', fontsize=12, fontweight='bold', color='white')
-        ax.text(freq_x - 0.2, header_y, 'Frecuencia', 
-            va='bottom', ha='center', fontsize=12, fontweight='bold', color='white')
-        
-        ax.plot([0, 5], [total_words - 0.5, total_words - 0.5], 'w-', linewidth=2)
-        
-        plt.subplots_adjust(left=0.05, right=0.95, top=0.9998, bottom=0.01)
-        
-        canvas = FigureCanvasTkAgg(fig, master=self.canvas_frame.get_frame())
-        canvas.draw()
-        
-        canvas_widget = canvas.get_tk_widget()
-        canvas_widget.pack(fill="both", expand=True, pady=0)
-        
-        plt.close(fig)
+    if output_format == 'json':
+        keys = ['page', 'paragraph', 'left', 'keyword', 'right']
+        names = ['pagina', 'parrafo', 'izquierda', 'palabra', 'derecha']
+        if is_corpus:
+            keys, names = ['document'] + keys, ['documento'] + names
+        data = {
+            'ventana': window,
+            'concordancias': [
+                {'palabras': words, 'lineas': [{name: line[key] for key, name in zip(keys, names)} for line in lines]}
+                for words, lines in groups
+            ]
+        }
+        json.dump(data, output, ensure_ascii=False, indent=2)
+        output.write("\n")
+    else:
+        writer = csv.writer(output)
+        columns = ['busqueda', 'pagina', 'parrafo', 'izquierda', 'palabra', 'derecha']
+        writer.writerow(['documento'] + columns if is_corpus else columns)
+        for words, lines in groups:
+            for line in lines:
+                row = [' '.join(words), line['page'], line['paragraph'], line['left'], line['keyword'], line['right']]
+                writer.writerow([line['document']] + row if is_corpus else row)
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(
+        description="Analizador de palabras en PDF. Sin archivo abre la interfaz gráfica; "
+                    "con un archivo corre el análisis sin interfaz y escribe JSON o CSV."
+    )
+    parser.add_argument(
+        "pdf",
+        nargs="?",
+        help="PDF a analizar sin interfaz gráfica; una carpeta o un patrón glob analiza todo el corpus"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=sorted(EXTRACTION_BACKENDS),
+        default="pypdf2",
+        help="Backend de extracción de texto (pymupdf es el más rápido)"
+    )
+    parser.add_argument(
+        "--sin-cache",
+        action="store_true",
+        help="Ignora la caché de análisis en disco"
+    )
+    parser.add_argument(
+        "--indice-disco",
+        action="store_true",
+        help="Guardar el índice en disco y, si ya existe, buscar sobre él (mmap) sin cargar las páginas"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Número de workers")
+    parser.add_argument("--procesos", action="store_true", help="Extraer y contar en procesos separados")
+    parser.add_argument(
+        "--buscar",
+        action="append",
+        default=[],
+        metavar="PALABRAS",
+        help="Frase a buscar, palabras separadas por comas (se puede repetir)"
+    )
+    parser.add_argument(
+        "--exacta",
+        action="store_true",
+        help="Buscar respetando los acentos (por defecto 'analisis' también encuentra 'análisis')"
+    )
+    parser.add_argument(
+        "--difusa",
+        action="store_true",
+        help="Buscar también palabras con errores de escritura (distancia de edición 1-2)"
+    )
+    parser.add_argument(
+        "--concordancia",
+        action="append",
+        default=[],
+        metavar="PALABRAS",
+        help="Escribir sólo la concordancia KWIC de la frase (palabras separadas por comas; se puede repetir)"
+    )
+    parser.add_argument(
+        "--ventana",
+        type=int,
+        default=5,
+        metavar="N",
+        help="Concordancia: palabras de contexto a cada lado"
+    )
+    parser.add_argument("--formato", choices=["json", "csv"], default="json")
+    parser.add_argument("--top", type=int, default=None, help="Sólo las N palabras más frecuentes")
+    parser.add_argument(
+        "--stopwords",
+        default=None,
+        metavar="LISTA",
+        help="Omitir stopwords en los rankings: 'es', 'en', 'es,en' o un archivo con una palabra por línea"
+    )
+    parser.add_argument(
+        "--ngramas",
+        type=int,
+        default=2,
+        metavar="N",
+        help="Contar n-gramas de hasta N palabras (por defecto bigramas; 3 agrega trigramas, 1 los desactiva)"
+    )
+    parser.add_argument("--top-ngramas", type=int, default=50, help="N-gramas más frecuentes a reportar")
+    parser.add_argument(
+        "--aproximado",
+        action="store_true",
+        help="Conteo aproximado con memoria acotada (sin búsqueda); para colecciones muy grandes"
+    )
+    parser.add_argument(
+        "--contadores",
+        type=int,
+        default=10000,
+        metavar="K",
+        help="Modo aproximado: contadores por resumen (más contadores, menos error)"
+    )
+    parser.add_argument(
+        "--timeout-pagina",
+        type=float,
+        default=None,
+        metavar="SEG",
+        help="Omitir (contar como vacías) las páginas cuya extracción tarde más de SEG segundos"
+    )
+    parser.add_argument(
+        "--perfil",
+        default=None,
+        metavar="ARCHIVO",
+        help="Guardar un perfil de cProfile del análisis (se lee con python -m pstats ARCHIVO)"
+    )
+    parser.add_argument(
+        "--servidor",
+        action="store_true",
+        help="Abrir el servicio HTTP local de análisis (ver PDFcount_server.py) en vez de la interfaz"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Servidor: dirección de escucha")
+    parser.add_argument("--puerto", type=int, default=8765, help="Servidor: puerto")
+    parser.add_argument("--simultaneos", type=int, default=2, help="Servidor: análisis a la vez")
+    parser.add_argument("--cola", type=int, default=16, help="Servidor: trabajos en espera antes de rechazar subidas")
+    parser.add_argument("--salida", help="Archivo de salida (por defecto, la salida estándar)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostrar el registro en stderr")
+    args = parser.parse_args(argv)
     
-    def save_results(self):
-        if not self.analyzer or not self.analyzer.word_counts:
-            messagebox.showerror("Error", "No hay resultados para guardar")
-            return
-        
-        filename = filedialog.asksaveasfilename(
-            defaultextension=".txt",
-            filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
-            initialfile="analisis_palabras.txt"
+    if args.servidor:
+        try:
+            stopwords = load_stopwords(args.stopwords) if args.stopwords else None
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        from PDFcount_server import run_server
+        run_server(
+            host=args.host,
+            port=args.puerto,
+            concurrent_jobs=args.simultaneos,
+            queue_size=args.cola,
+            callback=lambda message: print(message, file=sys.stderr),
+            num_workers=args.workers,
+            use_processes=args.procesos,
+            backend=args.backend,
+            use_cache=not args.sin_cache,
+            stopwords=stopwords,
+            max_ngram=args.ngramas,
+            disk_index=args.indice_disco,
+            page_timeout=args.timeout_pagina
         )
-        
-        if filename:
-            try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write("ANÁLISIS DE FRECUENCIA DE PALABRAS\n")
-                    f.write("=" * 50 + "\n\n")
-                    f.write(f"Archivo analizado: {os.path.basename(self.pdf_path)}\n")
-                    f.write(f"Workers utilizados: {self.analyzer.num_workers}\n")
-                    f.write(f"Tiempo de análisis: {self.analyzer.analysis_time:.2f} segundos\n")
-                    f.write(f"Total de palabras únicas: {len(self.analyzer.word_counts)}\n")
-                    f.write(f"Total de palabras: {sum(self.analyzer.word_counts.values())}\n\n")
-                    
-                    f.write("TODAS LAS PALABRAS:\n")
-                    f.write("-" * 50 + "\n")
-                    
-                    all_words = self.analyzer.get_top_words(n=None)
-                    for word, count in all_words:
-                        f.write(f"{word:30} {count:>10}\n")
-                
-                messagebox.showinfo("Éxito", f"Análisis guardado en:\n{filename}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Error al guardar el archivo: {str(e)}")
+        return 0
     
-    def save_search_results(self):
-        if not self.last_search_results or not self.last_search_words:
-            messagebox.showerror("Error", "No hay resultados de búsqueda para guardar")
-            return
-        
-        filename = filedialog.asksaveasfilename(
-            defaultextension=".txt",
-            filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
-            initialfile="busqueda_frases.txt"
+    if not args.pdf:
+        # Las dependencias gráficas sólo se cargan al abrir la interfaz
+        from PDFcount_gui import run_app
+        run_app(backend=args.backend, use_cache=not args.sin_cache)
+        return 0
+    
+    is_corpus = os.path.isdir(args.pdf) or any(char in args.pdf for char in '*?[')
+    if not is_corpus and not os.path.exists(args.pdf):
+        print(f"Error: No se encontró el archivo {args.pdf}", file=sys.stderr)
+        return 1
+    
+    try:
+        stopwords = load_stopwords(args.stopwords) if args.stopwords else None
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    
+    log = (lambda message: print(message, file=sys.stderr)) if args.verbose else None
+    if is_corpus:
+        analyzer = CorpusAnalyzer(
+            args.pdf,
+            num_workers=args.workers,
+            callback=log,
+            backend=args.backend,
+            use_cache=not args.sin_cache,
+            stopwords=stopwords,
+            max_ngram=args.ngramas,
+            approximate=args.aproximado,
+            sketch_capacity=args.contadores,
+            page_timeout=args.timeout_pagina,
+            cprofile_path=args.perfil
         )
-        
-        if filename:
-            try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write("RESULTADOS DE BÚSQUEDA DE FRASES\n")
-                    f.write("=" * 70 + "\n\n")
-                    f.write(f"Archivo analizado: {os.path.basename(self.pdf_path)}\n")
-                    f.write(f"Palabras buscadas: {', '.join(self.last_search_words)}\n")
-                    f.write(f"Total de coincidencias: {len(self.last_search_results)}\n")
-                    f.write(f"Fecha: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                    
-                    if not self.last_search_results:
-                        f.write("No se encontraron coincidencias.\n")
-                    else:
-                        f.write("COINCIDENCIAS ENCONTRADAS:\n")
-                        f.write("-" * 70 + "\n\n")
-                        
-                        for i, result in enumerate(self.last_search_results, 1):
-                            f.write(f"[Coincidencia {i}]\n")
-                            f.write(f"  Página: {result['page']}\n")
-                            f.write(f"  Párrafo: {result['paragraph']}\n")
-                            f.write(f"  Contexto: {result['context']}\n")
-                            f.write("-" * 70 + "\n\n")
-                
-                messagebox.showinfo("Éxito", f"Resultados de búsqueda guardados en:\n{filename}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Error al guardar el archivo: {str(e)}")
+    else:
+        analyzer = PDFWordAnalyzer(
+            args.pdf,
+            num_workers=args.workers,
+            callback=log,
+            use_processes=args.procesos,
+            backend=args.backend,
+            use_cache=not args.sin_cache,
+            stopwords=stopwords,
+            max_ngram=args.ngramas,
+            approximate=args.aproximado,
+            sketch_capacity=args.contadores,
+            disk_index=args.indice_disco,
+            page_timeout=args.timeout_pagina,
+            cprofile_path=args.perfil
+        )
+    
+    # El primer Ctrl+C cancela el análisis limpiamente; el segundo lo interrumpe de inmediato
+    def handle_interrupt(signum, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        print("Cancelando análisis (Ctrl+C otra vez para salir)...", file=sys.stderr)
+        analyzer.cancel()
+    
+    signal.signal(signal.SIGINT, handle_interrupt)
+    try:
+        analyzer.analyze()
+    finally:
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+    if analyzer.cancelled:
+        print("Análisis cancelado", file=sys.stderr)
+        return 130
+    if is_corpus:
+        # Un documento dañado no invalida el resto del corpus, pero siempre se avisa
+        for path, error in sorted(analyzer.failed_documents.items()):
+            print(f"Error en {path}: {error}", file=sys.stderr)
+        if analyzer.failed_documents and not analyzer.analyzed_documents():
+            return 1
+    elif analyzer.error:
+        print(f"Error: {analyzer.error}", file=sys.stderr)
+        return 1
+    
+    searches = [[w.strip() for w in phrase.split(',') if w.strip()] for phrase in args.buscar]
+    searches = [words for words in searches if words]
+    concordances = [[w.strip() for w in phrase.split(',') if w.strip()] for phrase in args.concordancia]
+    concordances = [words for words in concordances if words]
+    
+    def write(output):
+        if concordances:
+            write_concordance(analyzer, concordances, args.formato, args.ventana, output,
+                              not args.exacta, args.difusa)
+        else:
+            write_results(analyzer, searches, args.formato, args.top, output, args.top_ngramas,
+                          not args.exacta, args.difusa)
+    
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8', newline='') as output:
+            write(output)
+    else:
+        write(sys.stdout)
+    return 0
 
 
 if __name__ == "__main__":
-    app = PDFAnalyzerApp()
-    app.mainloop()
-
+    sys.exit(main())
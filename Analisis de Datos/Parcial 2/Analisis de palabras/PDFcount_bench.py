@@ -0,0 +1,454 @@
+"""
+Benchmark del analizador de palabras con PDF sintéticos.
+
+Genera con fitz PDF de tamaño configurable (páginas, palabras por página,
+tamaño del vocabulario y fracción de páginas con 10× más texto) y mide la
+extracción, el análisis completo (conteo) para cada combinación de workers
+y tamaño de lote (0 = lotes por costo de PDFWordAnalyzer.plan_batches, N =
+lotes fijos de N páginas en orden), la construcción
+del índice, la búsqueda de frases y la preparación de los datos del mapa
+de calor. Los resultados se escriben en JSON para comparar corridas:
+
+    python PDFcount_bench.py --paginas 200 1000 --workers 1 2 4 --lotes 0 10 50 --salida base.json
+    python PDFcount_bench.py --paginas 200 1000 --workers 1 2 4 --lotes 0 10 50 --comparar base.json
+
+Con --comparar se listan las métricas que empeoraron más que --tolerancia
+y el programa termina con código 1. Con --control-timeout se verifica
+además que el tiempo límite por página omita sólo las páginas lentas, y
+con --control-indice que el índice en disco responda igual que en memoria.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import Dict, List
+
+import fitz
+
+from PDFcount import EXTRACTION_BACKENDS, AnalysisCache, PDFWordAnalyzer, iter_page_texts
+
+SYLLABLES = ('ma', 'de', 'lo', 'ción', 'ra', 'te', 'se', 'pa', 'ri', 'mo', 'na', 'es', 'tu', 'lí', 'ca', 'do',
+             'ñe', 'ga', 'vi', 'sol', 'tra', 'men', 'por', 'bú', 'que', 'al', 'fi', 'zo', 'ten', 'gu')
+WORDS_PER_LINE = 12
+LINES_PER_PARAGRAPH = 6
+HEAVY_PAGE_FACTOR = 10  # Las páginas "pesadas" llevan este múltiplo de palabras
+SLOW_PAGE_FACTOR = 100  # La página lenta del control de tiempo límite lleva este múltiplo de palabras
+TIMEOUT_CHECK_PAGES = 700  # Con PyPDF2, el arranque en frío crece con las páginas (lee todo el árbol)
+TIMEOUT_CHECK_SLOW_PAGE = 10  # Índice de la única página lenta
+TIMEOUT_CHECK_MARGIN = 4  # Tiempo límite del control, en múltiplos de la página normal más lenta
+FONT_SIZE = 9
+LINE_HEIGHT = 1.2  # Interlineado, en múltiplos de FONT_SIZE
+
+
+def synthetic_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """size palabras distintas armadas con sílabas (todas coinciden con WORD_PATTERN)"""
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))))
+    return sorted(words)
+
+
+def make_pdf(path: str, pages: int, words_per_page: int, vocabulary_size: int, heavy_fraction: float = 0.0,
+             seed: int = 0, slow_page: int = None):
+    """
+    Escribe un PDF de texto con palabras elegidas según una distribución de
+    Zipf (pocas palabras muy frecuentes, muchas raras), en líneas de
+    WORDS_PER_LINE palabras y párrafos separados por una línea en blanco.
+    La altura de cada página se ajusta a su texto. slow_page lleva
+    SLOW_PAGE_FACTOR veces más palabras.
+    """
+    rng = random.Random(seed)
+    vocabulary = synthetic_vocabulary(vocabulary_size, rng)
+    rng.shuffle(vocabulary)
+    cum_weights = list(accumulate(1 / rank for rank in range(1, vocabulary_size + 1)))
+    heavy_pages = set(rng.sample(range(pages), round(pages * heavy_fraction)))
+    
+    document = fitz.open()
+    for page_num in range(pages):
+        count = words_per_page * (HEAVY_PAGE_FACTOR if page_num in heavy_pages else 1)
+        if page_num == slow_page:
+            count = words_per_page * SLOW_PAGE_FACTOR
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=count)
+        lines = []
+        for i in range(0, count, WORDS_PER_LINE):
+            if i and i % (WORDS_PER_LINE * LINES_PER_PARAGRAPH) == 0:
+                lines.append('')
+            lines.append(' '.join(words[i:i + WORDS_PER_LINE]))
+        page = document.new_page(width=595, height=max(842, 72 + len(lines) * FONT_SIZE * LINE_HEIGHT))
+        page.insert_text((36, 36 + FONT_SIZE), '\n'.join(lines), fontsize=FONT_SIZE,
+                         lineheight=LINE_HEIGHT)
+    
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    document.save(tmp_path, garbage=3, deflate=True)
+    document.close()
+    os.replace(tmp_path, path)
+
+
+def synthetic_pdf(directory: str, pages: int, words_per_page: int, vocabulary_size: int,
+                  heavy_fraction: float = 0.0, seed: int = 0, slow_page: int = None) -> str:
+    """Ruta del PDF con estos parámetros; se genera sólo si no existe"""
+    name = f"sintetico_p{pages}_w{words_per_page}_v{vocabulary_size}_h{heavy_fraction:g}_s{seed}"
+    if slow_page is not None:
+        name += f"_lenta{slow_page}"
+    path = os.path.join(directory, f"{name}.pdf")
+    if not os.path.exists(path):
+        make_pdf(path, pages, words_per_page, vocabulary_size, heavy_fraction, seed, slow_page)
+    return path
+
+
+class FixedBatchAnalyzer(PDFWordAnalyzer):
+    """PDFWordAnalyzer con lotes fijos de pages_per_batch páginas en orden (0 = lotes por costo)"""
+    
+    def __init__(self, pdf_path: str, pages_per_batch: int = 0, **kwargs):
+        super().__init__(pdf_path, **kwargs)
+        self.pages_per_batch = pages_per_batch
+        self.batch_count = 0
+    
+    def plan_batches(self, items: List, costs: List[float]) -> List[List]:
+        if self.pages_per_batch:
+            batches = [items[i:i + self.pages_per_batch] for i in range(0, len(items), self.pages_per_batch)]
+        else:
+            batches = super().plan_batches(items, costs)
+        self.batch_count = len(batches)
+        return batches
+
+
+def timings(samples: List[float]) -> Dict:
+    return {
+        'mediana': round(statistics.median(samples), 6),
+        'minimo': round(min(samples), 6),
+        'muestras': [round(sample, 6) for sample in samples]
+    }
+
+
+def time_call(function, repeat: int) -> Dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return timings(samples)
+
+
+def benchmark_phrases(analyzer: PDFWordAnalyzer, count: int = 10) -> List[List[str]]:
+    """Frases de prueba: bigramas frecuentes, palabras sueltas y una frase sin coincidencias"""
+    phrases = [ngram.split() for ngram, _ in analyzer.get_top_ngrams(2, count // 2)]
+    phrases += [[word] for word, _ in analyzer.get_top_words(count - len(phrases) - 1)]
+    phrases.append(['zzz', 'inexistente'])
+    return phrases
+
+
+def benchmark_document(pdf_path: str, worker_counts: List[int], batch_sizes: List[int], repeat: int,
+                       backend: str = 'pymupdf', use_processes: bool = False, log=None) -> Dict:
+    """Mide un PDF; el índice, la búsqueda y el mapa de calor no dependen de workers ni lotes"""
+    extractor = EXTRACTION_BACKENDS[backend](pdf_path)
+    try:
+        page_count = extractor.page_count()
+    finally:
+        extractor.close()
+    
+    def extract_all():
+        for _ in iter_page_texts(pdf_path, backend, list(range(page_count))):
+            pass
+    
+    result = {'extraccion': time_call(extract_all, repeat), 'corridas': []}
+    analyzer = None
+    for num_workers in worker_counts:
+        for batch_size in batch_sizes:
+            samples = []
+            stages = []
+            for _ in range(repeat):
+                analyzer = FixedBatchAnalyzer(pdf_path, pages_per_batch=batch_size, num_workers=num_workers,
+                                              use_processes=use_processes, backend=backend, use_cache=False)
+                analyzer.analyze()
+                if analyzer.error:
+                    raise RuntimeError(analyzer.error)
+                samples.append(analyzer.analysis_time)
+                stages.append(analyzer.profile.totals)
+            run = {
+                'workers': num_workers,
+                'lote': batch_size,
+                'lotes': analyzer.batch_count,
+                'tiempo': timings(samples),
+                # Segundos por etapa (mediana); extracción y tokenización suman el tiempo de todas las páginas
+                'etapas': {
+                    stage: round(statistics.median(totals.get(stage, 0.0) for totals in stages), 6)
+                    for stage in analyzer.profile.stages()
+                },
+                # De la última repetición: lotes, páginas y fracción del reparto ocupada por worker
+                'uso_workers': analyzer.profile.worker_usage()
+            }
+            result['corridas'].append(run)
+            if log:
+                log(f"  workers={num_workers} lote={batch_size or 'costo'} ({run['lotes']} lotes): "
+                    f"{run['tiempo']['mediana']:.3f} s")
+    
+    phrases = benchmark_phrases(analyzer)
+    
+    def heatmap_data():
+        # Lo que piden create_heatmap y show_page_distribution en la interfaz
+        analyzer.get_top_words(n=None)
+        analyzer.get_top_ngrams(2)
+        analyzer.get_page_distribution(n=20)
+    
+    result.update({
+        'total_palabras': analyzer.get_total_words(),
+        'palabras_unicas': len(analyzer.word_counts),
+        'indice': time_call(analyzer.build_index, repeat),
+        'matriz_paginas': time_call(analyzer.build_page_matrix, repeat),
+        'frases': len(phrases),
+        'busqueda': time_call(lambda: analyzer.search_phrases(phrases), repeat),
+        'busqueda_difusa': time_call(lambda: analyzer.search_phrases(phrases, fuzzy=True), repeat),
+        'mapa_de_calor': time_call(heatmap_data, repeat)
+    })
+    return result
+
+
+def timed_skips(pdf_path: str, backend: str, page_nums: List[int], timeout: float) -> List[int]:
+    """Páginas que omite iter_page_texts con este tiempo límite"""
+    skipped = {}
+    for _ in iter_page_texts(pdf_path, backend, page_nums, timeout, skipped_pages=skipped):
+        pass
+    return sorted(skipped)
+
+
+def check_page_timeout(directory: str, backend: str, words_per_page: int, vocabulary_size: int) -> List[str]:
+    """
+    Control de regresión del tiempo límite por página: en un PDF con una
+    sola página lenta, iter_page_texts debe omitir exactamente esa página.
+    El límite es TIMEOUT_CHECK_MARGIN veces la página normal más lenta en
+    caliente, y la lenta tiene que tardar al menos el doble que eso; con
+    PyPDF2 queda por debajo del arranque en frío de un proceso nuevo.
+    Devuelve los problemas hallados.
+    """
+    pdf_path = synthetic_pdf(directory, TIMEOUT_CHECK_PAGES, words_per_page, vocabulary_size,
+                             slow_page=TIMEOUT_CHECK_SLOW_PAGE)
+    page_nums = list(range(TIMEOUT_CHECK_PAGES))
+    # La primera extracción paga el arranque en frío: la página 1 va también al
+    # principio y en el diccionario queda su segunda medición, en caliente
+    seconds = {page_num: elapsed for page_num, _, elapsed in iter_page_texts(pdf_path, backend, [1] + page_nums)}
+    slow = seconds.pop(TIMEOUT_CHECK_SLOW_PAGE)
+    timeout = TIMEOUT_CHECK_MARGIN * max(seconds.values())
+    if slow < 2 * timeout:
+        return [f"la página lenta ({slow * 1000:.1f} ms) no se distingue de las normales "
+                f"(límite de {timeout * 1000:.1f} ms)"]
+    
+    # En un intérprete nuevo, como el análisis: los hijos que levanta el
+    # extractor no heredan el backend ya cargado por las mediciones de arriba
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        skipped = executor.submit(timed_skips, pdf_path, backend, page_nums, timeout).result()
+    if skipped != [TIMEOUT_CHECK_SLOW_PAGE + 1]:
+        return [f"con {timeout * 1000:.1f} ms por página se omitieron las páginas {skipped} "
+                f"en vez de sólo la {TIMEOUT_CHECK_SLOW_PAGE + 1}"]
+    return []
+
+
+def check_disk_index(pdf_path: str, backend: str) -> List[str]:
+    """
+    Control del índice en disco (mmap): búsqueda exacta, sin acentos y
+    difusa, concordancia y frecuencia por página tienen que dar lo mismo
+    que con el análisis en memoria. Devuelve los problemas hallados.
+    """
+    memory = PDFWordAnalyzer(pdf_path, backend=backend, use_cache=False)
+    memory.analyze()
+    phrases = benchmark_phrases(memory)
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = AnalysisCache(cache_dir)
+        # La primera corrida guarda el índice; la segunda lo abre sin cargar las páginas
+        for _ in range(2):
+            mapped = PDFWordAnalyzer(pdf_path, backend=backend, cache=cache, disk_index=True)
+            mapped.analyze()
+        if mapped.mapped_index is None:
+            return [f"no se abrió el índice en disco ({mapped.error or 'sin error'})"]
+        
+        problems = []
+        for fold, fuzzy in ((False, False), (True, False), (True, True)):
+            mode = f"fold={fold} fuzzy={fuzzy}"
+            if mapped.search_phrases(phrases, fold, fuzzy) != memory.search_phrases(phrases, fold, fuzzy):
+                problems.append(f"la búsqueda ({mode}) no coincide con la de memoria")
+            if any(len(mapped.concordance(phrase, fold, fuzzy)) != len(memory.concordance(phrase, fold, fuzzy))
+                   for phrase in phrases):
+                problems.append(f"la concordancia ({mode}) no coincide con la de memoria")
+            words = [phrase[0] for phrase in phrases]
+            if (mapped.get_words_frequency_per_page(words, fold, fuzzy)
+                    != memory.get_words_frequency_per_page(words, fold, fuzzy)):
+                problems.append(f"la frecuencia por página ({mode}) no coincide con la de memoria")
+        return problems
+
+
+def document_key(document: Dict) -> str:
+    return (f"p{document['paginas']} w{document['palabras_por_pagina']} v{document['vocabulario']} "
+            f"h{document['paginas_pesadas']:g}")
+
+
+def flatten_metrics(results: Dict) -> Dict[str, float]:
+    """
+    Nombre de métrica -> mediana en segundos, para comparar dos corridas del
+    benchmark. El nombre lleva el backend y el modo (hilos o procesos): los
+    tiempos de configuraciones distintas no se comparan entre sí.
+    """
+    environment = results['entorno']
+    mode = f"{environment['backend']} {'procesos' if environment['procesos'] else 'hilos'}"
+    metrics = {}
+    for document in results['documentos']:
+        key = f"{mode} {document_key(document)}"
+        for name in ('extraccion', 'indice', 'matriz_paginas', 'busqueda', 'busqueda_difusa', 'mapa_de_calor'):
+            metrics[f"{key} {name}"] = document[name]['mediana']
+        for run in document['corridas']:
+            metrics[f"{key} analisis workers={run['workers']} lote={run['lote']}"] = run['tiempo']['mediana']
+    return metrics
+
+
+def compare_results(baseline: Dict, current: Dict, tolerance: float, log=None) -> List[str]:
+    """
+    Métricas presentes en ambas corridas que tardan más de (1 + tolerance)
+    veces la base. Las que están en una sola corrida no se pueden comparar:
+    se avisan por log en lugar de ignorarlas en silencio.
+    """
+    before = flatten_metrics(baseline)
+    after = flatten_metrics(current)
+    if log:
+        for name in sorted(before.keys() - after.keys()):
+            log(f"Aviso: {name} sólo está en la base, no se compara")
+        for name in sorted(after.keys() - before.keys()):
+            log(f"Aviso: {name} no está en la base, no se compara")
+        if not before.keys() & after.keys():
+            log("Aviso: ninguna métrica en común con la base (¿otro backend o modo?)")
+    
+    regressions = []
+    for name, seconds in after.items():
+        if name in before and before[name] > 0 and seconds > before[name] * (1 + tolerance):
+            change = (seconds / before[name] - 1) * 100
+            regressions.append(f"{name}: {before[name]:.4f} s -> {seconds:.4f} s (+{change:.0f}%)")
+    return regressions
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark de PDFWordAnalyzer con PDF sintéticos")
+    parser.add_argument("--paginas", type=int, nargs="+", default=[200], help="Páginas de cada PDF a generar")
+    parser.add_argument("--palabras-pagina", type=int, default=400, help="Palabras por página")
+    parser.add_argument("--vocabulario", type=int, default=5000, help="Palabras distintas del vocabulario")
+    parser.add_argument(
+        "--pesadas",
+        type=float,
+        default=0.0,
+        metavar="FRACCION",
+        help=f"Fracción de páginas con {HEAVY_PAGE_FACTOR}× más texto"
+    )
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument(
+        "--lotes",
+        type=int,
+        nargs="+",
+        default=[0],
+        metavar="N",
+        help="Páginas por lote en orden (0 = lotes de costo parecido repartidos a demanda)"
+    )
+    parser.add_argument("--procesos", action="store_true", help="Extraer y contar en procesos separados")
+    parser.add_argument("--backend", choices=sorted(EXTRACTION_BACKENDS), default="pymupdf")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument(
+        "--dir",
+        default=os.path.join(tempfile.gettempdir(), "pdfcount_bench"),
+        help="Carpeta donde se generan (y reutilizan) los PDF sintéticos"
+    )
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto, la salida estándar)")
+    parser.add_argument("--comparar", metavar="BASE", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Empeoramiento aceptado al comparar (0.10 = 10%%)")
+    parser.add_argument(
+        "--control-timeout",
+        action="store_true",
+        help="Verificar que el tiempo límite por página omita sólo la página lenta de un PDF de prueba"
+    )
+    parser.add_argument(
+        "--control-indice",
+        action="store_true",
+        help="Verificar que el índice en disco busque igual que el análisis en memoria (primer PDF)"
+    )
+    args = parser.parse_args(argv)
+    # Valores repetidos darían corridas con la misma clave de métrica
+    args.paginas, args.workers, args.lotes = (list(dict.fromkeys(values))
+                                              for values in (args.paginas, args.workers, args.lotes))
+    
+    log = lambda message: print(message, file=sys.stderr)
+    os.makedirs(args.dir, exist_ok=True)
+    results = {
+        'entorno': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+            'pymupdf': fitz.VersionBind,
+            'backend': args.backend,
+            'procesos': args.procesos,
+            'repeticiones': args.repeticiones
+        },
+        'documentos': []
+    }
+    
+    pdf_paths = []
+    for pages in args.paginas:
+        generate_start = time.perf_counter()
+        pdf_path = synthetic_pdf(args.dir, pages, args.palabras_pagina, args.vocabulario, args.pesadas, args.semilla)
+        log(f"{os.path.basename(pdf_path)} ({time.perf_counter() - generate_start:.1f} s para generarlo)")
+        pdf_paths.append(pdf_path)
+        document = {
+            'archivo': os.path.basename(pdf_path),
+            'paginas': pages,
+            'palabras_por_pagina': args.palabras_pagina,
+            'vocabulario': args.vocabulario,
+            'paginas_pesadas': args.pesadas
+        }
+        document.update(benchmark_document(pdf_path, args.workers, args.lotes, args.repeticiones,
+                                           args.backend, args.procesos, log))
+        results['documentos'].append(document)
+    
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as output:
+            json.dump(results, output, ensure_ascii=False, indent=2)
+            output.write("\n")
+    else:
+        json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    
+    exit_code = 0
+    if args.control_timeout:
+        problems = check_page_timeout(args.dir, args.backend, args.palabras_pagina, args.vocabulario)
+        for line in problems:
+            log(f"Control de tiempo límite: {line}")
+        if problems:
+            exit_code = 1
+        else:
+            log("Control de tiempo límite: sólo se omitió la página lenta")
+    
+    if args.control_indice:
+        problems = check_disk_index(pdf_paths[0], args.backend)
+        for line in problems:
+            log(f"Control del índice en disco: {line}")
+        if problems:
+            exit_code = 1
+        else:
+            log("Control del índice en disco: mismos resultados que en memoria")
+    
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as baseline_file:
+            regressions = compare_results(json.load(baseline_file), results, args.tolerancia, log)
+        for line in regressions:
+            log(f"Regresión: {line}")
+        if regressions:
+            return 1
+        log("Sin regresiones respecto de la base")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1728 @@
+"""
+Interfaz gráfica del analizador de palabras en PDF.
+
+Se importa de forma diferida desde PDFcount.main para que el análisis sin
+interfaz no cargue customtkinter, matplotlib, PIL ni fitz.
+"""
+import customtkinter as ctk
+from tkinter import filedialog, messagebox, Canvas
+import threading
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from itertools import groupby
+from operator import itemgetter
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import numpy as np
+import os
+import time
+from typing import List, Tuple
+from PIL import Image, ImageTk
+import fitz 
+
+from PDFcount import (AnalysisCache, PDFWordAnalyzer, ProgressTracker, STOPWORDS_EN, STOPWORDS_ES, WORD_PATTERN,
+                      match_spans, ngram_name)
+
+# Configurar el tema de customtkinter
+ctk.set_appearance_mode("dark")
+ctk.set_default_color_theme("blue")
+
+
+def render_thumbnails_worker(pdf_path: str, page_nums: List[int], zoom: float, out_dir: str) -> List[int]:
+    """Trabajo de un proceso: renderiza miniaturas PNG de las páginas dadas en out_dir"""
+    # AnalysisCache.evict pudo borrar la carpeta si otro programa llenó la caché
+    os.makedirs(out_dir, exist_ok=True)
+    document = fitz.open(pdf_path)
+    try:
+        for page_num in page_nums:
+            path = os.path.join(out_dir, f"{page_num}.png")
+            if os.path.exists(path):
+                continue
+            pix = document[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            pix.save(tmp_path, output="png")
+            os.replace(tmp_path, path)
+    finally:
+        document.close()
+    
+    return page_nums
+
+
+class ScrollableHeatmap(ctk.CTkFrame):
+    """
+    Mapa de calor virtualizado: sólo se dibujan en el canvas las filas
+    visibles. Se muestran primero las PAGE_SIZE palabras más frecuentes
+    y se agregan más filas de la lista ordenada al llegar al final.
+    """
+    
+    ROW_HEIGHT = 24
+    PAGE_SIZE = 200
+    
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        
+        self.header = Canvas(self, bg='#212121', height=self.ROW_HEIGHT + 8, highlightthickness=0, bd=0)
+        self.canvas = Canvas(self, bg='#212121', highlightthickness=0, bd=0, yscrollincrement=self.ROW_HEIGHT)
+        self.scrollbar = ctk.CTkScrollbar(self, orientation="vertical", command=self.canvas.yview)
+        
+        self.canvas.configure(yscrollcommand=self._on_view_change)
+        
+        self.header.pack(side="top", fill="x", padx=0, pady=0)
+        self.canvas.pack(side="left", fill="both", expand=True, padx=0, pady=0)
+        self.scrollbar.pack(side="right", fill="y", padx=0, pady=0)
+        
+        self.rows = []  # (palabra, frecuencia) ordenadas de mayor a menor
+        self.loaded_rows = 0  # Filas disponibles en la región de scroll
+        self.cmap = plt.get_cmap('YlOrRd')
+        self.min_frequency = 0
+        self.max_frequency = 0
+        self.message = ""
+        self.column_title = 'Palabra'
+        self.on_rows_loaded = None
+        self._render_pending = False
+        
+        self.canvas.bind("<Configure>", lambda e: self._schedule_render())
+        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind_all("<Button-4>", self._on_mousewheel)
+        self.canvas.bind_all("<Button-5>", self._on_mousewheel)
+
+    def _on_mousewheel(self, event):
+        if event.delta:
+            self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        elif event.num == 4:
+            self.canvas.yview_scroll(-1, "units")
+        elif event.num == 5:
+            self.canvas.yview_scroll(1, "units")
+    
+    def _on_view_change(self, first, last):
+        self.scrollbar.set(first, last)
+        self._schedule_render()
+    
+    def _schedule_render(self):
+        # Agrupar varios eventos de scroll en un solo redibujado
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+    
+    def show_message(self, message: str):
+        self.rows = []
+        self.loaded_rows = 0
+        self.message = message
+        self.canvas.configure(scrollregion=(0, 0, 0, 0))
+        self.canvas.yview_moveto(0)
+        self._schedule_render()
+    
+    def set_rows(self, rows: List[Tuple[str, int]], on_rows_loaded=None, column_title: str = 'Palabra'):
+        """Carga la lista ordenada de (palabra, frecuencia); on_rows_loaded(n) avisa cuántas filas hay disponibles"""
+        self.rows = rows
+        self.message = ""
+        self.column_title = column_title
+        self.on_rows_loaded = on_rows_loaded
+        frequencies = [freq for _, freq in rows]
+        self.max_frequency = max(frequencies)
+        self.min_frequency = min(frequencies)
+        self.loaded_rows = 0
+        self.canvas.yview_moveto(0)
+        self._load_more_rows()
+    
+    def _load_more_rows(self):
+        self.loaded_rows = min(len(self.rows), self.loaded_rows + self.PAGE_SIZE)
+        self.canvas.configure(scrollregion=(0, 0, 1, self.loaded_rows * self.ROW_HEIGHT))
+        if self.on_rows_loaded:
+            self.on_rows_loaded(self.loaded_rows)
+        self._schedule_render()
+    
+    def _column_positions(self, width: int) -> Tuple[float, float, float, float]:
+        # Barra de color, inicio de la barra, texto de palabra y frecuencia (alineada a la derecha)
+        return width * 0.06, width * 0.14, width * 0.22, width * 0.92
+    
+    def _row_color(self, frequency: int) -> str:
+        spread = self.max_frequency - self.min_frequency
+        normalized = (frequency - self.min_frequency) / spread if spread else 1.0
+        r, g, b, _ = self.cmap(normalized)
+        return f"#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}"
+    
+    def _render(self):
+        self._render_pending = False
+        self.canvas.delete("all")
+        self.header.delete("all")
+        
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return
+        
+        if self.message:
+            self.canvas.create_text(width / 2, 60, text=self.message, fill='white',
+                                    font=("Arial", 12), width=width - 20)
+            return
+        
+        if not self.rows:
+            return
+        
+        color_start, color_end, word_x, freq_x = self._column_positions(width)
+        header_y = (self.ROW_HEIGHT + 8) / 2
+        font_header = ("Arial", 12, "bold")
+        self.header.create_text((color_start + color_end) / 2, header_y, text='Color', fill='white', font=font_header)
+        self.header.create_text(word_x, header_y, text=self.column_title, anchor="w", fill='white', font=font_header)
+        self.header.create_text(freq_x, header_y, text='Frecuencia', anchor="e", fill='white', font=font_header)
+        self.header.create_line(0, self.ROW_HEIGHT + 6, width, self.ROW_HEIGHT + 6, fill='white', width=2)
+        
+        # Sólo las filas que caen dentro de la vista
+        top = self.canvas.canvasy(0)
+        first_row = max(0, int(top // self.ROW_HEIGHT))
+        last_row = min(self.loaded_rows, int((top + height) // self.ROW_HEIGHT) + 1)
+        
+        for row in range(first_row, last_row):
+            word, frequency = self.rows[row]
+            y0 = row * self.ROW_HEIGHT
+            y_center = y0 + self.ROW_HEIGHT / 2
+            
+            self.canvas.create_rectangle(color_start, y0, color_end, y0 + self.ROW_HEIGHT,
+                                         fill=self._row_color(frequency), outline='')
+            self.canvas.create_text(word_x, y_center, text=word, anchor="w", fill='white',
+                                    font=("Arial", 10, "bold"))
+            freq_item = self.canvas.create_text(freq_x, y_center, text=str(frequency), anchor="e",
+                                                fill='white', font=("Arial", 10))
+            x0, y0_box, x1, y1_box = self.canvas.bbox(freq_item)
+            background = self.canvas.create_rectangle(x0 - 4, y0_box, x1 + 4, y1_box, fill='#424242', outline='')
+            self.canvas.tag_lower(background, freq_item)
+        
+        # Al llegar a la última fila cargada, traer más de la lista ordenada
+        if last_row >= self.loaded_rows and self.loaded_rows < len(self.rows):
+            self.after_idle(self._load_more_rows)
+
+
+class ConcordanceView(ctk.CTkFrame):
+    """
+    Concordancia KWIC virtualizada: la región de scroll cubre todas las
+    apariciones, pero el texto de cada línea (Concordance.line) sólo se
+    arma para las filas visibles. Contexto izquierdo alineado a la derecha,
+    palabra clave al centro y contexto derecho alineado a la izquierda.
+    """
+    
+    ROW_HEIGHT = 22
+    
+    def __init__(self, master, on_select=None, **kwargs):
+        super().__init__(master, **kwargs)
+        
+        self.canvas = Canvas(self, bg='#212121', highlightthickness=0, bd=0, yscrollincrement=self.ROW_HEIGHT)
+        self.scrollbar = ctk.CTkScrollbar(self, orientation="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_view_change)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        
+        self.concordance = None
+        self.window = 5
+        self.on_select = on_select  # on_select(i) al hacer clic en la línea i
+        self._render_pending = False
+        
+        self.canvas.bind("<Configure>", lambda e: self._schedule_render())
+        self.canvas.bind("<Button-1>", self.on_click)
+        # Sólo sobre este canvas: el mapa de calor usa bind_all para la rueda
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind(sequence, self._on_mousewheel)
+    
+    def _on_mousewheel(self, event):
+        if event.delta:
+            self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        elif event.num == 4:
+            self.canvas.yview_scroll(-1, "units")
+        elif event.num == 5:
+            self.canvas.yview_scroll(1, "units")
+        return "break"
+    
+    def _on_view_change(self, first, last):
+        self.scrollbar.set(first, last)
+        self._schedule_render()
+    
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+    
+    def set_concordance(self, concordance):
+        self.concordance = concordance
+        self.canvas.configure(scrollregion=(0, 0, 1, len(concordance) * self.ROW_HEIGHT))
+        self.canvas.yview_moveto(0)
+        self._schedule_render()
+    
+    def set_window(self, window: int):
+        # Las apariciones son las mismas; sólo cambia el texto de las filas visibles
+        self.window = window
+        self._schedule_render()
+    
+    def on_click(self, event):
+        if not self.concordance or not self.on_select:
+            return
+        row = int(self.canvas.canvasy(event.y) // self.ROW_HEIGHT)
+        if 0 <= row < len(self.concordance):
+            self.on_select(row)
+    
+    def _render(self):
+        self._render_pending = False
+        self.canvas.delete("all")
+        
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width <= 1 or height <= 1 or not self.concordance:
+            return
+        
+        page_width, keyword_x = width * 0.08, width * 0.45
+        top = self.canvas.canvasy(0)
+        first_row = max(0, int(top // self.ROW_HEIGHT))
+        last_row = min(len(self.concordance), int((top + height) // self.ROW_HEIGHT) + 1)
+        
+        for row in range(first_row, last_row):
+            line = self.concordance.line(row, self.window)
+            y0 = row * self.ROW_HEIGHT
+            y_center = y0 + self.ROW_HEIGHT / 2
+            background = '#2a2a2a' if row % 2 else '#212121'
+            self.canvas.create_rectangle(0, y0, width, y0 + self.ROW_HEIGHT, fill=background, outline='')
+            keyword = self.canvas.create_text(keyword_x, y_center, text=line['keyword'], anchor="w",
+                                              fill='#f5b041', font=("Arial", 10, "bold"))
+            self.canvas.create_text(keyword_x - 4, y_center, text=line['left'].strip(), anchor="e",
+                                    fill='white', font=("Arial", 10))
+            self.canvas.create_text(self.canvas.bbox(keyword)[2] + 4, y_center, text=line['right'].strip(),
+                                    anchor="w", fill='white', font=("Arial", 10))
+            # La columna de página tapa el contexto izquierdo que no entra
+            self.canvas.create_rectangle(0, y0, page_width, y0 + self.ROW_HEIGHT, fill=background, outline='')
+            self.canvas.create_text(6, y_center, text=f"p. {line['page']}", anchor="w", fill='gray',
+                                    font=("Arial", 9))
+
+
+class ThumbnailStrip(ctk.CTkFrame):
+    """
+    Barra lateral de miniaturas. Las miniaturas se renderizan en procesos
+    en segundo plano, se guardan en disco junto a la caché de análisis y
+    sólo se piden las de las filas visibles a medida que se desplaza la barra.
+    """
+    
+    THUMB_ZOOM = 0.2
+    SLOT_HEIGHT = 190
+    STRIP_WIDTH = 150
+    BATCH_SIZE = 6  # Páginas por tarea enviada al pool
+    POLL_MS = 50
+    
+    def __init__(self, master, on_select=None, **kwargs):
+        super().__init__(master, width=self.STRIP_WIDTH, **kwargs)
+        
+        self.canvas = Canvas(self, bg='#2b2b2b', highlightthickness=0, bd=0, width=self.STRIP_WIDTH - 20)
+        self.scrollbar = ctk.CTkScrollbar(self, orientation="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_view_change)
+        
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        
+        self.on_select = on_select
+        self.pdf_path = None
+        self.total_pages = 0
+        self.current_page = 0
+        self.thumb_dir = None  # Se conoce cuando termina de calcularse el hash del PDF
+        self.executor = None
+        self.generation = 0  # Descarta resultados de documentos anteriores
+        self.results = queue.Queue()  # Resultados de los hilos/procesos para el hilo de Tk
+        self.requested = set()
+        self.images = {}  # Página -> PhotoImage de las filas cercanas a la vista
+        self._render_pending = False
+        
+        self.canvas.bind("<Configure>", lambda e: self._schedule_render())
+        self.canvas.bind("<Button-1>", self.on_click)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind(sequence, self._on_mousewheel)
+        
+        self.after(self.POLL_MS, self.poll_results)
+    
+    def _on_mousewheel(self, event):
+        if event.delta:
+            self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        elif event.num == 4:
+            self.canvas.yview_scroll(-1, "units")
+        elif event.num == 5:
+            self.canvas.yview_scroll(1, "units")
+        return "break"  # No propagar al scroll global del mapa de calor
+    
+    def _on_view_change(self, first, last):
+        self.scrollbar.set(first, last)
+        self._schedule_render()
+    
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+    
+    def load_pdf(self, pdf_path: str, total_pages: int):
+        self.close()
+        self.pdf_path = pdf_path
+        self.total_pages = total_pages
+        self.current_page = 0
+        self.executor = ProcessPoolExecutor(max_workers=2)
+        self.canvas.configure(scrollregion=(0, 0, 1, total_pages * self.SLOT_HEIGHT))
+        self.canvas.yview_moveto(0)
+        
+        # El hash del PDF (para ubicar la caché en disco) se calcula fuera del hilo de Tk
+        generation = self.generation
+        threading.Thread(target=self._resolve_thumb_dir, args=(pdf_path, generation), daemon=True).start()
+        self._schedule_render()
+    
+    def _resolve_thumb_dir(self, pdf_path: str, generation: int):
+        try:
+            cache = AnalysisCache()
+            thumb_dir = cache.thumbnail_dir(AnalysisCache.hash_file(pdf_path))
+            self.results.put(('dir', generation, thumb_dir))
+            # Las miniaturas entran en el límite de la caché; la carpeta recién usada es la última en irse
+            cache.evict()
+        except OSError:
+            pass
+    
+    def close(self):
+        self.generation += 1
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.pdf_path = None
+        self.thumb_dir = None
+        self.total_pages = 0
+        self.requested.clear()
+        self.images.clear()
+        self.canvas.delete("all")
+    
+    def set_current_page(self, page_num: int):
+        self.current_page = page_num
+        
+        # Desplazar la barra si la página actual quedó fuera de la vista
+        top = self.canvas.canvasy(0)
+        y0 = page_num * self.SLOT_HEIGHT
+        if self.total_pages and (y0 < top or y0 + self.SLOT_HEIGHT > top + self.canvas.winfo_height()):
+            self.canvas.yview_moveto(page_num / self.total_pages)
+        self._schedule_render()
+    
+    def on_click(self, event):
+        if not self.total_pages:
+            return
+        page_num = int(self.canvas.canvasy(event.y) // self.SLOT_HEIGHT)
+        if 0 <= page_num < self.total_pages:
+            self.set_current_page(page_num)
+            if self.on_select:
+                self.on_select(page_num)
+    
+    def poll_results(self):
+        """Procesa en el hilo de Tk los resultados de los trabajos en segundo plano"""
+        changed = False
+        while True:
+            try:
+                kind, generation, payload = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                continue
+            if kind == 'dir':
+                self.thumb_dir = payload
+            elif kind == 'failed':
+                # Permitir reintentar esas páginas cuando vuelvan a verse
+                self.requested.difference_update(payload)
+            changed = True
+        
+        if changed:
+            self._schedule_render()
+        self.after(self.POLL_MS, self.poll_results)
+    
+    def _request_pages(self, page_nums: List[int]):
+        generation = self.generation
+        for i in range(0, len(page_nums), self.BATCH_SIZE):
+            batch = page_nums[i:i + self.BATCH_SIZE]
+            self.requested.update(batch)
+            future = self.executor.submit(
+                render_thumbnails_worker, self.pdf_path, batch, self.THUMB_ZOOM, self.thumb_dir
+            )
+            future.add_done_callback(
+                lambda f, batch=batch: self._on_batch_done(f, generation, batch)
+            )
+    
+    def _on_batch_done(self, future, generation: int, batch: List[int]):
+        """Corre en un hilo del pool: sólo encola el resultado, Tk lo procesa en poll_results"""
+        failed = future.cancelled() or future.exception() is not None
+        self.results.put(('failed' if failed else 'pages', generation, batch))
+    
+    def _render(self):
+        self._render_pending = False
+        self.canvas.delete("all")
+        if not self.total_pages:
+            return
+        
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        top = self.canvas.canvasy(0)
+        first = max(0, int(top // self.SLOT_HEIGHT))
+        last = min(self.total_pages, int((top + height) // self.SLOT_HEIGHT) + 1)
+        
+        # Liberar las miniaturas alejadas de la vista
+        for page_num in list(self.images):
+            if page_num < first - 10 or page_num > last + 10:
+                del self.images[page_num]
+        
+        missing = []
+        for page_num in range(first, last):
+            y0 = page_num * self.SLOT_HEIGHT
+            outline = '#1f6aa5' if page_num == self.current_page else '#555555'
+            self.canvas.create_rectangle(6, y0 + 4, width - 6, y0 + self.SLOT_HEIGHT - 20,
+                                         outline=outline, width=2)
+            self.canvas.create_text(width / 2, y0 + self.SLOT_HEIGHT - 10, text=str(page_num + 1),
+                                    fill='white', font=("Arial", 10))
+            
+            photo = self.images.get(page_num)
+            if photo is None and self.thumb_dir:
+                path = os.path.join(self.thumb_dir, f"{page_num}.png")
+                if os.path.exists(path):
+                    photo = ImageTk.PhotoImage(Image.open(path))
+                    self.images[page_num] = photo
+                elif page_num not in self.requested:
+                    missing.append(page_num)
+            
+            if photo is not None:
+                self.canvas.create_image(width / 2, y0 + (self.SLOT_HEIGHT - 16) / 2, image=photo)
+        
+        if missing and self.executor:
+            self._request_pages(missing)
+
+
+def hit_rects(words: List[tuple], phrases: List[List[frozenset]]) -> List['fitz.Rect']:
+    """
+    Rectángulos de las apariciones de las frases en las palabras de una
+    página (TextPage.extractWORDS). Cada frase es, por palabra, el conjunto
+    de formas del documento que la cumplen. Como la búsqueda, una aparición
+    no sale de su párrafo: las palabras se agrupan por (bloque, línea), las
+    mismas líneas que extract_paragraphs separa en el texto de PyMuPDF, y se
+    busca dentro de cada grupo, así que cada aparición da un rectángulo.
+    """
+    rects = []
+    for _, line_words in groupby(words, key=itemgetter(5, 6)):
+        tokens = []
+        boxes = []
+        for x0, y0, x1, y1, text, *_ in line_words:
+            for token in WORD_PATTERN.findall(text.lower()):
+                tokens.append(token)
+                boxes.append((x0, y0, x1, y1))
+        
+        for variant_sets in phrases:
+            # Misma regla que la búsqueda, sobre las posiciones de cada palabra en el párrafo
+            positions = [[i for i, token in enumerate(tokens) if token in variants] for variants in variant_sets]
+            for start, end in match_spans(positions):
+                span = boxes[start:end + 1]
+                rects.append(fitz.Rect(
+                    min(box[0] for box in span), min(box[1] for box in span),
+                    max(box[2] for box in span), max(box[3] for box in span)
+                ))
+    return rects
+
+
+class PDFViewer(ctk.CTkFrame):
+    CACHE_SIZE = 12  # Páginas renderizadas que se conservan (LRU)
+    TEXT_PAGE_CACHE_SIZE = 64  # TextPage de PyMuPDF por página, para calcular resaltados (LRU)
+    RESIZE_DELAY_MS = 150  # Espera tras el último redimensionado antes de redibujar
+    HIGHLIGHT_POLL_MS = 30
+    HIGHLIGHT_COLOR = "#ffcc00"
+    MARGIN = 20
+    
+    def __init__(self, master, on_page_change=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_page_change = on_page_change
+        
+        # Frame de controles
+        self.control_frame = ctk.CTkFrame(self)
+        self.control_frame.pack(fill="x", padx=5, pady=5)
+        
+        self.prev_button = ctk.CTkButton(
+            self.control_frame, 
+            text="◀ Anterior", 
+            command=self.prev_page,
+            width=100
+        )
+        self.prev_button.pack(side="left", padx=5)
+        
+        self.page_label = ctk.CTkLabel(self.control_frame, text="Página: -/-")
+        self.page_label.pack(side="left", padx=10, expand=True)
+        
+        self.next_button = ctk.CTkButton(
+            self.control_frame, 
+            text="Siguiente ▶", 
+            command=self.next_page,
+            width=100
+        )
+        self.next_button.pack(side="right", padx=5)
+        
+        # Canvas para mostrar el PDF (sin scrollbars)
+        self.canvas = Canvas(self, bg='#2b2b2b', highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True, padx=5, pady=5)
+        
+        self.pdf_document = None
+        self.current_page = 0
+        self.total_pages = 0
+        
+        # Caché LRU de páginas renderizadas: (página, zoom) -> imagen PIL
+        self.page_cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        # fitz no es seguro entre hilos: todo acceso al documento pasa por este lock
+        self.render_lock = threading.Lock()
+        self.prefetch_queue = None
+        # Renders de primer plano en curso o esperando el lock: la precarga les cede el paso
+        self.foreground_renders = 0
+        self.resize_job = None
+        
+        # Resaltado de coincidencias: un hilo calcula los rectángulos y Tk sólo los dibuja
+        self.highlight_queue = None
+        self.highlight_results = queue.Queue()
+        self.highlight_phrases = None  # Frases resaltadas (ver hit_rects)
+        self.highlights = {}  # Página -> rectángulos en coordenadas de la página (sin zoom)
+        self.highlight_pending = 0
+        self.view_transform = None  # (x, y, zoom) de la página mostrada en el canvas
+        
+        # Bind para ajustar cuando se redimensiona la ventana
+        self.canvas.bind("<Configure>", self.on_canvas_resize)
+        
+    def on_canvas_resize(self, event):
+        """Redibuja la página cuando el canvas deja de cambiar de tamaño"""
+        if self.pdf_document and self.total_pages > 0:
+            if self.resize_job:
+                self.after_cancel(self.resize_job)
+            self.resize_job = self.after(self.RESIZE_DELAY_MS, self.show_page)
+        
+    def load_pdf(self, pdf_path):
+        try:
+            self.close_pdf()
+            self.pdf_document = fitz.open(pdf_path)
+            self.total_pages = len(self.pdf_document)
+            self.current_page = 0
+            self.start_prefetch()
+            self.start_highlighter()
+            self.show_page()
+            self.prev_button.configure(state="normal")
+            self.next_button.configure(state="normal")
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al cargar PDF: {str(e)}")
+    
+    def start_prefetch(self):
+        """Hilo en segundo plano que renderiza las páginas vecinas a la actual"""
+        self.prefetch_queue = queue.Queue()
+        thread = threading.Thread(
+            target=self.prefetch_worker,
+            args=(self.pdf_document, self.prefetch_queue),
+            daemon=True
+        )
+        thread.start()
+    
+    def pending_prefetch(self, requests: queue.Queue):
+        """
+        Vacía la cola y devuelve sólo las peticiones que siguen siendo vecinas
+        de la página actual (la más reciente por página), o None si se pidió
+        terminar. Al pasar páginas rápido se acumulan vecinas de páginas que ya
+        no se ven y renderizarlas sólo retrasaría la página mostrada.
+        """
+        batch = [requests.get()]
+        while True:
+            try:
+                batch.append(requests.get_nowait())
+            except queue.Empty:
+                break
+        if None in batch:
+            return None
+        
+        current = self.current_page
+        latest = {}
+        for request in batch:
+            if abs(request[0] - current) == 1:
+                latest[request[0]] = request
+        return list(latest.values())
+    
+    def prefetch_worker(self, document, requests: queue.Queue):
+        while True:
+            pending = self.pending_prefetch(requests)
+            if pending is None:
+                break
+            
+            for page_num, canvas_width, canvas_height in pending:
+                # Con un render de primer plano pendiente no se toma el lock;
+                # show_page vuelve a pedir las vecinas cuando termina
+                if self.foreground_renders or abs(page_num - self.current_page) != 1:
+                    continue
+                try:
+                    self.prefetch_page(document, requests, page_num, canvas_width, canvas_height)
+                except Exception:
+                    # Una falla en la precarga no afecta la vista; la página se renderiza al mostrarla
+                    continue
+    
+    def prefetch_page(self, document, requests: queue.Queue, page_num: int,
+                      canvas_width: int, canvas_height: int):
+        with self.render_lock:
+            if document.is_closed:
+                return
+            zoom = self.fit_zoom(document[page_num].rect, canvas_width, canvas_height)
+        if self.cache_get((page_num, zoom)) is None and not self.foreground_renders:
+            image = self.render_page(document, page_num, zoom)
+            # No guardar páginas de un documento que ya se cerró o reemplazó
+            if requests is self.prefetch_queue:
+                self.cache_put((page_num, zoom), image)
+    
+    def start_highlighter(self):
+        self.highlight_queue = queue.Queue()
+        thread = threading.Thread(
+            target=self.highlight_worker,
+            args=(self.pdf_document, self.highlight_queue),
+            daemon=True
+        )
+        thread.start()
+    
+    def highlight_worker(self, document, requests: queue.Queue):
+        """
+        Calcula los rectángulos de las coincidencias fuera del hilo de Tk. El
+        TextPage de cada página se construye una sola vez: recorrer cientos de
+        coincidencias no vuelve a analizar el contenido de las páginas.
+        """
+        text_pages = OrderedDict()
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            
+            # Siempre se responde (aunque sea vacío): poll_highlights cuenta las pendientes
+            phrases, page_num = request
+            rects = []
+            try:
+                with self.render_lock:
+                    if document.is_closed:
+                        raise ValueError("documento cerrado")
+                    page = document[page_num]
+                    text_page = text_pages.get(page_num)
+                    if text_page is None:
+                        text_page = text_pages[page_num] = page.get_textpage()
+                        if len(text_pages) > self.TEXT_PAGE_CACHE_SIZE:
+                            text_pages.popitem(last=False)
+                    else:
+                        text_pages.move_to_end(page_num)
+                    words = text_page.extractWORDS()
+                    rotation = page.rotation_matrix
+                # El texto se extrae sin rotar; la imagen se renderiza rotada
+                rects = [rect * rotation for rect in hit_rects(words, phrases)]
+            except Exception:
+                pass  # Sin resaltado; la página se sigue viendo
+            self.highlight_results.put((phrases, page_num, rects))
+    
+    def show_hit(self, page_num: int, phrases: List[List[frozenset]]):
+        """Muestra una página con las apariciones de las frases resaltadas"""
+        if not self.pdf_document or not 0 <= page_num < self.total_pages:
+            return
+        if phrases != self.highlight_phrases:
+            self.highlight_phrases = phrases
+            self.highlights = {}
+        if page_num not in self.highlights:
+            self.highlights[page_num] = []  # Evita pedir dos veces la misma página
+            self.highlight_queue.put((phrases, page_num))
+            self.highlight_pending += 1
+            if self.highlight_pending == 1:
+                self.after(self.HIGHLIGHT_POLL_MS, self.poll_highlights)
+        self.go_to_page(page_num)
+    
+    def clear_highlights(self):
+        self.highlight_phrases = None
+        self.highlights = {}
+        self.canvas.delete("highlight")
+    
+    def poll_highlights(self):
+        while True:
+            try:
+                phrases, page_num, rects = self.highlight_results.get_nowait()
+            except queue.Empty:
+                break
+            self.highlight_pending -= 1
+            if phrases != self.highlight_phrases:
+                continue  # Resultado de una búsqueda anterior
+            self.highlights[page_num] = rects
+            if page_num == self.current_page:
+                self.draw_highlights()
+        
+        if self.highlight_pending > 0:
+            self.after(self.HIGHLIGHT_POLL_MS, self.poll_highlights)
+    
+    def draw_highlights(self):
+        self.canvas.delete("highlight")
+        if not self.view_transform:
+            return
+        x, y, zoom = self.view_transform
+        for rect in self.highlights.get(self.current_page, ()):
+            self.canvas.create_rectangle(
+                x + rect.x0 * zoom - 1, y + rect.y0 * zoom - 1,
+                x + rect.x1 * zoom + 1, y + rect.y1 * zoom + 1,
+                outline=self.HIGHLIGHT_COLOR, width=2,
+                fill=self.HIGHLIGHT_COLOR, stipple="gray25",
+                tags="highlight"
+            )
+    
+    def fit_zoom(self, page_rect, canvas_width: int, canvas_height: int) -> float:
+        # Calcular zoom para ajustar la página al canvas (con margen)
+        zoom_width = (canvas_width - self.MARGIN) / page_rect.width
+        zoom_height = (canvas_height - self.MARGIN) / page_rect.height
+        return round(min(zoom_width, zoom_height), 3)
+    
+    def render_page(self, document, page_num: int, zoom: float):
+        with self.render_lock:
+            pix = document[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    
+    def cache_get(self, key):
+        with self.cache_lock:
+            image = self.page_cache.get(key)
+            if image is not None:
+                self.page_cache.move_to_end(key)
+            return image
+    
+    def cache_put(self, key, image):
+        with self.cache_lock:
+            self.page_cache[key] = image
+            self.page_cache.move_to_end(key)
+            while len(self.page_cache) > self.CACHE_SIZE:
+                self.page_cache.popitem(last=False)
+    
+    def show_page(self):
+        self.resize_job = None
+        if not self.pdf_document or self.total_pages == 0:
+            return
+        
+        # Obtener dimensiones del canvas
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+        
+        # Si el canvas aún no tiene dimensiones, esperar
+        if canvas_width <= 1 or canvas_height <= 1:
+            self.canvas.after(100, self.show_page)
+            return
+        
+        self.foreground_renders += 1
+        try:
+            with self.render_lock:
+                zoom = self.fit_zoom(self.pdf_document[self.current_page].rect, canvas_width, canvas_height)
+            
+            key = (self.current_page, zoom)
+            img = self.cache_get(key)
+            if img is None:
+                img = self.render_page(self.pdf_document, self.current_page, zoom)
+                self.cache_put(key, img)
+        finally:
+            self.foreground_renders -= 1
+        photo = ImageTk.PhotoImage(img)
+        
+        # Limpiar canvas
+        self.canvas.delete("all")
+        
+        # Calcular posición para centrar
+        x_center = (canvas_width - img.width) // 2
+        y_center = (canvas_height - img.height) // 2
+        
+        # Crear imagen centrada
+        self.canvas.create_image(x_center, y_center, anchor="nw", image=photo)
+        self.canvas.image = photo
+        self.view_transform = (x_center, y_center, zoom)
+        self.draw_highlights()
+        
+        self.page_label.configure(text=f"Página: {self.current_page + 1}/{self.total_pages}")
+        if self.on_page_change:
+            self.on_page_change(self.current_page)
+        
+        # Precargar las páginas siguiente y anterior
+        for neighbor in (self.current_page + 1, self.current_page - 1):
+            if 0 <= neighbor < self.total_pages:
+                self.prefetch_queue.put((neighbor, canvas_width, canvas_height))
+    
+    def go_to_page(self, page_num: int):
+        if 0 <= page_num < self.total_pages:
+            self.current_page = page_num
+            self.show_page()
+    
+    def next_page(self):
+        if self.current_page < self.total_pages - 1:
+            self.current_page += 1
+            self.show_page()
+    
+    def prev_page(self):
+        if self.current_page > 0:
+            self.current_page -= 1
+            self.show_page()
+    
+    def close_pdf(self):
+        if self.prefetch_queue:
+            self.prefetch_queue.put(None)
+            self.prefetch_queue = None
+        if self.highlight_queue:
+            self.highlight_queue.put(None)
+            self.highlight_queue = None
+        self.highlight_phrases = None
+        self.highlights = {}
+        self.view_transform = None
+        with self.cache_lock:
+            self.page_cache.clear()
+        if self.resize_job:
+            self.after_cancel(self.resize_job)
+            self.resize_job = None
+        
+        if self.pdf_document:
+            with self.render_lock:
+                self.pdf_document.close()
+            self.pdf_document = None
+            self.canvas.delete("all")
+            self.page_label.configure(text="Página: -/-")
+
+class PDFAnalyzerApp(ctk.CTk):
+    # Modo del mapa de calor -> (tamaño de n-grama, título de la columna, nombre en plural)
+    HEATMAP_MODES = {
+        "Palabras": (1, 'Palabra', 'palabras'),
+        "Bigramas": (2, 'Bigrama', 'bigramas'),
+        "Trigramas": (3, 'Trigrama', 'trigramas'),
+    }
+    NGRAMS_TO_SAVE = 100
+    PROGRESS_INTERVAL_MS = 100  # Cada cuánto se vacía la cola de progreso
+    # Opción del menú -> segundos máximos por página (None = sin límite)
+    PAGE_TIMEOUTS = {
+        "Sin límite": None,
+        "10 s": 10,
+        "30 s": 30,
+        "60 s": 60,
+    }
+    
+    def __init__(self, backend: str = 'pypdf2', use_cache: bool = True):
+        super().__init__()
+
+        self.title("Analizador de Palabras en PDF")
+        self.geometry("1400x900")
+        
+        self.after(10, lambda: self.state('zoomed'))
+        
+        self.analyzer = None
+        self.pdf_path = None
+        self.backend = backend
+        self.use_cache = use_cache
+        self.last_search_results = None
+        self.search_hits = []  # (página, frases a resaltar, línea en el cuadro de resultados)
+        self.hit_lines = {}  # Línea del cuadro de resultados -> índice en search_hits
+        self.current_hit = None
+        self.last_search_words = None
+        self.last_search_fuzzy = False
+        self.progress = None
+        self.analysis_thread = None
+        self.analysis_error = None
+        
+        self.setup_ui()
+        
+    def setup_ui(self):
+        # Frame principal con dos columnas
+        self.main_container = ctk.CTkFrame(self)
+        self.main_container.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        # Frame superior (controles)
+        self.control_frame = ctk.CTkFrame(self.main_container)
+        self.control_frame.pack(fill="x", padx=10, pady=10)
+        
+        self.select_button = ctk.CTkButton(
+            self.control_frame, 
+            text="Seleccionar PDF", 
+            command=self.select_pdf,
+            width=150,
+            height=40
+        )
+        self.select_button.pack(side="left", padx=10)
+        
+        self.file_label = ctk.CTkLabel(
+            self.control_frame, 
+            text="No se ha seleccionado ningún archivo",
+            wraplength=300
+        )
+        self.file_label.pack(side="left", padx=10, expand=True, fill="x")
+        
+        self.analyze_button = ctk.CTkButton(
+            self.control_frame, 
+            text="Analizar PDF", 
+            command=self.analyze_pdf,
+            width=150,
+            height=40,
+            state="disabled"
+        )
+        self.analyze_button.pack(side="left", padx=10)
+        
+        self.cancel_button = ctk.CTkButton(
+            self.control_frame,
+            text="Cancelar",
+            command=self.cancel_analysis,
+            width=100,
+            height=40,
+            state="disabled"
+        )
+        self.cancel_button.pack(side="left", padx=10)
+        
+        self.timeout_menu = ctk.CTkOptionMenu(
+            self.control_frame,
+            values=list(self.PAGE_TIMEOUTS),
+            width=110
+        )
+        self.timeout_menu.set("Sin límite")
+        self.timeout_menu.pack(side="left", padx=10)
+        
+        self.processes_var = ctk.BooleanVar(value=True)
+        self.processes_checkbox = ctk.CTkCheckBox(
+            self.control_frame,
+            text="Usar procesos",
+            variable=self.processes_var
+        )
+        self.processes_checkbox.pack(side="left", padx=10)
+        
+        self.stopwords_var = ctk.BooleanVar(value=True)
+        self.stopwords_checkbox = ctk.CTkCheckBox(
+            self.control_frame,
+            text="Omitir stopwords",
+            variable=self.stopwords_var,
+            command=self.toggle_stopwords
+        )
+        self.stopwords_checkbox.pack(side="left", padx=10)
+        
+        self.disk_index_var = ctk.BooleanVar(value=False)
+        self.disk_index_checkbox = ctk.CTkCheckBox(
+            self.control_frame,
+            text="Índice en disco",
+            variable=self.disk_index_var
+        )
+        self.disk_index_checkbox.pack(side="left", padx=10)
+        
+        self.save_button = ctk.CTkButton(
+            self.control_frame, 
+            text="Guardar Análisis", 
+            command=self.save_results,
+            width=150,
+            height=40,
+            state="disabled"
+        )
+        self.save_button.pack(side="left", padx=10)
+        
+        self.save_search_button = ctk.CTkButton(
+            self.control_frame, 
+            text="Guardar Búsqueda", 
+            command=self.save_search_results,
+            width=150,
+            height=40,
+            state="disabled"
+        )
+        self.save_search_button.pack(side="left", padx=10)
+        
+        # Frame contenedor principal dividido en dos columnas
+        self.content_container = ctk.CTkFrame(self.main_container)
+        self.content_container.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        # COLUMNA IZQUIERDA: Log y Estadísticas
+        self.left_column = ctk.CTkFrame(self.content_container, width=400)
+        self.left_column.pack(side="left", fill="both", expand=False, padx=(0, 5))
+        self.left_column.pack_propagate(False)
+        
+        # Log
+        self.log_label = ctk.CTkLabel(self.left_column, text="Registro de Análisis", font=("Arial", 16, "bold"))
+        self.log_label.pack(pady=10)
+        
+        self.log_text = ctk.CTkTextbox(self.left_column, height=150)
+        self.log_text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        
+        # Progreso del análisis (se actualiza desde la cola de eventos)
+        self.progress_bar = ctk.CTkProgressBar(self.left_column)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(fill="x", padx=10)
+        
+        self.progress_label = ctk.CTkLabel(self.left_column, text="", font=("Arial", 10), text_color="gray")
+        self.progress_label.pack(padx=10, pady=(0, 5))
+        
+        # Estadísticas
+        self.stats_frame = ctk.CTkFrame(self.left_column)
+        self.stats_frame.pack(fill="x", padx=10, pady=10)
+        
+        self.stats_label = ctk.CTkLabel(self.stats_frame, text="Estadísticas", font=("Arial", 14, "bold"))
+        self.stats_label.pack(pady=5)
+        
+        self.unique_words_label = ctk.CTkLabel(self.stats_frame, text="Palabras únicas: -")
+        self.unique_words_label.pack()
+        
+        self.total_words_label = ctk.CTkLabel(self.stats_frame, text="Total de palabras: -")
+        self.total_words_label.pack()
+        
+        self.time_label = ctk.CTkLabel(self.stats_frame, text="Tiempo de análisis: -")
+        self.time_label.pack()
+        
+        # BUSCADOR DE FRASES
+        self.search_frame = ctk.CTkFrame(self.left_column)
+        self.search_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        self.search_label = ctk.CTkLabel(self.search_frame, text="Buscador de Frases", font=("Arial", 14, "bold"))
+        self.search_label.pack(pady=10)
+        
+        self.search_info = ctk.CTkLabel(
+            self.search_frame, 
+            text="Palabras separadas por comas; varias frases separadas por punto y coma.\n"
+                 "Ej: palabra1, palabra2; otra, frase",
+            font=("Arial", 10),
+            text_color="gray"
+        )
+        self.search_info.pack(pady=5)
+        
+        # Frame para entrada y botón
+        self.search_input_frame = ctk.CTkFrame(self.search_frame)
+        self.search_input_frame.pack(fill="x", padx=10, pady=5)
+        
+        self.phrase_entry = ctk.CTkEntry(
+            self.search_input_frame,
+            placeholder_text="palabra1, palabra2; otra, frase"
+        )
+        self.phrase_entry.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        
+        self.search_button = ctk.CTkButton(
+            self.search_input_frame,
+            text="Buscar",
+            command=self.search_phrase,
+            width=100,
+            state="disabled"
+        )
+        self.search_button.pack(side="right")
+        
+        self.fuzzy_var = ctk.BooleanVar(value=False)
+        self.fuzzy_checkbox = ctk.CTkCheckBox(
+            self.search_frame,
+            text="Búsqueda difusa (tolera errores de escritura)",
+            variable=self.fuzzy_var
+        )
+        self.fuzzy_checkbox.pack(padx=10, pady=(0, 5), anchor="w")
+        
+        self.concordance_button = ctk.CTkButton(
+            self.search_frame,
+            text="Concordancia (KWIC)",
+            command=self.show_concordance,
+            state="disabled"
+        )
+        self.concordance_button.pack(padx=10, pady=(0, 5), anchor="w")
+        
+        # Resultados de búsqueda
+        self.search_results_label = ctk.CTkLabel(self.search_frame, text="Resultados:", font=("Arial", 12, "bold"))
+        self.search_results_label.pack(pady=(10, 5))
+        
+        self.search_results = ctk.CTkTextbox(self.search_frame, height=200)
+        self.search_results.pack(fill="both", expand=True, padx=10, pady=(0, 5))
+        # Clic en el encabezado de una coincidencia: ir a la página y resaltarla
+        self.search_results.tag_config("hit", foreground="#5dade2")
+        self.search_results.tag_bind("hit", "<Button-1>", self.on_hit_click)
+        self.search_results.tag_bind("hit", "<Enter>", lambda _: self.search_results.configure(cursor="hand2"))
+        self.search_results.tag_bind("hit", "<Leave>", lambda _: self.search_results.configure(cursor=""))
+        
+        self.hit_nav_frame = ctk.CTkFrame(self.search_frame, fg_color="transparent")
+        self.hit_nav_frame.pack(fill="x", padx=10, pady=(0, 10))
+        
+        self.prev_hit_button = ctk.CTkButton(
+            self.hit_nav_frame,
+            text="◀",
+            command=lambda: self.step_hit(-1),
+            width=40,
+            state="disabled"
+        )
+        self.prev_hit_button.pack(side="left")
+        
+        self.hit_label = ctk.CTkLabel(self.hit_nav_frame, text="Coincidencia: -/-")
+        self.hit_label.pack(side="left", expand=True)
+        
+        self.next_hit_button = ctk.CTkButton(
+            self.hit_nav_frame,
+            text="▶",
+            command=lambda: self.step_hit(1),
+            width=40,
+            state="disabled"
+        )
+        self.next_hit_button.pack(side="right")
+        
+        # COLUMNA DERECHA: Dividida horizontalmente (lado a lado)
+        self.right_column = ctk.CTkFrame(self.content_container)
+        self.right_column.pack(side="right", fill="both", expand=True)
+        
+        # ====== SECCIÓN IZQUIERDA: MAPA DE CALOR ======
+        self.heatmap_section = ctk.CTkFrame(self.right_column)
+        self.heatmap_section.pack(side="left", fill="both", expand=True, padx=(5, 2), pady=5)
+        
+        self.heatmap_label = ctk.CTkLabel(
+            self.heatmap_section, 
+            text="🔥 Mapa de Calor de Frecuencias", 
+            font=("Arial", 14, "bold")
+        )
+        self.heatmap_label.pack(pady=5)
+        
+        self.info_label = ctk.CTkLabel(self.heatmap_section, text="", font=("Arial", 12))
+        self.info_label.pack()
+        
+        self.heatmap_mode = ctk.CTkSegmentedButton(
+            self.heatmap_section,
+            values=list(self.HEATMAP_MODES),
+            command=lambda _: self.create_heatmap()
+        )
+        self.heatmap_mode.set("Palabras")
+        self.heatmap_mode.pack(pady=5)
+        
+        self.distribution_button = ctk.CTkButton(
+            self.heatmap_section,
+            text="Distribución por página",
+            command=self.show_page_distribution,
+            state="disabled"
+        )
+        self.distribution_button.pack(pady=5)
+        
+        self.canvas_frame = ScrollableHeatmap(self.heatmap_section)
+        self.canvas_frame.pack(fill="both", expand=True, padx=5, pady=(0, 5))
+        
+        self.canvas_frame.show_message("Selecciona un PDF y haz clic en 'Analizar' para ver el mapa de calor")
+        
+        # ====== SECCIÓN DERECHA: VISUALIZADOR PDF ======
+        self.viewer_section = ctk.CTkFrame(self.right_column, width=850)
+        self.viewer_section.pack(side="right", fill="both", expand=False, padx=(2, 5), pady=5)
+        self.viewer_section.pack_propagate(False)
+        
+        self.viewer_title = ctk.CTkLabel(
+            self.viewer_section, 
+            text="📄 Visualizador PDF", 
+            font=("Arial", 14, "bold")
+        )
+        self.viewer_title.pack(pady=5)
+        
+        self.thumbnail_strip = ThumbnailStrip(
+            self.viewer_section,
+            on_select=lambda page_num: self.pdf_viewer.go_to_page(page_num)
+        )
+        self.thumbnail_strip.pack(side="left", fill="y", padx=(5, 0), pady=(0, 5))
+        
+        self.pdf_viewer = PDFViewer(
+            self.viewer_section,
+            on_page_change=lambda page_num: self.thumbnail_strip.set_current_page(page_num)
+        )
+        self.pdf_viewer.pack(side="left", fill="both", expand=True, padx=5, pady=(0, 5))
+    
+    def select_pdf(self):
+        filename = filedialog.askopenfilename(
+            title="Seleccionar archivo PDF",
+            filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
+        )
+        
+        if filename:
+            self.pdf_path = filename
+            self.file_label.configure(text=f"Archivo: {os.path.basename(filename)}")
+            self.analyze_button.configure(state="normal")
+            self.log_text.delete("0.0", "end")
+            self.log_text.insert("0.0", f"Archivo seleccionado: {filename}\n")
+            
+            # Cargar PDF en el visualizador
+            self.pdf_viewer.load_pdf(filename)
+            self.thumbnail_strip.load_pdf(filename, self.pdf_viewer.total_pages)
+    
+    def update_log(self, message):
+        """Sólo desde el hilo de Tk; los workers usan la cola de self.progress"""
+        self.log_text.insert("end", f"{message}\n")
+        self.log_text.see("end")
+    
+    def analyze_pdf(self):
+        if not self.pdf_path:
+            messagebox.showerror("Error", "Por favor selecciona un archivo PDF primero")
+            return
+        
+        self.analyze_button.configure(state="disabled")
+        self.select_button.configure(state="disabled")
+        self.save_button.configure(state="disabled")
+        self.search_button.configure(state="disabled")
+        self.cancel_button.configure(state="normal")
+        
+        self.log_text.delete("0.0", "end")
+        self.search_results.delete("0.0", "end")
+        self.progress_bar.set(0)
+        self.progress_label.configure(text="")
+        
+        # El hilo de análisis sólo encola eventos; la interfaz los lee en poll_progress
+        self.progress = ProgressTracker()
+        self.analysis_error = None
+        self.analyzer = PDFWordAnalyzer(
+            self.pdf_path,
+            callback=self.progress.log,
+            use_processes=self.processes_var.get(),
+            backend=self.backend,
+            use_cache=self.use_cache,
+            stopwords=self.selected_stopwords(),
+            max_ngram=max(size for size, _, _ in self.HEATMAP_MODES.values()),
+            disk_index=self.disk_index_var.get(),
+            progress=self.progress,
+            page_timeout=self.PAGE_TIMEOUTS[self.timeout_menu.get()]
+        )
+        
+        self.analysis_thread = threading.Thread(target=self.run_analysis, daemon=True)
+        self.analysis_thread.start()
+        self.after(self.PROGRESS_INTERVAL_MS, self.poll_progress)
+    
+    def cancel_analysis(self):
+        """El análisis se detiene en la próxima página; poll_progress termina como siempre"""
+        self.cancel_button.configure(state="disabled")
+        self.update_log("Cancelando...")
+        self.analyzer.cancel()
+    
+    def run_analysis(self):
+        try:
+            self.analyzer.analyze()
+        except Exception as e:
+            self.analysis_error = e
+    
+    def poll_progress(self):
+        """Vacía la cola de progreso en el hilo de Tk: log en un solo insert, barra y estado"""
+        messages = self.progress.drain()
+        if messages:
+            self.log_text.insert("end", "".join(f"{message}\n" for message in messages))
+            self.log_text.see("end")
+        
+        state = self.progress.snapshot()
+        if state['total_pages']:
+            self.progress_bar.set(state['pages_done'] / state['total_pages'])
+            self.progress_label.configure(text=self.progress.format_status())
+        
+        if self.analysis_thread.is_alive():
+            self.after(self.PROGRESS_INTERVAL_MS, self.poll_progress)
+        else:
+            self.on_analysis_done()
+    
+    def on_analysis_done(self):
+        # El desglose por etapa ya llegó en el log del analizador (log_stage_profile)
+        for message in self.progress.drain():
+            self.update_log(message)
+        
+        self.cancel_button.configure(state="disabled")
+        self.analyze_button.configure(state="normal")
+        self.select_button.configure(state="normal")
+        
+        if self.analysis_error:
+            messagebox.showerror("Error", f"Error al analizar el PDF: {str(self.analysis_error)}")
+        elif self.analyzer.cancelled:
+            # Sin resultados: no hay nada que mostrar, buscar ni guardar
+            self.progress_bar.set(0)
+            self.progress_label.configure(text="Análisis cancelado")
+            return
+        else:
+            self.progress_bar.set(1)
+            render_start = time.perf_counter()
+            self.update_stats()
+            self.create_heatmap()
+            self.update_idletasks()
+            render_time = time.perf_counter() - render_start
+            self.analyzer.profile.add('render', render_time)
+            self.update_log(f"Interfaz (estadísticas y mapa de calor): {render_time:.3f} s")
+            self.search_button.configure(state="normal")
+            self.distribution_button.configure(state="normal")
+        
+        self.save_button.configure(state="normal")
+    
+    def search_phrase(self):
+        if not self.analyzer:
+            messagebox.showerror("Error", "Primero debes analizar un PDF")
+            return
+        
+        phrase_text = self.phrase_entry.get().strip()
+        if not phrase_text:
+            messagebox.showwarning("Advertencia", "Ingresa al menos una palabra")
+            return
+        
+        # Frases separadas por punto y coma, palabras por comas
+        phrases = [
+            [w.strip() for w in chunk.split(',') if w.strip()]
+            for chunk in phrase_text.split(';')
+        ]
+        phrases = [words for words in phrases if words]
+        if not phrases:
+            messagebox.showwarning("Advertencia", "Ingresa al menos una palabra")
+            return
+        
+        # Deshabilitar botón durante búsqueda
+        self.search_button.configure(state="disabled")
+        self.search_results.delete("0.0", "end")
+        self.search_results.insert("0.0", "Buscando...\n")
+        
+        # Ejecutar búsqueda en hilo separado
+        thread = threading.Thread(target=self.run_search, args=(phrases, self.fuzzy_var.get()))
+        thread.start()
+    
+    def run_search(self, phrases, fuzzy):
+        try:
+            # Todas las frases en una sola pasada, agrupadas por frase
+            groups = self.analyzer.search_phrases(phrases, fuzzy=fuzzy)
+            expansions = {
+                word: self.analyzer.expand_word(word, fuzzy=fuzzy)
+                for words, _ in groups for word in words
+            }
+            self.last_search_results = groups
+            self.last_search_words = [words for words, _ in groups]
+            self.last_search_fuzzy = fuzzy
+            self.after(0, lambda: self.display_search_results(groups, expansions))
+        except Exception as e:
+            self.after(0, lambda: messagebox.showerror("Error", f"Error en la búsqueda: {str(e)}"))
+        finally:
+            self.after(0, lambda: self.search_button.configure(state="normal"))
+    
+    def display_search_results(self, groups, expansions=None):
+        self.search_results.delete("0.0", "end")
+        self.search_hits = []
+        self.hit_lines = {}
+        self.current_hit = None
+        self.pdf_viewer.clear_highlights()
+        
+        total_results = sum(len(results) for _, results in groups)
+        self.search_results.insert("0.0", f"Frases buscadas: {len(groups)}\n")
+        self.search_results.insert("end", f"Resultados encontrados: {total_results}\n")
+        self.search_results.insert("end", "=" * 50 + "\n\n")
+        
+        for words, results in groups:
+            self.search_results.insert("end", f"Búsqueda: {', '.join(words)} ({len(results)})\n")
+            for word in words:
+                # Mostrar con qué palabras del documento se buscó cada una (acentos, errores)
+                variants = (expansions or {}).get(word, [word])
+                if variants != [word]:
+                    shown = ', '.join(variants) if variants else 'ninguna'
+                    self.search_results.insert("end", f"  {word} → {shown}\n")
+            self.search_results.insert("end", "-" * 50 + "\n")
+            if not results:
+                self.search_results.insert("end", "No se encontraron coincidencias.\n\n")
+            # Formas del documento que cumplen cada palabra, para ubicarlas en la página
+            phrase = [[frozenset((expansions or {}).get(word, [word])) for word in words]]
+            for i, result in enumerate(results, 1):
+                line = int(self.search_results.index("end-1c").split('.')[0])
+                self.hit_lines[line] = len(self.search_hits)
+                self.search_hits.append((result['page'] - 1, phrase, line))
+                self.search_results.insert("end", f"[{i}] Página {result['page']}, Párrafo {result['paragraph']}\n", "hit")
+                self.search_results.insert("end", f"Contexto: {result['context']}\n\n")
+        
+        self.save_search_button.configure(state="normal" if total_results else "disabled")
+        self.concordance_button.configure(state="normal" if total_results else "disabled")
+        self.update_hit_navigation()
+        
+        # Una serie por palabra distinta de todas las frases
+        chart_words = list(dict.fromkeys(word for words, _ in groups for word in words))
+        self.show_frequency_chart(chart_words)
+    
+    def on_hit_click(self, event):
+        line = int(self.search_results.index(f"@{event.x},{event.y}").split('.')[0])
+        if line in self.hit_lines:
+            self.show_hit(self.hit_lines[line])
+    
+    def step_hit(self, step: int):
+        if not self.search_hits:
+            return
+        hit = 0 if self.current_hit is None else (self.current_hit + step) % len(self.search_hits)
+        self.show_hit(hit)
+        self.search_results.see(f"{self.search_hits[hit][2]}.0")
+    
+    def show_hit(self, hit: int):
+        page_num, phrase, _ = self.search_hits[hit]
+        self.current_hit = hit
+        # Los rectángulos se calculan en el hilo del visor; aquí sólo se cambia de página
+        self.pdf_viewer.show_hit(page_num, phrase)
+        self.update_hit_navigation()
+    
+    def update_hit_navigation(self):
+        state = "normal" if self.search_hits else "disabled"
+        self.prev_hit_button.configure(state=state)
+        self.next_hit_button.configure(state=state)
+        current = "-" if self.current_hit is None else self.current_hit + 1
+        total = len(self.search_hits) if self.search_hits else "-"
+        self.hit_label.configure(text=f"Coincidencia: {current}/{total}")
+    
+    def show_concordance(self):
+        """Concordancia KWIC de las frases buscadas; clic en una línea: ir a la página y resaltarla"""
+        if not self.analyzer or not self.last_search_words:
+            return
+        
+        fuzzy = self.last_search_fuzzy
+        labels = [', '.join(words) for words in self.last_search_words]
+        phrases = dict(zip(labels, self.last_search_words))
+        current = {}
+        
+        win = ctk.CTkToplevel(self)
+        win.title("Concordancia")
+        win.geometry("1000x500")
+        
+        controls = ctk.CTkFrame(win, fg_color="transparent")
+        controls.pack(fill="x", padx=10, pady=(10, 5))
+        count_label = ctk.CTkLabel(controls, text="")
+        
+        def on_select(row: int):
+            line = current['concordance'].line(row, 0)
+            words = current['words']
+            variants = [frozenset(self.analyzer.expand_word(word, fuzzy=fuzzy)) for word in words]
+            self.pdf_viewer.show_hit(line['page'] - 1, [variants])
+        
+        view = ConcordanceView(win, on_select=on_select)
+        
+        def show_phrase(label: str):
+            words = phrases[label]
+            # Sólo enteros por aparición; el texto lo arma la vista al mostrar cada fila
+            concordance = self.analyzer.concordance(words, fuzzy=fuzzy)
+            current.update(words=words, concordance=concordance)
+            count_label.configure(text=f"{len(concordance):,} apariciones")
+            view.set_concordance(concordance)
+        
+        phrase_menu = ctk.CTkOptionMenu(controls, values=labels, command=show_phrase)
+        phrase_menu.pack(side="left")
+        count_label.pack(side="left", padx=10)
+        window_menu = ctk.CTkOptionMenu(
+            controls,
+            values=["3", "5", "8", "12"],
+            command=lambda value: view.set_window(int(value)),
+            width=70
+        )
+        window_menu.set(str(view.window))
+        window_menu.pack(side="right")
+        ctk.CTkLabel(controls, text="Palabras de contexto:").pack(side="right", padx=5)
+        
+        view.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        show_phrase(labels[0])
+    
+    def show_frequency_chart(self, words):
+        """Gráfico de frecuencia por página (comparando las palabras buscadas) con paginación"""
+        # Mismas variantes que la búsqueda (acentos y, si se pidió, errores de escritura)
+        freq_by_word = self.analyzer.get_words_frequency_per_page(words, fuzzy=self.last_search_fuzzy)
+        page_nums = self.analyzer.get_page_numbers()
+        if not page_nums:
+            return
+        
+        total_pages = len(page_nums)
+        pages_per_view = 20
+        current_index = [0]  # usamos lista para que sea mutable dentro de funciones anidadas
+        colors = ['skyblue', 'orange', 'lightgreen', 'plum', 'khaki', 'salmon']
+
+        # Crear ventana emergente
+        win = ctk.CTkToplevel(self)
+        win.title(f"Frecuencia por página: {', '.join(words)}")
+        win.geometry("900x500")
+
+        # === Contenedor gráfico ===
+        frame_chart = ctk.CTkFrame(win)
+        frame_chart.pack(fill="both", expand=True, padx=10, pady=10)
+
+        figure, ax = plt.subplots(figsize=(8, 3), facecolor='#212121')
+        canvas = FigureCanvasTkAgg(figure, master=frame_chart)
+        canvas.get_tk_widget().pack(fill="both", expand=True)
+
+        # === Función para actualizar gráfico ===
+        def update_chart():
+            ax.clear()
+            start = current_index[0]
+            end = min(start + pages_per_view, total_pages)
+            pages = np.array(page_nums[start:end])
+            bar_width = 0.8 / len(words)
+
+            for i, (word, frequencies) in enumerate(zip(words, freq_by_word)):
+                offset = (i - (len(words) - 1) / 2) * bar_width
+                ax.bar(pages + offset, frequencies[start:end], width=bar_width,
+                       color=colors[i % len(colors)], label=word)
+
+            ax.set_xticks(pages)
+            quoted = ", ".join(f"'{word}'" for word in words)
+            ax.set_title(f"Frecuencia de {quoted} (páginas {pages[0]}–{pages[-1]})", color='white')
+            ax.set_xlabel("Página", color='white')
+            ax.set_ylabel("Frecuencia", color='white')
+            ax.tick_params(axis='x', colors='white')
+            ax.tick_params(axis='y', colors='white')
+            ax.set_facecolor('#212121')
+            if len(words) > 1:
+                ax.legend()
+            figure.tight_layout()
+            canvas.draw()
+
+        # === Botones de navegación ===
+        def next_block():
+            if current_index[0] + pages_per_view < total_pages:
+                current_index[0] += pages_per_view
+                update_chart()
+
+        def prev_block():
+            if current_index[0] - pages_per_view >= 0:
+                current_index[0] -= pages_per_view
+                update_chart()
+
+        frame_buttons = ctk.CTkFrame(win)
+        frame_buttons.pack(pady=5)
+
+        prev_button = ctk.CTkButton(frame_buttons, text="◀ Anterior", command=prev_block)
+        next_button = ctk.CTkButton(frame_buttons, text="Siguiente ▶", command=next_block)
+
+        prev_button.pack(side="left", padx=10)
+        next_button.pack(side="right", padx=10)
+
+        # Mostrar el primer bloque
+        update_chart()
+    
+    def show_page_distribution(self):
+        """Mapa de calor página × palabras más frecuentes, dibujado como una sola imagen"""
+        if not self.analyzer or not self.analyzer.word_counts:
+            return
+        
+        words, matrix = self.analyzer.get_page_distribution(n=20)
+        
+        win = ctk.CTkToplevel(self)
+        win.title("Distribución de palabras por página")
+        win.geometry("1000x500")
+        
+        figure, ax = plt.subplots(figsize=(10, 4), facecolor='#212121')
+        image = ax.imshow(matrix, aspect='auto', cmap='YlOrRd', interpolation='nearest',
+                          extent=[0.5, matrix.shape[1] + 0.5, len(words) - 0.5, -0.5])
+        ax.set_yticks(range(len(words)))
+        ax.set_yticklabels(words)
+        ax.set_title(f"Top {len(words)} palabras por página", color='white')
+        ax.set_xlabel("Página", color='white')
+        ax.tick_params(axis='x', colors='white')
+        ax.tick_params(axis='y', colors='white')
+        ax.set_facecolor('#212121')
+        colorbar = figure.colorbar(image, ax=ax)
+        colorbar.ax.tick_params(colors='white')
+        figure.tight_layout()
+        
+        canvas = FigureCanvasTkAgg(figure, master=win)
+        canvas.draw()
+        canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=10)
+        plt.close(figure)
+    
+    def update_stats(self):
+        if self.analyzer and self.analyzer.word_counts:
+            unique_words = len(self.analyzer.word_counts)
+            total_words = sum(self.analyzer.word_counts.values())
+            
+            self.unique_words_label.configure(text=f"Palabras únicas: {unique_words:,}")
+            self.total_words_label.configure(text=f"Total de palabras: {total_words:,}")
+            self.time_label.configure(text=f"Tiempo de análisis: {self.analyzer.analysis_time:.2f} segundos")
+    
+    def selected_stopwords(self) -> frozenset:
+        return STOPWORDS_ES | STOPWORDS_EN if self.stopwords_var.get() else frozenset()
+    
+    def toggle_stopwords(self):
+        # Las stopwords sólo filtran los rankings: no hace falta reanalizar
+        if self.analyzer:
+            self.analyzer.stopwords = self.selected_stopwords()
+            self.create_heatmap()
+    
+    def create_heatmap(self):
+        if not self.analyzer or not self.analyzer.word_counts:
+            return
+        
+        size, column_title, plural = self.HEATMAP_MODES[self.heatmap_mode.get()]
+        if size == 1:
+            rows = self.analyzer.get_top_words(n=None)
+        else:
+            rows = self.analyzer.get_top_ngrams(size)
+        
+        if not rows:
+            self.canvas_frame.show_message(f"No hay {plural} para mostrar después del filtrado")
+            self.info_label.configure(text="")
+            return
+        
+        total_rows = len(rows)
+        self.canvas_frame.set_rows(
+            rows,
+            on_rows_loaded=lambda shown: self.info_label.configure(
+                text=f"Mostrando {shown:,} de {total_rows:,} {plural}"
+            ),
+            column_title=column_title
+        )
+    
+    def save_results(self):
+        if not self.analyzer or not self.analyzer.word_counts:
+            messagebox.showerror("Error", "No hay resultados para guardar")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
+            initialfile="analisis_palabras.txt"
+        )
+        
+        if filename:
+            try:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write("ANÁLISIS DE FRECUENCIA DE PALABRAS\n")
+                    f.write("=" * 50 + "\n\n")
+                    f.write(f"Archivo analizado: {os.path.basename(self.pdf_path)}\n")
+                    f.write(f"Workers utilizados: {self.analyzer.num_workers}\n")
+                    f.write(f"Backend de extracción: {self.analyzer.backend}\n")
+                    f.write(f"Tiempo de análisis: {self.analyzer.analysis_time:.2f} segundos\n")
+                    f.write(f"Total de palabras únicas: {len(self.analyzer.word_counts)}\n")
+                    f.write(f"Total de palabras: {sum(self.analyzer.word_counts.values())}\n")
+                    f.write(f"Stopwords omitidas: {'sí' if self.analyzer.stopwords else 'no'}\n")
+                    if self.analyzer.skipped_pages:
+                        f.write(f"Páginas omitidas por tiempo límite: "
+                                f"{', '.join(map(str, sorted(self.analyzer.skipped_pages)))}\n")
+                    f.write("\n")
+                    
+                    for line in self.analyzer.profile.format_report(self.analyzer.analysis_time):
+                        f.write(f"{line}\n")
+                    f.write("\n")
+                    
+                    for size in range(2, self.analyzer.max_ngram + 1):
+                        f.write(f"{ngram_name(size).upper()}S MÁS FRECUENTES (top {self.NGRAMS_TO_SAVE}):\n")
+                        f.write("-" * 50 + "\n")
+                        for ngram, count in self.analyzer.get_top_ngrams(size, self.NGRAMS_TO_SAVE):
+                            f.write(f"{ngram:40} {count:>10}\n")
+                        f.write("\n")
+                    
+                    f.write("TODAS LAS PALABRAS:\n")
+                    f.write("-" * 50 + "\n")
+                    
+                    all_words = self.analyzer.get_top_words(n=None)
+                    for word, count in all_words:
+                        f.write(f"{word:30} {count:>10}\n")
+                
+                messagebox.showinfo("Éxito", f"Análisis guardado en:\n{filename}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Error al guardar el archivo: {str(e)}")
+    
+    def save_search_results(self):
+        if not self.last_search_results or not self.last_search_words:
+            messagebox.showerror("Error", "No hay resultados de búsqueda para guardar")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
+            initialfile="busqueda_frases.txt"
+        )
+        
+        if filename:
+            try:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write("RESULTADOS DE BÚSQUEDA DE FRASES\n")
+                    f.write("=" * 70 + "\n\n")
+                    f.write(f"Archivo analizado: {os.path.basename(self.pdf_path)}\n")
+                    f.write(f"Frases buscadas: {len(self.last_search_results)}\n")
+                    f.write(f"Total de coincidencias: {sum(len(results) for _, results in self.last_search_results)}\n")
+                    f.write(f"Fecha: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+                    
+                    for words, results in self.last_search_results:
+                        f.write(f"FRASE: {', '.join(words)}\n")
+                        f.write(f"Coincidencias: {len(results)}\n")
+                        f.write("=" * 70 + "\n\n")
+                        
+                        if not results:
+                            f.write("No se encontraron coincidencias.\n\n")
+                            continue
+                        
+                        for i, result in enumerate(results, 1):
+                            f.write(f"[Coincidencia {i}]\n")
+                            f.write(f"  Página: {result['page']}\n")
+                            f.write(f"  Párrafo: {result['paragraph']}\n")
+                            f.write(f"  Contexto: {result['context']}\n")
+                            f.write("-" * 70 + "\n\n")
+                
+                messagebox.showinfo("Éxito", f"Resultados de búsqueda guardados en:\n{filename}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Error al guardar el archivo: {str(e)}")
+
+
+def run_app(backend: str = 'pypdf2', use_cache: bool = True):
+    app = PDFAnalyzerApp(backend=backend, use_cache=use_cache)
+    app.mainloop()
+
+
+if __name__ == "__main__":
+    run_app()
@@ -0,0 +1,395 @@
+"""
+Servicio HTTP local del analizador de palabras en PDF.
+
+Otras herramientas suben un PDF, reciben el id de un trabajo y consultan
+después su estado, los conteos, las palabras más frecuentes y búsquedas
+de frases. Sólo usa la biblioteca estándar (asyncio); se abre con
+`python PDFcount.py --servidor` o ejecutando este archivo.
+    
+    POST   /trabajos                      cuerpo: el PDF -> {"id": ...} (202)
+    GET    /trabajos                      lista de trabajos
+    GET    /trabajos/<id>                 estado, progreso y resumen
+    GET    /trabajos/<id>/palabras        ?top=N&ngramas=M
+    GET    /trabajos/<id>/buscar          ?frase=palabra,palabra (repetible)&exacta=1&difusa=1
+    DELETE /trabajos/<id>                 cancela o descarta el trabajo
+    GET    /estado                        cola y workers
+"""
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import signal
+import tempfile
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from PDFcount import AnalysisCache, PDFWordAnalyzer, ProgressTracker, document_summary
+
+
+def query_flag(query: Dict[str, List[str]], name: str) -> bool:
+    """?difusa, ?difusa=1 o ?difusa=si activan la opción; ausente o ?difusa=0 no"""
+    values = query.get(name)
+    return bool(values) and values[-1].lower() not in ('0', 'false', 'no')
+
+
+class Job:
+    """Un PDF subido y su análisis. Sólo lo modifica el hilo del event loop."""
+    
+    LOG_LINES = 20  # Últimas líneas del registro que se devuelven con el estado
+    
+    def __init__(self, job_id: str, content_hash: str, pdf_path: str, analyzer: PDFWordAnalyzer,
+                 progress: ProgressTracker):
+        self.id = job_id
+        self.content_hash = content_hash
+        self.pdf_path = pdf_path
+        self.analyzer = analyzer
+        self.progress = progress
+        self.status = 'en_cola'  # en_cola -> analizando -> listo | error | cancelado
+        self.created = time.time()
+        self.finished = None
+        self.log = deque(maxlen=self.LOG_LINES)
+    
+    @property
+    def done(self) -> bool:
+        return self.status in ('listo', 'error', 'cancelado')
+    
+    def to_dict(self, summary_top: int = 20) -> Dict:
+        # El event loop es el único consumidor de la cola de progreso
+        self.log.extend(self.progress.drain())
+        state = self.progress.snapshot()
+        data = {
+            'id': self.id,
+            'estado': self.status,
+            'hash': self.content_hash,
+            'creado': round(self.created, 3),
+            'progreso': {
+                'paginas': state['pages_done'],
+                'total_paginas': state['total_pages'],
+                'paginas_por_segundo': round(state['pages_per_second'], 2)
+            },
+            'registro': list(self.log)
+        }
+        if self.status == 'error':
+            data['error'] = self.analyzer.error
+        if self.status == 'listo':
+            data['tiempo_analisis'] = round(self.analyzer.analysis_time, 3)
+            data['desde_cache'] = self.analyzer.from_cache
+            data['paginas_omitidas'] = self.analyzer.skipped_pages
+            data['resumen'] = document_summary(self.analyzer, summary_top, 10)
+        return data
+
+
+class AnalysisService:
+    """
+    Cola de trabajos con un número fijo de análisis a la vez. La cola es
+    acotada: si está llena, la subida se rechaza con 503 y Retry-After en
+    vez de acumular PDFs sin límite. Un PDF se identifica por el hash de su
+    contenido: volver a subirlo devuelve el mismo trabajo mientras esté en
+    memoria, y si no, el análisis sale de la caché en disco.
+    """
+    
+    RETRY_AFTER = 5  # Segundos sugeridos al cliente cuando la cola está llena
+    
+    def __init__(self, concurrent_jobs: int = 2, queue_size: int = 16, max_jobs: int = 64,
+                 max_upload_bytes: int = 256 * 1024 * 1024, upload_dir: str = None,
+                 cache: AnalysisCache = None, **analyzer_options):
+        self.concurrent_jobs = max(1, concurrent_jobs)
+        self.queue_size = queue_size
+        self.max_jobs = max_jobs  # Trabajos terminados que se conservan para consultas
+        self.max_upload_bytes = max_upload_bytes
+        self.upload_dir = upload_dir or os.path.join(tempfile.gettempdir(), "pdfcount_uploads")
+        self.cache = cache or AnalysisCache()
+        self.analyzer_options = analyzer_options  # backend, num_workers, use_processes, stopwords, ...
+        self.jobs = OrderedDict()  # Id -> Job, en orden de llegada
+        self.jobs_by_hash = {}  # Hash del contenido -> id del trabajo vigente
+        self.queue = None
+        self.executor = None
+        self.workers = []
+    
+    async def start(self):
+        os.makedirs(self.upload_dir, exist_ok=True)
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        # Un hilo por análisis simultáneo; cada analizador reparte luego sus páginas
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrent_jobs, thread_name_prefix="analisis")
+        self.workers = [asyncio.create_task(self.worker()) for _ in range(self.concurrent_jobs)]
+    
+    async def close(self):
+        for job in self.jobs.values():
+            if not job.done:
+                job.analyzer.cancel()
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+    
+    async def worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.status != 'en_cola':
+                    continue  # Cancelado mientras esperaba
+                job.status = 'analizando'
+                await loop.run_in_executor(self.executor, job.analyzer.analyze)
+                if job.analyzer.cancelled:
+                    job.status = 'cancelado'
+                elif job.analyzer.error:
+                    job.status = 'error'
+                else:
+                    job.status = 'listo'
+                job.finished = time.time()
+                self.forget_old_jobs()
+            finally:
+                self.queue.task_done()
+    
+    def submit(self, content_hash: str, pdf_path: str) -> Tuple[Job, bool]:
+        """Encola un análisis; devuelve (trabajo, ya existía). Lanza asyncio.QueueFull si no hay lugar."""
+        existing = self.jobs.get(self.jobs_by_hash.get(content_hash))
+        if existing and existing.status in ('en_cola', 'analizando', 'listo'):
+            return existing, True
+        
+        progress = ProgressTracker()
+        analyzer = PDFWordAnalyzer(pdf_path, callback=progress.log, progress=progress, cache=self.cache,
+                                   **self.analyzer_options)
+        job = Job(secrets.token_hex(8), content_hash, pdf_path, analyzer, progress)
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        self.jobs_by_hash[content_hash] = job.id
+        return job, False
+    
+    def cancel(self, job: Job):
+        if job.status == 'en_cola':
+            job.status = 'cancelado'
+            job.finished = time.time()
+        elif job.status == 'analizando':
+            job.analyzer.cancel()  # El worker marca el estado al terminar
+    
+    def discard(self, job: Job):
+        del self.jobs[job.id]
+        if self.jobs_by_hash.get(job.content_hash) == job.id:
+            del self.jobs_by_hash[job.content_hash]
+            # Ningún otro trabajo usa el archivo subido (se guarda por hash)
+            try:
+                os.remove(job.pdf_path)
+            except OSError:
+                pass
+    
+    def forget_old_jobs(self):
+        """Descarta los trabajos terminados más viejos; sus resultados siguen en la caché en disco"""
+        finished = [job for job in self.jobs.values() if job.done]
+        for job in finished[:max(0, len(finished) - self.max_jobs)]:
+            self.discard(job)
+    
+    def store_upload(self, body: bytes) -> Tuple[str, str]:
+        """Se ejecuta fuera del event loop: hash y escritura de PDFs grandes"""
+        content_hash = hashlib.sha256(body).hexdigest()
+        pdf_path = os.path.join(self.upload_dir, f"{content_hash}.pdf")
+        if not os.path.exists(pdf_path):
+            tmp_path = f"{pdf_path}.{secrets.token_hex(4)}.tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(body)
+            os.replace(tmp_path, pdf_path)
+        return content_hash, pdf_path
+    
+    # Rutas
+    
+    async def route(self, method: str, path: str, query: Dict[str, List[str]], body: bytes):
+        """Devuelve (estado HTTP, cuerpo JSON, encabezados extra)"""
+        parts = [part for part in path.split('/') if part]
+        
+        if parts == ['estado'] and method == 'GET':
+            return HTTPStatus.OK, {
+                'en_cola': self.queue.qsize(),
+                'capacidad_cola': self.queue_size,
+                'analisis_simultaneos': self.concurrent_jobs,
+                'analizando': sum(job.status == 'analizando' for job in self.jobs.values()),
+                'trabajos': len(self.jobs)
+            }, {}
+        
+        if parts == ['trabajos']:
+            if method == 'POST':
+                return await self.upload(body)
+            if method == 'GET':
+                return HTTPStatus.OK, [
+                    {'id': job.id, 'estado': job.status, 'hash': job.content_hash} for job in self.jobs.values()
+                ], {}
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "Método no permitido"}, {}
+        
+        if len(parts) < 2 or parts[0] != 'trabajos' or len(parts) > 3:
+            return HTTPStatus.NOT_FOUND, {'error': "Ruta desconocida"}, {}
+        
+        job = self.jobs.get(parts[1])
+        if job is None:
+            return HTTPStatus.NOT_FOUND, {'error': "Trabajo desconocido"}, {}
+        action = parts[2] if len(parts) == 3 else None
+        
+        if action is None and method == 'GET':
+            return HTTPStatus.OK, job.to_dict(), {}
+        if action is None and method == 'DELETE':
+            if job.done:
+                self.discard(job)
+                return HTTPStatus.OK, {'id': job.id, 'estado': 'descartado'}, {}
+            self.cancel(job)
+            return HTTPStatus.OK, {'id': job.id, 'estado': job.status}, {}
+        if method != 'GET' or action not in ('palabras', 'buscar'):
+            return HTTPStatus.NOT_FOUND, {'error': "Ruta desconocida"}, {}
+        
+        if job.status != 'listo':
+            return HTTPStatus.CONFLICT, {'id': job.id, 'estado': job.status,
+                                         'error': "El análisis no terminó"}, {}
+        
+        try:
+            if action == 'palabras':
+                top = int(query.get('top', ['50'])[0])
+                top_ngrams = int(query.get('ngramas', ['20'])[0])
+                return HTTPStatus.OK, document_summary(job.analyzer, top, top_ngrams), {}
+            return HTTPStatus.OK, await self.search(job, query), {}
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {'error': str(e)}, {}
+    
+    async def upload(self, body: bytes):
+        if not body.startswith(b'%PDF'):
+            return HTTPStatus.UNSUPPORTED_MEDIA_TYPE, {'error': "El cuerpo debe ser un PDF"}, {}
+        if self.queue.full():
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'error': "Cola llena, reintentar más tarde"}, \
+                {'Retry-After': str(self.RETRY_AFTER)}
+        
+        content_hash, pdf_path = await asyncio.get_running_loop().run_in_executor(None, self.store_upload, body)
+        try:
+            job, existing = self.submit(content_hash, pdf_path)
+        except asyncio.QueueFull:
+            # Se llenó mientras se guardaba el archivo
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'error': "Cola llena, reintentar más tarde"}, \
+                {'Retry-After': str(self.RETRY_AFTER)}
+        
+        status = HTTPStatus.OK if existing else HTTPStatus.ACCEPTED
+        return status, {'id': job.id, 'estado': job.status, 'existente': existing}, \
+            {'Location': f"/trabajos/{job.id}"}
+    
+    async def search(self, job: Job, query: Dict[str, List[str]]) -> Dict:
+        phrases = [[w.strip() for w in phrase.split(',') if w.strip()] for phrase in query.get('frase', [])]
+        phrases = [words for words in phrases if words]
+        if not phrases:
+            raise ValueError("Falta el parámetro frase (palabras separadas por comas)")
+        fold = not query_flag(query, 'exacta')
+        fuzzy = query_flag(query, 'difusa')
+        
+        # La búsqueda es trabajo de CPU: fuera del event loop
+        groups = await asyncio.get_running_loop().run_in_executor(
+            None, job.analyzer.search_phrases, phrases, fold, fuzzy
+        )
+        return {
+            'id': job.id,
+            'busquedas': [{'palabras': words, 'coincidencias': results} for words, results in groups]
+        }
+
+
+class HTTPServer:
+    """HTTP/1.1 mínimo sobre asyncio: una petición por conexión y respuestas JSON"""
+    
+    REQUEST_TIMEOUT = 60  # Segundos para recibir encabezados y cuerpo
+    MAX_HEADER_LINES = 100
+    
+    def __init__(self, service: AnalysisService, host: str = '127.0.0.1', port: int = 8765, callback=None):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.callback = callback
+    
+    async def read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        
+        headers = {}
+        for _ in range(self.MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise ValueError("Demasiados encabezados")
+        
+        length = int(headers.get('content-length', 0))
+        if length > self.service.max_upload_bytes:
+            raise OverflowError(length)
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, body
+    
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        headers = {}
+        try:
+            request = await asyncio.wait_for(self.read_request(reader), self.REQUEST_TIMEOUT)
+            if request is None:
+                return
+            method, target, body = request
+            url = urlsplit(target)
+            status, payload, headers = await self.service.route(method, url.path, parse_qs(url.query,
+                                                                keep_blank_values=True), body)
+            if self.callback:
+                self.callback(f"{method} {url.path} -> {status.value}")
+        except OverflowError:
+            status, payload = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': "Archivo demasiado grande"}
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = HTTPStatus.BAD_REQUEST, {'error': "Petición inválida"}
+        except asyncio.TimeoutError:
+            status, payload = HTTPStatus.REQUEST_TIMEOUT, {'error': "Tiempo de espera agotado"}
+        except Exception as e:
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+        
+        content = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = [f"HTTP/1.1 {status.value} {status.phrase}",
+                "Content-Type: application/json; charset=utf-8",
+                f"Content-Length: {len(content)}",
+                "Connection: close"]
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + content)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def serve(self):
+        await self.service.start()
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        if self.callback:
+            self.callback(f"Servicio de análisis en http://{self.host}:{self.port} "
+                          f"({self.service.concurrent_jobs} análisis a la vez, cola de {self.service.queue_size})")
+        # SIGINT y SIGTERM cierran el servicio cancelando los análisis en curso
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C llega como KeyboardInterrupt (ver run_server)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            await self.service.close()
+            if self.callback:
+                self.callback("Servicio detenido")
+
+
+def run_server(host: str = '127.0.0.1', port: int = 8765, concurrent_jobs: int = 2, queue_size: int = 16,
+               callback=print, **analyzer_options):
+    """analyzer_options se pasan a cada PDFWordAnalyzer (backend, num_workers, use_processes, ...)"""
+    service = AnalysisService(concurrent_jobs=concurrent_jobs, queue_size=queue_size, **analyzer_options)
+    try:
+        asyncio.run(HTTPServer(service, host, port, callback).serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    run_server()